@@ -0,0 +1,72 @@
+"""RLS policies tolerate an unset context on pooled connections
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+
+The gateway sets app.current_org_id / app.current_user_id per transaction
+(set_config(..., true)). Once a transaction that set them ends, Postgres
+resets them to '' rather than unsetting them, so on a pooled connection the
+::uuid cast failed for any later query without a context. NULLIF turns ''
+back into NULL, which matches no rows.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TENANT_TABLES = [
+    'orgs', 'projects', 'datasources', 'metrics', 'events', 'anomalies',
+    'workflows', 'action_runs', 'audit_logs', 'memberships'
+]
+
+ORG_ID = "NULLIF(current_setting('app.current_org_id', TRUE), '')::uuid"
+USER_ID = "NULLIF(current_setting('app.current_user_id', TRUE), '')::uuid"
+
+
+def upgrade() -> None:
+    """Recreate the RLS predicates with NULLIF."""
+
+    for table in TENANT_TABLES:
+        op.execute(f"""
+            ALTER POLICY tenant_isolation_policy ON {table}
+            USING (org_id = {ORG_ID})
+        """)
+
+    op.execute(f"""
+        ALTER POLICY user_policy ON users
+        USING (
+            id = {USER_ID}
+            OR id IN (
+                SELECT user_id FROM memberships
+                WHERE org_id = {ORG_ID}
+            )
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Restore the predicates from 001."""
+
+    for table in TENANT_TABLES:
+        op.execute(f"""
+            ALTER POLICY tenant_isolation_policy ON {table}
+            USING (org_id = current_setting('app.current_org_id', TRUE)::uuid)
+        """)
+
+    op.execute("""
+        ALTER POLICY user_policy ON users
+        USING (
+            id = current_setting('app.current_user_id', TRUE)::uuid
+            OR id IN (
+                SELECT user_id FROM memberships
+                WHERE org_id = current_setting('app.current_org_id', TRUE)::uuid
+            )
+        )
+    """)
@@ -0,0 +1,37 @@
+"""Shared FastAPI dependencies."""
+
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@asynccontextmanager
+async def tenant_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Database session scoped to the caller's tenant.
+
+    Uses the `rls_context` set by `AuthMiddleware`, so row-level security
+    policies restrict every query to the caller's org. The transaction
+    commits on exit and rolls back on error. Endpoints that do slow work
+    after their queries use this directly, to return the connection to the
+    pool early, instead of `get_db`.
+
+    Raises:
+        HTTPException: 401 if the request carries no authenticated context
+    """
+    context = getattr(request.state, "rls_context", None)
+    if context is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required",
+        )
+
+    async with request.app.state.db.rls_session(context["org_id"], context["user_id"]) as session:
+        yield session
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """`tenant_session` held for the whole request."""
+    async with tenant_session(request) as session:
+        yield session
@@ -1,5 +1,6 @@
 """Ayvlo API Gateway - Public REST API with auth, rate limiting, and observability."""
 
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
@@ -10,12 +11,22 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from prometheus_client import make_asgi_app
+from redis.asyncio import Redis
+import clickhouse_connect
 import structlog
 
+from packages.python_common.ayvlo_common.clickhouse import TracedClient
 from packages.python_common.ayvlo_common.config import BaseServiceSettings
 from packages.python_common.ayvlo_common.database import DatabaseManager
+from packages.python_common.ayvlo_common.health import HealthMonitor
 from packages.python_common.ayvlo_common.logging import setup_logging
 from packages.python_common.ayvlo_common.observability import setup_observability
+from packages.python_common.ayvlo_common.profiling import (
+    FileProfileStore,
+    ProfilingMiddleware,
+    RedisProfileStore,
+    role_authorizer,
+)
 
 from .middleware.auth import AuthMiddleware
 from .middleware.ratelimit import RateLimitMiddleware
@@ -37,6 +48,14 @@ class Settings(BaseServiceSettings):
     rate_limit_per_minute: int = 60
     enable_swagger: bool = True
 
+    # Per-request profiling: admins send X-Ayvlo-Profile: 1; 1 in
+    # profiling_sample_every requests is also profiled at random (0 = off)
+    profiling_enabled: bool = True
+    profiling_sample_every: int = 0
+    profiling_store: str = "redis"  # redis | disk
+    profiling_dir: str = "/tmp/ayvlo-profiles"
+    profiling_ttl_seconds: int = 900
+
 
 # Lifespan context for startup/shutdown
 @asynccontextmanager
@@ -45,25 +64,53 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     logger.info("Starting API Gateway", version=app.version)
 
     # Initialize database
-    app.state.db = DatabaseManager(app.state.settings.postgres_url)
+    settings = app.state.settings
+    app.state.db = DatabaseManager(
+        settings.postgres_url,
+        name="gateway",
+        pool_size=settings.postgres_pool_size,
+        max_overflow=settings.postgres_max_overflow,
+        pool_timeout=settings.postgres_pool_timeout,
+        pool_recycle=settings.postgres_pool_recycle,
+        pool_pre_ping=settings.postgres_pool_pre_ping,
+        statement_cache_size=settings.postgres_statement_cache_size,
+        pgbouncer=settings.postgres_pgbouncer,
+    )
 
-    # Setup observability
-    if app.state.settings.sentry_dsn:
-        setup_observability(
-            service_name=app.state.settings.service_name,
-            service_namespace="ayvlo",
-            deployment_environment=app.state.settings.app_env,
-            otlp_endpoint=app.state.settings.otel_exporter_otlp_endpoint,
-            sentry_dsn=app.state.settings.sentry_dsn,
+    # Initialize ClickHouse (metric timeseries)
+    app.state.clickhouse = None
+    if app.state.settings.clickhouse_url:
+        app.state.clickhouse = TracedClient(
+            clickhouse_connect.get_client(dsn=app.state.settings.clickhouse_url)
         )
 
+    # Dependency probes; /health/ready serves their last results
+    app.state.redis = Redis.from_url(settings.redis_url)
+    app.state.health = HealthMonitor(
+        interval=settings.health_probe_interval_seconds,
+        timeout=settings.health_probe_timeout_seconds,
+    )
+    app.state.health.add("database", app.state.db.ping)
+    # Rate limiting fails open without Redis
+    app.state.health.add("redis", app.state.redis.ping, critical=False)
+    if app.state.clickhouse:
+        clickhouse = app.state.clickhouse
+        app.state.health.add(
+            "clickhouse", lambda: asyncio.to_thread(clickhouse.ping), critical=False
+        )
+    await app.state.health.start()
+
     logger.info("API Gateway started successfully")
 
     yield
 
     # Cleanup
     logger.info("Shutting down API Gateway")
+    await app.state.health.stop()
+    await app.state.redis.close()
     await app.state.db.close()
+    if app.state.clickhouse:
+        app.state.clickhouse.close()
 
 
 # Create FastAPI app
@@ -74,7 +121,12 @@ def create_app() -> FastAPI:
     settings = Settings(service_name="api-gateway")
 
     # Setup structured logging
-    setup_logging(settings.service_name, settings.log_level)
+    setup_logging(
+        settings.service_name,
+        settings.log_level,
+        sample_rates=settings.log_sample_rates,
+        max_events_per_second=settings.log_max_events_per_second,
+    )
 
     # Create app
     app = FastAPI(
@@ -90,6 +142,22 @@ def create_app() -> FastAPI:
     # Store settings
     app.state.settings = settings
 
+    # Setup observability; the app must be instrumented before it starts
+    if settings.otel_enabled or settings.sentry_dsn:
+        setup_observability(
+            service_name=settings.service_name,
+            service_namespace="ayvlo",
+            deployment_environment=settings.app_env,
+            otlp_endpoint=settings.otel_exporter_otlp_endpoint,
+            sentry_dsn=settings.sentry_dsn,
+            sample_rate=settings.otel_traces_sample_rate,
+            app=app,
+            route_sample_rates=settings.otel_route_sample_rates,
+            tail_sampling=settings.otel_tail_sampling,
+            tail_slow_threshold_ms=settings.otel_tail_slow_threshold_ms,
+            sentry_sample_rate=settings.sentry_traces_sample_rate,
+        )
+
     # Add middleware (order matters!)
     # 1. Trusted host (security)
     if settings.is_production:
@@ -105,7 +173,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["X-Request-ID"],
+        expose_headers=["X-Request-ID", "X-Ayvlo-Profile-Location"],
     )
 
     # 3. GZip compression
@@ -121,7 +189,25 @@ def create_app() -> FastAPI:
         rate_limit=settings.rate_limit_per_minute,
     )
 
-    # 6. Authentication (custom)
+    # 6. Per-request profiling, inside authentication, which sets the roles it checks
+    if settings.profiling_enabled:
+        if settings.profiling_store == "disk":
+            profile_store = FileProfileStore(settings.profiling_dir, settings.profiling_ttl_seconds)
+        else:
+            profile_redis = Redis.from_url(settings.redis_url, decode_responses=True)
+            profile_store = RedisProfileStore(
+                lambda: profile_redis,
+                ttl_seconds=settings.profiling_ttl_seconds,
+                prefix="profile:gateway",
+            )
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=profile_store,
+            authorize=role_authorizer("admin"),
+            sample_every=settings.profiling_sample_every,
+        )
+
+    # 7. Authentication (custom)
     app.add_middleware(
         AuthMiddleware,
         secret_key=settings.secret_key,
@@ -89,7 +89,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             request.state.roles = payload.roles
             request.state.scopes = payload.scopes
 
-            logger.info(
+            logger.debug(
                 "Request authenticated",
                 user_id=payload.sub,
                 org_id=payload.org_id,
@@ -97,8 +97,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 request_id=request_id,
             )
 
-            # Set RLS context for database queries
-            # This would be done in a database middleware or dependency
+            # RLS context, applied to database sessions by dependencies.get_db
             request.state.rls_context = {
                 "org_id": payload.org_id,
                 "user_id": payload.sub,
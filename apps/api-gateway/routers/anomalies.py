@@ -1,6 +1,7 @@
 """Anomalies API endpoints."""
 
 from datetime import datetime
+from typing import Any
 from uuid import UUID
 
 from fastapi import APIRouter, Query, Request, HTTPException, status
@@ -18,7 +19,7 @@ class AnomalyResponse(BaseModel):
     window_end: datetime
     score: float
     severity: str
-    explanation: dict[str, any] | None
+    explanation: dict[str, Any] | None
     acknowledged: bool
     created_at: datetime
 
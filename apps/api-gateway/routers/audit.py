@@ -1,6 +1,7 @@
 """Audit log API endpoints."""
 
 from datetime import datetime
+from typing import Any
 
 from fastapi import APIRouter, Query, Request
 from pydantic import BaseModel
@@ -15,7 +16,7 @@ class AuditLogResponse(BaseModel):
     actor: str
     action: str
     target: str
-    meta: dict[str, any] | None
+    meta: dict[str, Any] | None
     ip_address: str | None
     user_agent: str | None
     at: datetime
@@ -1,6 +1,8 @@
 """Health check endpoints."""
 
-from fastapi import APIRouter, Request, status
+from typing import Any
+
+from fastapi import APIRouter, Request, Response, status
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -21,6 +23,7 @@ class ReadinessResponse(BaseModel):
     service: str
     version: str
     dependencies: dict[str, str]
+    checks: dict[str, dict[str, Any]] = {}
 
 
 @router.get("", response_model=HealthResponse)
@@ -35,28 +38,26 @@ async def liveness(request: Request) -> HealthResponse:
 
 
 @router.get("/ready", response_model=ReadinessResponse)
-async def readiness(request: Request) -> ReadinessResponse:
-    """Readiness probe - can the service handle requests?"""
-
-    dependencies = {}
-
-    # Check database
-    try:
-        async with request.app.state.db.session() as session:
-            await session.execute("SELECT 1")
-        dependencies["database"] = "healthy"
-    except Exception:
-        dependencies["database"] = "unhealthy"
+async def readiness(request: Request, response: Response) -> ReadinessResponse:
+    """Readiness probe - can the service handle requests?
 
-    # Check Redis
-    # TODO: implement Redis check
+    Served from the background health monitor's last probes, so polling it
+    never touches the database. Returns 503 while a critical dependency
+    (the database) is failing.
+    """
 
-    # Overall status
-    overall_status = "ready" if all(v == "healthy" for v in dependencies.values()) else "not_ready"
+    monitor = request.app.state.health
+    ready = monitor.ready()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
 
     return ReadinessResponse(
-        status=overall_status,
+        status="ready" if ready else "not_ready",
         service="api-gateway",
         version="1.0.0",
-        dependencies=dependencies,
+        dependencies={
+            name: "healthy" if healthy else "unhealthy"
+            for name, healthy in monitor.dependencies().items()
+        },
+        checks=monitor.report(),
     )
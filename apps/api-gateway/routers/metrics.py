@@ -1,14 +1,66 @@
 """Metrics API endpoints."""
 
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta, timezone
 from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, Query, Request, HTTPException, status
+from fastapi import APIRouter, Query, Request, Response, HTTPException, status
+import numpy as np
 from pydantic import BaseModel, Field
+from sqlalchemy import select
+
+from packages.python_common.ayvlo_common.downsampling import downsample
+from packages.python_common.ayvlo_common.serialization import JSON_MEDIA_TYPE, dumps, iso_timestamps
+from services.shared.models import Metric
+
+from ..dependencies import tenant_session
 
 router = APIRouter()
 
+WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+}
+
+GRANULARITY_SECONDS = {
+    "1m": 60,
+    "5m": 300,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+# Sub-hour buckets come from raw points
+RAW_BUCKETS_QUERY = """
+SELECT
+    toUnixTimestamp(toStartOfInterval(toDateTime(timestamp), toIntervalSecond({step:UInt32}))) AS bucket,
+    avg(value)
+FROM metrics
+WHERE tenant_id = {tenant_id:UUID}
+  AND metric_name = {metric_name:String}
+  AND timestamp >= {start:DateTime64(3)}
+  AND timestamp < {end:DateTime64(3)}
+GROUP BY bucket
+ORDER BY bucket
+"""
+
+# Hourly and coarser buckets are rolled up from metrics_hourly
+HOURLY_BUCKETS_QUERY = """
+SELECT
+    toUnixTimestamp(toStartOfInterval(timestamp, toIntervalSecond({step:UInt32}))) AS bucket,
+    sum(sum) / sum(count)
+FROM metrics_hourly
+WHERE tenant_id = {tenant_id:UUID}
+  AND metric_name = {metric_name:String}
+  AND timestamp >= toStartOfHour({start:DateTime64(3)})
+  AND timestamp < {end:DateTime64(3)}
+GROUP BY bucket
+ORDER BY bucket
+"""
+
 
 class TimeseriesPoint(BaseModel):
     """Single timeseries data point."""
@@ -21,8 +73,18 @@ class QueryMetricRequest(BaseModel):
     """Query metric timeseries request."""
 
     metric_id: UUID
-    window: str = Field(..., description="Time window: 1h, 24h, 7d, 30d, 90d")
-    granularity: str = Field(default="1h", description="Data granularity: 1m, 5m, 1h, 1d")
+    window: str = Field(
+        ..., pattern="^(1h|24h|7d|30d|90d)$", description="Time window: 1h, 24h, 7d, 30d, 90d"
+    )
+    granularity: str = Field(
+        default="1h", pattern="^(1m|5m|1h|1d)$", description="Data granularity: 1m, 5m, 1h, 1d"
+    )
+    max_points: int | None = Field(
+        default=None, ge=4, le=10000, description="Downsample to at most this many points"
+    )
+    downsample: str = Field(
+        default="lttb", pattern="^(lttb|m4)$", description="Downsampling method: lttb, m4"
+    )
 
 
 class QueryMetricResponse(BaseModel):
@@ -56,25 +118,92 @@ class MetricResponse(BaseModel):
     created_at: datetime
 
 
+def _query_buckets(
+    clickhouse: Any,
+    tenant_id: str,
+    metric_name: str,
+    start: datetime,
+    end: datetime,
+    step: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fetch time-bucketed averages as (epoch seconds, values) arrays."""
+    query = HOURLY_BUCKETS_QUERY if step >= 3600 else RAW_BUCKETS_QUERY
+    result = clickhouse.query(
+        query,
+        parameters={
+            "step": step,
+            "tenant_id": tenant_id,
+            "metric_name": metric_name,
+            "start": start,
+            "end": end,
+        },
+    )
+    if not result.row_count:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    buckets, values = result.result_columns
+    return np.asarray(buckets, dtype=np.int64), np.asarray(values, dtype=np.float64)
+
+
 @router.post("/query", response_model=QueryMetricResponse)
-async def query_metric(request: Request, body: QueryMetricRequest) -> QueryMetricResponse:
+async def query_metric(request: Request, body: QueryMetricRequest) -> Response:
     """Query metric timeseries data.
 
+    Points are bucketed by `granularity` in ClickHouse. With `max_points`, the
+    bucketed series is reduced with LTTB or M4 so charts receive a bounded
+    number of points regardless of the window. The body is encoded straight
+    from the bucket arrays, without a model per point.
+
     Requires scope: metrics:read
     """
 
-    # TODO: Implement actual query logic with ClickHouse
-    # For now, return mock data
-    return QueryMetricResponse(
-        metric_id=body.metric_id,
-        name="revenue_mrr",
-        data=[
-            TimeseriesPoint(ts=datetime.now(), value=125000.0),
-        ],
-        window=body.window,
-        granularity=body.granularity,
+    clickhouse = request.app.state.clickhouse
+    if clickhouse is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Metric storage is not configured",
+        )
+
+    org_id = request.state.org_id
+    # Released before the ClickHouse query, so slow queries don't hold pool connections
+    async with tenant_session(request) as session:
+        result = await session.execute(
+            select(Metric.name).where(Metric.id == body.metric_id, Metric.org_id == org_id)
+        )
+        name = result.scalar_one_or_none()
+
+    if name is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metric not found")
+
+    end = datetime.now(timezone.utc)
+    start = end - WINDOWS[body.window]
+
+    timestamps, values = await asyncio.to_thread(
+        _query_buckets,
+        clickhouse,
+        org_id,
+        name,
+        start,
+        end,
+        GRANULARITY_SECONDS[body.granularity],
     )
 
+    if body.max_points and len(timestamps) > body.max_points:
+        keep = downsample(timestamps, values, body.max_points, body.downsample)
+        timestamps, values = timestamps[keep], values[keep]
+
+    payload = dumps({
+        "metric_id": body.metric_id,
+        "name": name,
+        "data": [
+            {"ts": ts, "value": value}
+            for ts, value in zip(iso_timestamps(timestamps), values.tolist())
+        ],
+        "window": body.window,
+        "granularity": body.granularity,
+    })
+    return Response(content=payload, media_type=JSON_MEDIA_TYPE)
+
 
 @router.post("", response_model=MetricResponse, status_code=status.HTTP_201_CREATED)
 async def create_metric(request: Request, body: CreateMetricRequest) -> MetricResponse:
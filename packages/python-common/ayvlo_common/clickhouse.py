@@ -0,0 +1,516 @@
+"""Read-only, tenant-scoped access to the metrics tables in ClickHouse."""
+
+import re
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator, Sequence
+from uuid import UUID
+
+import clickhouse_connect
+from clickhouse_connect.driver.client import Client
+import numpy as np
+from opentelemetry import trace
+from opentelemetry.trace import Span, SpanKind
+
+_tracer = trace.get_tracer(__name__)
+
+# Dimension keys that may be materialized as `dim_<key>` columns
+HOT_DIMENSION_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,62}$")
+
+
+def hot_dimension_column(key: str) -> str:
+    """Column name for a materialized hot dimension.
+
+    Args:
+        key: Dimension key
+
+    Returns:
+        Column name, e.g. `dim_region`
+
+    Raises:
+        ValueError: If the key is not a valid column suffix
+    """
+    if not HOT_DIMENSION_KEY.match(key):
+        raise ValueError(f"Invalid hot dimension key: {key!r}")
+    return f"dim_{key}"
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_WHITESPACE = re.compile(r"\s+")
+
+# X-ClickHouse-Summary fields recorded on query spans
+_SUMMARY_FIELDS = (
+    "read_rows",
+    "read_bytes",
+    "written_rows",
+    "written_bytes",
+    "result_rows",
+    "result_bytes",
+    "total_rows_to_read",
+)
+
+
+def query_shape(query: str, max_length: int = 2048) -> str:
+    """Query text safe to attach to traces.
+
+    String literals are replaced with `?` and whitespace is collapsed, so
+    queries that inline values share one shape and never leak them.
+    Server-side `{name:Type}` parameters are kept as they are.
+
+    Args:
+        query: SQL text
+        max_length: Longest shape returned
+
+    Returns:
+        Normalized query text
+    """
+    shape = _WHITESPACE.sub(" ", _STRING_LITERAL.sub("?", query)).strip()
+    return shape[:max_length]
+
+
+class TracedClient:
+    """clickhouse-connect client whose queries, commands and inserts are traced.
+
+    Each call runs in a client span with the query shape and, once the server
+    answers, the rows and bytes read or written and the server-side elapsed
+    time from the X-ClickHouse-Summary header. Other attributes are passed
+    through to the wrapped client.
+
+    ClickHouse sends that header before the result body, so for SELECTs it
+    only holds final numbers when the server buffers the result
+    (`wait_end_of_query`). With `wait_for_summary`, traced SELECTs inside a
+    recording span set it; unsampled queries stream as usual.
+    """
+
+    def __init__(self, client: Client, wait_for_summary: bool = True) -> None:
+        """Wrap a client.
+
+        Args:
+            client: clickhouse-connect client
+            wait_for_summary: Buffer results of sampled queries on the server
+                so their summary is complete
+        """
+        self.client = client
+        self.wait_for_summary = wait_for_summary
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def query(self, query: str, parameters: Any = None, **kwargs: Any) -> Any:
+        """Traced `Client.query`."""
+        with self._span("query", query) as span:
+            if self.wait_for_summary and span.is_recording():
+                kwargs["settings"] = {**(kwargs.get("settings") or {}), "wait_end_of_query": 1}
+            result = self.client.query(query, parameters=parameters, **kwargs)
+            self._record_summary(span, result.summary)
+            return result
+
+    def query_np(self, query: str, parameters: Any = None, **kwargs: Any) -> np.ndarray:
+        """Traced `Client.query_np`; goes through `query` to keep the summary."""
+        return self.query(query, parameters=parameters, use_numpy=True, **kwargs).np_result
+
+    def command(self, cmd: str, parameters: Any = None, **kwargs: Any) -> Any:
+        """Traced `Client.command`."""
+        with self._span("command", cmd) as span:
+            result = self.client.command(cmd, parameters=parameters, **kwargs)
+            self._record_summary(span, getattr(result, "summary", None))
+            return result
+
+    def insert(self, table: str, data: Sequence, **kwargs: Any) -> Any:
+        """Traced `Client.insert`."""
+        with self._span("insert", f"INSERT INTO {table}") as span:
+            span.set_attribute("db.clickhouse.insert_rows", len(data))
+            result = self.client.insert(table, data, **kwargs)
+            self._record_summary(span, getattr(result, "summary", None))
+            return result
+
+    @contextmanager
+    def _span(self, operation: str, query: str) -> Iterator[Span]:
+        shape = query_shape(query)
+        with _tracer.start_as_current_span(
+            f"clickhouse.{operation}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": "clickhouse",
+                "db.name": getattr(self.client, "database", None) or "",
+                "db.operation": shape.split(" ", 1)[0].upper(),
+                "db.statement": shape,
+            },
+        ) as span:
+            yield span
+
+    @staticmethod
+    def _record_summary(span: Span, summary: dict[str, Any] | None) -> None:
+        if not summary or not span.is_recording():
+            return
+        for field in _SUMMARY_FIELDS:
+            if field in summary:
+                span.set_attribute(f"db.clickhouse.{field}", int(summary[field]))
+        if "elapsed_ns" in summary:
+            span.set_attribute("db.clickhouse.elapsed_ms", int(summary["elapsed_ns"]) / 1e6)
+        if summary.get("query_id"):
+            span.set_attribute("db.clickhouse.query_id", summary["query_id"])
+
+
+def _as_utc(value: datetime | str) -> datetime:
+    """Naive UTC datetime for a DateTime64 query parameter."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def create_reader_client(
+    host: str,
+    port: int,
+    username: str,
+    password: str,
+    database: str,
+    **kwargs: Any,
+) -> Client:
+    """Connect to ClickHouse for reading metrics.
+
+    The session runs with `readonly = 2`, so writes and DDL are rejected by the
+    server while per-query settings still work. Deployments should also point
+    this at a user granted SELECT only; a user whose profile already pins
+    `readonly = 1` cannot change the setting and should pass `settings={}`.
+
+    Args:
+        host: ClickHouse host
+        port: HTTP port
+        username: User name
+        password: Password
+        database: Database holding the metrics tables
+        **kwargs: Passed through to clickhouse_connect.get_client
+
+    Returns:
+        ClickHouse client
+    """
+    settings = kwargs.pop("settings", {"readonly": 2})
+    return clickhouse_connect.get_client(
+        host=host,
+        port=port,
+        username=username,
+        password=password,
+        database=database,
+        settings=settings,
+        **kwargs,
+    )
+
+
+class MetricsReader:
+    """Builds and runs tenant-scoped queries over the `metrics` table.
+
+    Every query is filtered by tenant and metric, with all values bound as
+    server-side parameters. The reader never writes, so it can be shared by
+    the metrics service and by services that bypass it for reads.
+    """
+
+    def __init__(
+        self,
+        client: Client | TracedClient | None = None,
+        hot_dimensions: Iterable[str] = (),
+    ) -> None:
+        """Initialize the reader.
+
+        Args:
+            client: ClickHouse client; may be assigned later
+            hot_dimensions: Dimension keys materialized as `dim_<key>` columns
+        """
+        self.client = client
+        self.hot_dimensions: set[str] = set(hot_dimensions)
+
+    def series_filter(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: datetime | str,
+        end_time: datetime | str,
+        dimensions: dict[str, str] | None,
+        parameters: dict[str, Any],
+    ) -> str:
+        """WHERE clause selecting one tenant's metric over a time range.
+
+        Args:
+            tenant_id: Tenant UUID; queries can never span tenants
+            metric_name: Metric name
+            start_time: Inclusive range start (datetime or ISO string)
+            end_time: Inclusive range end (datetime or ISO string)
+            dimensions: Optional dimension equality filters
+            parameters: Query parameters, updated in place
+
+        Returns:
+            SQL WHERE clause
+
+        Raises:
+            ValueError: If tenant_id is not a UUID
+        """
+        parameters.update(
+            tenant_id=str(UUID(str(tenant_id))),
+            metric_name=metric_name,
+            start_time=_as_utc(start_time),
+            end_time=_as_utc(end_time),
+        )
+
+        clause = """WHERE tenant_id = {tenant_id:UUID}
+          AND metric_name = {metric_name:String}
+          AND timestamp BETWEEN {start_time:DateTime64(3)} AND {end_time:DateTime64(3)}"""
+
+        if dimensions:
+            clause += self.dimension_filters(dimensions, parameters)
+        return clause
+
+    def dimension_filters(self, dimensions: dict[str, str], parameters: dict[str, Any]) -> str:
+        """Build WHERE clauses for dimension equality filters.
+
+        Hot dimensions compare against their materialized LowCardinality column;
+        other keys use the map lookup plus a has(mapValues(...)) predicate so the
+        idx_dim_values bloom filter can skip granules.
+
+        Args:
+            dimensions: Dimension key/value pairs
+            parameters: Query parameters, updated in place
+
+        Returns:
+            SQL fragment starting with AND, or an empty string
+        """
+        clauses = ""
+        for i, (key, value) in enumerate(sorted(dimensions.items())):
+            key_param, value_param = f"dim_key_{i}", f"dim_value_{i}"
+            parameters[value_param] = value
+
+            if key in self.hot_dimensions:
+                clauses += f" AND {hot_dimension_column(key)} = {{{value_param}:String}}"
+            else:
+                parameters[key_param] = key
+                clauses += (
+                    f" AND has(mapValues(dimensions), {{{value_param}:String}})"
+                    f" AND dimensions[{{{key_param}:String}}] = {{{value_param}:String}}"
+                )
+        return clauses
+
+    def query_rows(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: datetime | str,
+        end_time: datetime | str,
+        dimensions: dict[str, str] | None = None,
+    ) -> list[tuple]:
+        """Raw points as (timestamp, value, dimensions, metadata) rows.
+
+        Args:
+            tenant_id: Tenant UUID
+            metric_name: Metric name
+            start_time: Range start
+            end_time: Range end
+            dimensions: Optional dimension equality filters
+
+        Returns:
+            Rows ordered by timestamp
+        """
+        parameters: dict[str, Any] = {}
+        query = f"""
+        SELECT
+            timestamp,
+            value,
+            dimensions,
+            metadata
+        FROM metrics
+        {self.series_filter(tenant_id, metric_name, start_time, end_time, dimensions, parameters)}
+        ORDER BY timestamp ASC
+        """
+        return self.client.query(query, parameters=parameters).result_rows
+
+    def query_series(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: datetime | str,
+        end_time: datetime | str,
+        dimensions: dict[str, str] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Raw points as columnar arrays.
+
+        Args:
+            tenant_id: Tenant UUID
+            metric_name: Metric name
+            start_time: Range start
+            end_time: Range end
+            dimensions: Optional dimension equality filters
+
+        Returns:
+            (epoch milliseconds as int64, values as float64), both contiguous
+        """
+        parameters: dict[str, Any] = {}
+        query = f"""
+        SELECT
+            toUnixTimestamp64Milli(timestamp) AS ts,
+            value
+        FROM metrics
+        {self.series_filter(tenant_id, metric_name, start_time, end_time, dimensions, parameters)}
+        ORDER BY timestamp ASC
+        """
+
+        result = self.client.query_np(query, parameters=parameters)
+        if not len(result):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return (
+            np.ascontiguousarray(result["ts"], dtype=np.int64),
+            np.ascontiguousarray(result["value"], dtype=np.float64),
+        )
+
+    def query_breakdown(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        window: tuple[datetime | str, datetime | str],
+        baseline: tuple[datetime | str, datetime | str],
+        dimensions: dict[str, str] | None = None,
+        keys: Sequence[str] | None = None,
+        max_values_per_key: int = 100,
+    ) -> dict[str, np.ndarray]:
+        """Sums by dimension value over an anomaly window and a baseline window.
+
+        A single query groups by every dimension key at once: each row is
+        ARRAY JOINed with its (key, value) pairs plus an empty pair, which
+        carries the totals. Keys filtered on in `dimensions` have one value
+        and are skipped. Each key keeps the `max_values_per_key` values that
+        moved most, so high-cardinality keys stay cheap to return.
+
+        Args:
+            tenant_id: Tenant UUID
+            metric_name: Metric name
+            window: Half-open [start, end) range of the anomaly
+            baseline: Half-open [start, end) range it is compared with
+            dimensions: Optional dimension equality filters
+            keys: Dimension keys to break down by; all keys when None
+            max_values_per_key: Values returned per key
+
+        Returns:
+            Columns `key` and `value` (object arrays; the totals row has an
+            empty key), `window_sum` and `baseline_sum` (float64)
+        """
+        window_start, window_end = (_as_utc(value) for value in window)
+        baseline_start, baseline_end = (_as_utc(value) for value in baseline)
+        parameters: dict[str, Any] = {
+            "window_start": window_start,
+            "window_end": window_end,
+            "baseline_start": baseline_start,
+            "baseline_end": baseline_end,
+            # Baseline sums scaled to the window's length, to rank changes
+            "scale": (window_end - window_start) / (baseline_end - baseline_start),
+            "skip_keys": sorted(dimensions or ()),
+        }
+
+        pairs = "arrayZip(mapKeys(dimensions), mapValues(dimensions))"
+        if keys is not None:
+            parameters["keys"] = list(keys)
+            pairs = f"arrayFilter(pair -> has({{keys:Array(String)}}, pair.1), {pairs})"
+
+        where = self.series_filter(
+            tenant_id,
+            metric_name,
+            min(window_start, baseline_start),
+            max(window_end, baseline_end),
+            dimensions,
+            parameters,
+        )
+        query = f"""
+        SELECT
+            pair.1 AS key,
+            pair.2 AS dim_value,
+            sumIf(value, timestamp >= {{window_start:DateTime64(3)}}
+                AND timestamp < {{window_end:DateTime64(3)}}) AS window_sum,
+            sumIf(value, timestamp >= {{baseline_start:DateTime64(3)}}
+                AND timestamp < {{baseline_end:DateTime64(3)}}) AS baseline_sum
+        FROM metrics
+        ARRAY JOIN arrayPushFront({pairs}, ('', '')) AS pair
+        {where}
+          AND NOT has({{skip_keys:Array(String)}}, pair.1)
+        GROUP BY key, dim_value
+        ORDER BY key, abs(window_sum - baseline_sum * {{scale:Float64}}) DESC
+        LIMIT {int(max_values_per_key)} BY key
+        """
+
+        columns = self.client.query(query, parameters=parameters).result_columns
+        if not columns or not len(columns[0]):
+            columns = [[], [], [], []]
+        return {
+            "key": np.asarray(columns[0], dtype=object),
+            "value": np.asarray(columns[1], dtype=object),
+            "window_sum": np.asarray(columns[2], dtype=np.float64),
+            "baseline_sum": np.asarray(columns[3], dtype=np.float64),
+        }
+
+    def query_slice_matrix(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: datetime | str,
+        end_time: datetime | str,
+        key: str,
+        step_seconds: int,
+        dimensions: dict[str, str] | None = None,
+        max_slices: int = 1000,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Every value of a dimension key as one series, aligned on a time grid.
+
+        A single query sums the metric per slice and per `step_seconds`
+        bucket; only the `max_slices` largest slices by total are kept.
+
+        Args:
+            tenant_id: Tenant UUID
+            metric_name: Metric name
+            start_time: Range start
+            end_time: Range end
+            key: Dimension key whose values are the slices
+            step_seconds: Bucket width
+            dimensions: Optional dimension equality filters
+            max_slices: Most slices returned
+
+        Returns:
+            (bucket starts as epoch milliseconds, slice values, float64 matrix
+            of time x slice with NaN where a slice has no points)
+        """
+        step_ms = int(step_seconds) * 1000
+        parameters: dict[str, Any] = {"step_ms": step_ms, "slice_key": key}
+        where = self.series_filter(tenant_id, metric_name, start_time, end_time, dimensions, parameters)
+        if key in self.hot_dimensions:
+            slice_column = hot_dimension_column(key)
+        else:
+            slice_column = "dimensions[{slice_key:String}]"
+
+        query = f"""
+        SELECT
+            intDiv(toUnixTimestamp64Milli(timestamp), {{step_ms:Int64}}) * {{step_ms:Int64}} AS bucket,
+            {slice_column} AS slice,
+            sum(value) AS total
+        FROM metrics
+        {where}
+          AND slice IN (
+            SELECT {slice_column} AS slice
+            FROM metrics
+            {where}
+              AND slice != ''
+            GROUP BY slice
+            ORDER BY sum(value) DESC
+            LIMIT {int(max_slices)}
+          )
+        GROUP BY slice, bucket
+        """
+
+        columns = self.client.query(query, parameters=parameters).result_columns
+        if not columns or not len(columns[0]):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty((0, 0))
+
+        # Pivot onto a regular grid, so gaps in a slice are NaN rows
+        buckets = np.asarray(columns[0], dtype=np.int64)
+        first = buckets.min()
+        grid = np.arange(first, buckets.max() + step_ms, step_ms, dtype=np.int64)
+        slices, slice_index = np.unique(np.asarray(columns[1], dtype=object), return_inverse=True)
+
+        matrix = np.full((len(grid), len(slices)), np.nan)
+        matrix[(buckets - first) // step_ms, slice_index] = np.asarray(columns[2], dtype=np.float64)
+        return grid, slices, matrix
@@ -21,9 +21,26 @@ class BaseServiceSettings(BaseSettings):
     app_env: str = Field(default="development", description="Application environment")
     service_name: str = Field(..., description="Service name")
     log_level: str = Field(default="INFO", description="Logging level")
+    log_sample_rates: dict[str, int] = Field(
+        default={}, description="Keep 1 in N of these log events, by event name"
+    )
+    log_max_events_per_second: float = Field(
+        default=0.0, ge=0.0, description="Per-event log rate cap; 0 disables"
+    )
 
     # Database
     postgres_url: str = Field(..., description="PostgreSQL connection URL")
+    postgres_pool_size: int = Field(default=10, ge=1)
+    postgres_max_overflow: int = Field(default=10, ge=0)
+    postgres_pool_timeout: float = Field(default=30.0, gt=0.0)
+    postgres_pool_recycle: int = Field(default=1800, description="Seconds before a connection is replaced")
+    postgres_pool_pre_ping: bool = Field(default=False, description="Costs a round trip per checkout")
+    postgres_statement_cache_size: int = Field(
+        default=100, ge=0, description="Prepared statements cached per connection"
+    )
+    postgres_pgbouncer: bool = Field(
+        default=False, description="Behind PgBouncer in transaction mode (1.21+)"
+    )
     clickhouse_url: str | None = Field(None, description="ClickHouse connection URL")
 
     # Redis
@@ -37,9 +54,21 @@ class BaseServiceSettings(BaseSettings):
     redpanda_password: str | None = None
     schema_registry_url: str = Field(default="http://localhost:8081")
 
+    # Dependency health probes; readiness serves their cached results
+    health_probe_interval_seconds: float = Field(default=5.0, gt=0.0)
+    health_probe_timeout_seconds: float = Field(default=2.0, gt=0.0)
+
     # Observability
     sentry_dsn: str | None = None
+    otel_enabled: bool = Field(default=False)
     otel_exporter_otlp_endpoint: str = Field(default="http://localhost:4318")
+    otel_traces_sample_rate: float = Field(default=0.05, ge=0.0, le=1.0)
+    otel_route_sample_rates: dict[str, float] = Field(default={"/health": 0.0, "/metrics": 0.0})
+    # Tail sampling keeps slow and failed traces too, but records every
+    # request's spans in memory until the trace ends; off by default
+    otel_tail_sampling: bool = Field(default=False)
+    otel_tail_slow_threshold_ms: float = Field(default=0.0, ge=0.0)
+    sentry_traces_sample_rate: float = Field(default=0.01, ge=0.0, le=1.0)
     otel_resource_attributes: str = Field(default="")
 
     @field_validator("app_env")
@@ -1,12 +1,25 @@
 """Database utilities."""
 
+import time
+import weakref
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterator
+from uuid import UUID, uuid4
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+
 
 class Base(DeclarativeBase):
     """Base class for SQLAlchemy models."""
@@ -17,33 +30,166 @@ class Base(DeclarativeBase):
 class DatabaseManager:
     """Async database connection manager."""
 
-    def __init__(self, database_url: str, echo: bool = False) -> None:
+    def __init__(
+        self,
+        database_url: str,
+        echo: bool = False,
+        name: str = "default",
+        pool_size: int = 10,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = False,
+        statement_cache_size: int = 100,
+        pgbouncer: bool = False,
+    ) -> None:
         """Initialize database manager.
 
         Args:
             database_url: Database connection URL
             echo: Whether to echo SQL queries
+            name: Pool label on the exported metrics
+            pool_size: Connections kept open
+            max_overflow: Extra connections opened under load, closed when returned
+            pool_timeout: Seconds to wait for a connection before failing
+            pool_recycle: Seconds after which a connection is replaced
+            pool_pre_ping: Test connections on checkout; costs a round trip each time
+            statement_cache_size: Prepared statements cached per connection; 0 disables
+            pgbouncer: Give prepared statements unique names, as PgBouncer in
+                transaction mode (1.21+, with max_prepared_statements) requires
         """
         # Convert postgresql:// to postgresql+asyncpg://
         if database_url.startswith("postgresql://"):
             database_url = database_url.replace("postgresql://", "postgresql+asyncpg://")
 
-        self.engine = create_async_engine(database_url, echo=echo, pool_pre_ping=True)
+        connect_args: dict = {"prepared_statement_cache_size": statement_cache_size}
+        if pgbouncer:
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+
+        self.name = name
+        self.engine = create_async_engine(
+            database_url,
+            echo=echo,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            connect_args=connect_args,
+        )
         self.session_factory = async_sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
+        _managers.add(self)
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncGenerator[AsyncConnection, None]:
+        """Check out a pooled connection, timing the wait."""
+        started = time.perf_counter()
+        async with self.engine.connect() as connection:
+            POOL_CHECKOUT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+            yield connection
 
     @asynccontextmanager
     async def session(self) -> AsyncGenerator[AsyncSession, None]:
         """Provide a transactional scope around a series of operations."""
-        async with self.session_factory() as session:
+        async with self.connect() as connection:
+            async with self.session_factory(bind=connection) as session:
+                try:
+                    yield session
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+
+    @asynccontextmanager
+    async def rls_session(
+        self, org_id: UUID | str, user_id: UUID | str
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """Transactional session with row-level security applied for a tenant.
+
+        The org and user are set with `set_config(..., true)`, the function
+        form of `SET LOCAL`, so they last for this transaction only and never
+        leak to the next user of the connection (safe behind PgBouncer in
+        transaction mode). They are sent in the same message as `BEGIN`, so
+        enforcing RLS adds no round trip: a request costs BEGIN, its queries
+        and COMMIT, as without RLS.
+
+        Args:
+            org_id: Tenant, matched by the `app.current_org_id` policies
+            user_id: Caller, matched by `app.current_user_id`
+
+        Raises:
+            ValueError: If either id is not a UUID
+        """
+        begin = _rls_begin(org_id, user_id)
+
+        async with self.connect() as connection:
+            # SQLAlchemy would send its own BEGIN; this connection's
+            # transaction is driven by hand instead
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            driver = (await connection.get_raw_connection()).driver_connection
+
+            # Simple query protocol: both statements in one round trip
+            await driver.execute(begin)
+            session = self.session_factory(bind=connection)
             try:
                 yield session
-                await session.commit()
-            except Exception:
-                await session.rollback()
+                await session.flush()
+                await driver.execute("COMMIT")
+            except BaseException:
+                try:
+                    await driver.execute("ROLLBACK")
+                except Exception:
+                    # Unknown transaction state; never hand it to another request
+                    await connection.invalidate()
                 raise
+            finally:
+                await session.close()
+
+    async def ping(self) -> None:
+        """Run `SELECT 1` on a pooled connection; raises if the database is unreachable."""
+        async with self.connect() as connection:
+            await connection.exec_driver_sql("SELECT 1")
 
     async def close(self) -> None:
         """Close database connections."""
         await self.engine.dispose()
+
+
+def _rls_begin(org_id: UUID | str, user_id: UUID | str) -> str:
+    """BEGIN plus the RLS settings; ids are inlined, so they are validated as UUIDs first."""
+    org = UUID(str(org_id))
+    user = UUID(str(user_id))
+    return (
+        "BEGIN; SELECT "
+        f"set_config('app.current_org_id', '{org}', true), "
+        f"set_config('app.current_user_id', '{user}', true)"
+    )
+
+
+class _PoolCollector(Collector):
+    """Reports pool usage of every live DatabaseManager at scrape time."""
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        size = GaugeMetricFamily("db_pool_size", "Connections the pool keeps open", labels=["pool"])
+        checked_out = GaugeMetricFamily(
+            "db_pool_checked_out", "Connections currently in use", labels=["pool"]
+        )
+        overflow = GaugeMetricFamily(
+            "db_pool_overflow", "Connections open beyond the pool size", labels=["pool"]
+        )
+        for manager in list(_managers):
+            pool = manager.engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            size.add_metric([manager.name], pool.size())
+            checked_out.add_metric([manager.name], pool.checkedout())
+            overflow.add_metric([manager.name], max(pool.overflow(), 0))
+        yield size
+        yield checked_out
+        yield overflow
+
+
+_managers: "weakref.WeakSet[DatabaseManager]" = weakref.WeakSet()
+REGISTRY.register(_PoolCollector())
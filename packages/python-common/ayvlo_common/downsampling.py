@@ -0,0 +1,98 @@
+"""Visual downsampling of time series for charting."""
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Select points with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points and, for each of the threshold - 2 buckets
+    in between, the point forming the largest triangle with the previously
+    selected point and the average of the next bucket.
+
+    Args:
+        x: Monotonically increasing x values (e.g. epoch seconds)
+        y: Values aligned with x
+        threshold: Number of points to keep
+
+    Returns:
+        Sorted indices of the selected points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64, copy=False)
+    y = y.astype(np.float64, copy=False)
+
+    # threshold - 1 edges delimit threshold - 2 buckets over points 1..n-2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def m4(x: np.ndarray, y: np.ndarray, buckets: int) -> np.ndarray:
+    """Select points with M4 aggregation.
+
+    Splits the x range into equal-width buckets (one per pixel column) and keeps
+    the first, last, minimum and maximum point of each, which renders
+    identically to the full series as a line chart of that width.
+
+    Args:
+        x: Monotonically increasing x values (e.g. epoch seconds)
+        y: Values aligned with x
+        buckets: Number of buckets; at most 4 * buckets points are kept
+
+    Returns:
+        Sorted indices of the selected points
+    """
+    n = len(x)
+    if buckets < 1 or 4 * buckets >= n:
+        return np.arange(n)
+
+    x = x.astype(np.float64, copy=False)
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.array([0, n - 1])
+
+    bucket_ids = np.minimum(((x - x[0]) / span * buckets).astype(np.int64), buckets - 1)
+    starts = np.flatnonzero(np.r_[True, np.diff(bucket_ids) != 0])
+    ends = np.r_[starts[1:], n]
+
+    # Within each bucket, sort by value: first entry is the min, last is the max
+    order = np.lexsort((y, bucket_ids))
+    argmin = order[starts]
+    argmax = order[ends - 1]
+
+    return np.unique(np.concatenate([starts, ends - 1, argmin, argmax]))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, method: str = "lttb") -> np.ndarray:
+    """Indices of at most max_points points chosen by `method` ("lttb" or "m4")."""
+    if method == "m4":
+        return m4(x, y, max_points // 4)
+    if method == "lttb":
+        return lttb(x, y, max_points)
+    raise ValueError(f"Unknown downsampling method: {method}")
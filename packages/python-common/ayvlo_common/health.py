@@ -0,0 +1,204 @@
+"""Background dependency probes with cached readiness."""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+import structlog
+from prometheus_client import Gauge, Histogram
+
+logger = structlog.get_logger(__name__)
+
+PROBE_SECONDS = Histogram(
+    "dependency_probe_seconds",
+    "Latency of background dependency health probes",
+    ["dependency", "result"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+DEPENDENCY_UP = Gauge(
+    "dependency_up",
+    "Whether the last health probe of a dependency succeeded",
+    ["dependency"],
+)
+
+Check = Callable[[], Awaitable[Any]]
+
+
+class Probe:
+    """State of one dependency's health checks."""
+
+    def __init__(self, name: str, check: Check, critical: bool) -> None:
+        self.name = name
+        self.check = check
+        self.critical = critical
+        self.healthy: bool | None = None
+        self.latency_ms: float | None = None
+        self.checked_at: float | None = None
+        self.error: str | None = None
+        self.failures = 0
+        # A check that outlived its timeout; no new one starts until it ends
+        self.in_flight: asyncio.Future | None = None
+
+    def report(self, now: float) -> dict[str, Any]:
+        return {
+            "healthy": bool(self.healthy),
+            "critical": self.critical,
+            "latency_ms": self.latency_ms,
+            "age_seconds": round(now - self.checked_at, 1) if self.checked_at else None,
+            "consecutive_failures": self.failures,
+            "error": self.error,
+        }
+
+
+class HealthMonitor:
+    """Probes dependencies in the background; readiness reads the cached state.
+
+    Each dependency is checked by its own task every `interval` seconds,
+    with a little jitter so replicas don't probe in lockstep, and each check
+    is bounded by `timeout`. Readiness endpoints only read the last result,
+    so however many load balancers and replicas poll them, each replica
+    sends one probe per dependency per interval. While a dependency fails,
+    its interval doubles up to `max_interval`, and a check that hangs past
+    its timeout is not started again until it returns, so a struggling
+    database is not hammered with probes.
+
+    A check is an async callable; it fails by raising, timing out or
+    returning False. Latencies are exported as `dependency_probe_seconds`
+    and the last result as `dependency_up`.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        max_interval: float | None = None,
+        stale_after: float | None = None,
+    ) -> None:
+        """Initialize the monitor.
+
+        Args:
+            interval: Seconds between probes of a healthy dependency
+            timeout: Seconds a check may take before it counts as failed
+            max_interval: Longest backoff between probes of a failing
+                dependency; defaults to 4 x interval
+            stale_after: Results older than this count as failed; defaults
+                to 2 x max_interval + timeout
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.max_interval = max_interval or interval * 4
+        self.stale_after = stale_after or self.max_interval * 2 + timeout
+        self.probes: dict[str, Probe] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def add(self, name: str, check: Check, critical: bool = True) -> None:
+        """Register a dependency.
+
+        Args:
+            name: Dependency name, used in reports and metric labels
+            check: Async callable probing the dependency
+            critical: Whether readiness requires it
+        """
+        self.probes[name] = Probe(name, check, critical)
+
+    async def start(self) -> None:
+        """Probe every dependency once, then keep probing in the background."""
+        await asyncio.gather(*(self._probe(probe) for probe in self.probes.values()))
+        self._tasks = [
+            asyncio.create_task(self._loop(probe), name=f"health-probe-{probe.name}")
+            for probe in self.probes.values()
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the probe tasks."""
+        for task in self._tasks:
+            task.cancel()
+        for probe in self.probes.values():
+            if probe.in_flight is not None:
+                probe.in_flight.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def ready(self) -> bool:
+        """Whether every critical dependency passed its last, recent probe."""
+        now = time.monotonic()
+        return all(
+            self._fresh(probe, now) for probe in self.probes.values() if probe.critical
+        )
+
+    def dependencies(self) -> dict[str, bool]:
+        """Healthy or not, by dependency."""
+        now = time.monotonic()
+        return {name: self._fresh(probe, now) for name, probe in self.probes.items()}
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        """Last result, latency and age by dependency."""
+        now = time.monotonic()
+        return {name: probe.report(now) for name, probe in self.probes.items()}
+
+    def _fresh(self, probe: Probe, now: float) -> bool:
+        return bool(probe.healthy) and now - (probe.checked_at or 0) <= self.stale_after
+
+    async def _loop(self, probe: Probe) -> None:
+        while True:
+            delay = min(self.interval * 2 ** probe.failures, self.max_interval)
+            await asyncio.sleep(delay * random.uniform(0.9, 1.1))
+            await self._probe(probe)
+
+    async def _probe(self, probe: Probe) -> None:
+        if probe.in_flight is not None and not probe.in_flight.done():
+            self._record(probe, False, None, "previous probe still running")
+            return
+
+        started = time.perf_counter()
+        probe.in_flight = asyncio.ensure_future(probe.check())
+        # Retrieve the outcome even when nobody waits for it any more
+        probe.in_flight.add_done_callback(lambda future: future.cancelled() or future.exception())
+        done, _ = await asyncio.wait({probe.in_flight}, timeout=self.timeout)
+        elapsed = time.perf_counter() - started
+
+        if not done:
+            self._record(probe, False, elapsed, f"timed out after {self.timeout}s")
+            return
+
+        try:
+            healthy = probe.in_flight.result() is not False
+            error = None if healthy else "check returned False"
+        except Exception as e:
+            healthy, error = False, f"{type(e).__name__}: {e}"
+        self._record(probe, healthy, elapsed, error)
+
+    def _record(self, probe: Probe, healthy: bool, elapsed: float | None, error: str | None) -> None:
+        if elapsed is not None:
+            PROBE_SECONDS.labels(probe.name, "ok" if healthy else "error").observe(elapsed)
+        DEPENDENCY_UP.labels(probe.name).set(1 if healthy else 0)
+
+        if healthy != probe.healthy:
+            log = logger.info if healthy else logger.warning
+            log("Dependency health changed", dependency=probe.name, healthy=healthy, error=error)
+
+        probe.healthy = healthy
+        probe.error = error
+        probe.latency_ms = round(elapsed * 1000, 2) if elapsed is not None else None
+        probe.checked_at = time.monotonic()
+        probe.failures = 0 if healthy else probe.failures + 1
+
+
+def http_probe(client: Any, url: str) -> Check:
+    """Check that a downstream service answers `url` with a 2xx.
+
+    Point it at the service's liveness endpoint, not its readiness, so one
+    service's outage is not reported by every service that calls it.
+
+    Args:
+        client: An `httpx.AsyncClient`, reused across probes
+        url: Endpoint to GET
+    """
+
+    async def check() -> bool:
+        response = await client.get(url)
+        return 200 <= response.status_code < 300
+
+    return check
@@ -1,19 +1,43 @@
 """Structured logging setup."""
 
+import atexit
+import itertools
 import logging
+import queue
 import sys
-from typing import Any
+import threading
+import time
+from typing import Any, BinaryIO, Mapping
 
+import orjson
 import structlog
 from opentelemetry import trace
 
+# Levels that are never sampled away; rate limiting still applies
+_UNSAMPLED_LEVELS = frozenset({"warning", "warn", "error", "err", "critical", "exception", "fatal"})
 
-def setup_logging(service_name: str, log_level: str = "INFO") -> None:
+
+def setup_logging(
+    service_name: str,
+    log_level: str = "INFO",
+    sample_rates: Mapping[str, int] | None = None,
+    max_events_per_second: float = 0.0,
+    async_writer: bool = True,
+) -> None:
     """Configure structured logging with OpenTelemetry integration.
 
+    Events are rendered as one JSON line with orjson. With `async_writer`,
+    lines are handed to a background thread that writes them to stdout, so
+    logging never blocks the event loop on the pipe; if the writer falls
+    behind, lines are dropped and the number dropped is logged.
+
     Args:
         service_name: Name of the service
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        sample_rates: Keep 1 in N of these events, by event name, e.g.
+            {"Request authenticated": 100}; warnings and errors are never sampled
+        max_events_per_second: Cap per event name; 0 disables
+        async_writer: Write from a background thread instead of the caller's
     """
     logging.basicConfig(
         format="%(message)s",
@@ -21,25 +45,198 @@ def setup_logging(service_name: str, log_level: str = "INFO") -> None:
         level=getattr(logging, log_level.upper()),
     )
 
+    processors: list[Any] = []
+    # Dropping first means sampled-out events skip the rest of the chain
+    if sample_rates or max_events_per_second:
+        processors.append(EventSampler(sample_rates, max_events_per_second))
+    processors += [
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.add_log_level,
+        structlog.processors.StackInfoRenderer(),
+        structlog.dev.set_exc_info,
+        structlog.processors.format_exc_info,
+        structlog.processors.TimeStamper(fmt="iso"),
+        _add_trace_context,
+        render_orjson,
+    ]
+
+    if async_writer:
+        writer = QueueWriter(sys.stdout.buffer)
+        logger_factory: Any = lambda *args: QueueLogger(writer)
+    else:
+        logger_factory = structlog.BytesLoggerFactory()
+
     structlog.configure(
-        processors=[
-            structlog.contextvars.merge_contextvars,
-            structlog.processors.add_log_level,
-            structlog.processors.StackInfoRenderer(),
-            structlog.dev.set_exc_info,
-            structlog.processors.TimeStamper(fmt="iso"),
-            _add_trace_context,
-            structlog.processors.JSONRenderer(),
-        ],
+        processors=processors,
         wrapper_class=structlog.make_filtering_bound_logger(
             getattr(logging, log_level.upper())
         ),
         context_class=dict,
-        logger_factory=structlog.PrintLoggerFactory(),
+        logger_factory=logger_factory,
         cache_logger_on_first_use=True,
     )
 
 
+def render_orjson(
+    logger: Any, method_name: str, event_dict: dict[str, Any]
+) -> bytes:
+    """Render an event as one JSON line; unknown types fall back to repr."""
+    return orjson.dumps(
+        event_dict,
+        default=repr,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+class EventSampler:
+    """structlog processor sampling and rate-limiting events by name.
+
+    Events listed in `sample_rates` are kept 1 in N and carry `sampled=N`,
+    so counts can be scaled back up. With `max_events_per_second`, each
+    event name is also limited by a token bucket of one second's burst; the
+    next event let through carries `suppressed=<count>` dropped before it.
+    """
+
+    def __init__(
+        self,
+        sample_rates: Mapping[str, int] | None = None,
+        max_events_per_second: float = 0.0,
+    ) -> None:
+        """Initialize the sampler.
+
+        Args:
+            sample_rates: Keep 1 in N of these events, by event name
+            max_events_per_second: Cap per event name; 0 disables
+        """
+        self.sample_rates = {event: rate for event, rate in (sample_rates or {}).items() if rate > 1}
+        self.counters = {event: itertools.count() for event in self.sample_rates}
+        self.max_events_per_second = max_events_per_second
+        self._lock = threading.Lock()
+        # event -> [tokens, last refill, suppressed]
+        self._buckets: dict[str, list[float]] = {}
+
+    def __call__(
+        self, logger: Any, method_name: str, event_dict: dict[str, Any]
+    ) -> dict[str, Any]:
+        event = event_dict.get("event")
+        rate = self.sample_rates.get(event)
+        if rate is not None and method_name not in _UNSAMPLED_LEVELS:
+            # next() on itertools.count is atomic under the GIL
+            if next(self.counters[event]) % rate:
+                raise structlog.DropEvent
+            event_dict["sampled"] = rate
+
+        if self.max_events_per_second:
+            suppressed = self._take(event)
+            if suppressed is None:
+                raise structlog.DropEvent
+            if suppressed:
+                event_dict["suppressed"] = suppressed
+        return event_dict
+
+    def _take(self, event: Any) -> int | None:
+        """Take a token for `event`; None when over the limit, else events suppressed before it."""
+        now = time.monotonic()
+        limit = self.max_events_per_second
+        with self._lock:
+            bucket = self._buckets.get(event)
+            if bucket is None:
+                if len(self._buckets) >= 10_000:
+                    self._buckets.clear()
+                bucket = self._buckets[event] = [limit, now, 0]
+            bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return None
+            bucket[0] -= 1.0
+            suppressed, bucket[2] = int(bucket[2]), 0
+            return suppressed
+
+
+class QueueWriter:
+    """Writes log lines to a stream from a background thread.
+
+    `write` only enqueues, so callers never wait on the stream. The thread
+    drains everything queued into one write. When the queue is full, lines
+    are dropped and a count of them is written once there is room.
+    """
+
+    def __init__(self, stream: BinaryIO, max_queued: int = 10_000, batch_size: int = 512) -> None:
+        """Start the writer thread.
+
+        Args:
+            stream: Binary stream lines are written to
+            max_queued: Lines buffered before new ones are dropped
+            batch_size: Most lines joined into one write
+        """
+        self.stream = stream
+        self.batch_size = batch_size
+        self.queue: queue.Queue[bytes | None] = queue.Queue(max_queued)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, line: bytes) -> None:
+        """Queue a line; drops it if the queue is full."""
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Flush queued lines and stop the thread."""
+        if not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            lines = [self.queue.get()]
+            while len(lines) < self.batch_size:
+                try:
+                    lines.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in lines:
+                running = False
+                lines = [line for line in lines if line is not None]
+
+            if self.dropped:
+                with self._dropped_lock:
+                    dropped, self.dropped = self.dropped, 0
+                notice = {"event": "Log lines dropped", "count": dropped, "level": "warning"}
+                lines.append(render_orjson(None, "warning", notice))
+
+            try:
+                self.stream.write(b"".join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                # Stream closed (e.g. at interpreter shutdown); nothing to report to
+                pass
+
+
+class QueueLogger:
+    """structlog logger handing rendered lines to a QueueWriter."""
+
+    def __init__(self, writer: QueueWriter) -> None:
+        self.writer = writer
+
+    def msg(self, message: bytes) -> None:
+        self.writer.write(message)
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
 def _add_trace_context(
     logger: logging.Logger, method_name: str, event_dict: dict[str, Any]
 ) -> dict[str, Any]:
@@ -1,10 +1,11 @@
 """Observability and telemetry setup."""
 
-from typing import Any
+from typing import Any, Mapping
 
 from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 from opentelemetry.instrumentation.redis import RedisInstrumentor
 from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
 from opentelemetry.sdk.resources import Resource
@@ -13,6 +14,8 @@ from opentelemetry.sdk.trace.export import BatchSpanProcessor
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 
+from .sampling import RouteRatioSampler, TailSamplingSpanProcessor
+
 
 def setup_observability(
     service_name: str,
@@ -21,9 +24,18 @@ def setup_observability(
     otlp_endpoint: str,
     sentry_dsn: str | None = None,
     sample_rate: float = 1.0,
+    app: Any | None = None,
+    route_sample_rates: Mapping[str, float] | None = None,
+    tail_sampling: bool = False,
+    tail_slow_threshold_ms: float = 0.0,
+    sentry_sample_rate: float | None = None,
 ) -> None:
     """Setup OpenTelemetry and Sentry.
 
+    Outgoing httpx requests get client spans and carry the trace context, so
+    calls between services join one trace. ClickHouse clients are traced by
+    wrapping them in `ayvlo_common.clickhouse.TracedClient`.
+
     Args:
         service_name: Name of the service
         service_namespace: Service namespace
@@ -31,6 +43,16 @@ def setup_observability(
         otlp_endpoint: OTLP collector endpoint
         sentry_dsn: Sentry DSN (optional)
         sample_rate: Trace sampling rate (0.0-1.0)
+        app: FastAPI application to instrument; must be called before the app
+            starts. Without it, only apps created after this call are instrumented
+        route_sample_rates: Sampling rate overrides by route prefix
+        tail_sampling: Also keep traces that are slower than the rolling p99
+            or that failed, whatever the sampling rate; every trace is then
+            recorded in memory until its root span ends
+        tail_slow_threshold_ms: With tail sampling, always keep traces slower
+            than this; 0 disables
+        sentry_sample_rate: Sentry transaction and profile sampling rate;
+            defaults to `sample_rate`
     """
     # OpenTelemetry setup
     resource = Resource.create(
@@ -41,26 +63,39 @@ def setup_observability(
         }
     )
 
-    provider = TracerProvider(resource=resource)
+    # Follow the caller's sampling decision so a trace is kept or dropped whole
+    provider = TracerProvider(
+        resource=resource,
+        sampler=RouteRatioSampler(sample_rate, route_sample_rates, record_all=tail_sampling),
+    )
 
     # OTLP exporter
     otlp_exporter = OTLPSpanExporter(endpoint=f"{otlp_endpoint}/v1/traces")
-    provider.add_span_processor(BatchSpanProcessor(otlp_exporter))
+    processor = BatchSpanProcessor(otlp_exporter)
+    if tail_sampling:
+        processor = TailSamplingSpanProcessor(processor, slow_threshold_ms=tail_slow_threshold_ms)
+    provider.add_span_processor(processor)
 
     trace.set_tracer_provider(provider)
 
     # Auto-instrumentation
-    FastAPIInstrumentor().instrument()
+    if app is not None:
+        FastAPIInstrumentor.instrument_app(app, tracer_provider=provider)
+    else:
+        FastAPIInstrumentor().instrument()
+    HTTPXClientInstrumentor().instrument()
     SQLAlchemyInstrumentor().instrument()
     RedisInstrumentor().instrument()
 
     # Sentry setup
     if sentry_dsn:
+        if sentry_sample_rate is None:
+            sentry_sample_rate = sample_rate
         sentry_sdk.init(
             dsn=sentry_dsn,
             environment=deployment_environment,
-            traces_sample_rate=sample_rate,
-            profiles_sample_rate=sample_rate,
+            traces_sample_rate=sentry_sample_rate,
+            profiles_sample_rate=sentry_sample_rate,
             integrations=[FastApiIntegration()],
         )
 
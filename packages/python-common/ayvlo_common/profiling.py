@@ -0,0 +1,332 @@
+"""Opt-in, per-request profiling for ASGI services."""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import pstats
+import random
+import re
+import secrets
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import structlog
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # optional; profiles fall back to cProfile
+    PyinstrumentProfiler = None
+
+logger = structlog.get_logger()
+
+# Request header asking for the request to be profiled
+PROFILE_HEADER = "X-Ayvlo-Profile"
+# Shared secret authorizing the profile header on internal services
+PROFILE_TOKEN_HEADER = "X-Ayvlo-Profile-Token"
+# Response header with the path the stored profile can be fetched from
+PROFILE_LOCATION_HEADER = "X-Ayvlo-Profile-Location"
+PROFILES_PATH = "/debug/profiles/"
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{16}$")
+
+# cProfile cannot run two profilers at once in one interpreter
+_cprofile_active = False
+
+Scope = dict[str, Any]
+ASGIApp = Callable[[Scope, Callable, Callable], Awaitable[None]]
+
+
+def _header(scope: Scope, name: str) -> bytes | None:
+    name_bytes = name.lower().encode()
+    for key, value in scope["headers"]:
+        if key == name_bytes:
+            return value
+    return None
+
+
+def token_authorizer(token: str) -> Callable[[Scope], bool]:
+    """Authorize requests carrying a shared profiling token.
+
+    Args:
+        token: Expected value of the X-Ayvlo-Profile-Token header; an empty
+            token authorizes nothing
+
+    Returns:
+        Authorization callable for ProfilingMiddleware
+    """
+
+    def authorize(scope: Scope) -> bool:
+        supplied = _header(scope, PROFILE_TOKEN_HEADER)
+        return bool(token) and supplied is not None and hmac.compare_digest(supplied, token.encode())
+
+    return authorize
+
+
+def role_authorizer(role: str = "admin") -> Callable[[Scope], bool]:
+    """Authorize requests whose authenticated user has a role.
+
+    Relies on an outer authentication middleware having set `request.state.roles`.
+
+    Args:
+        role: Required role
+
+    Returns:
+        Authorization callable for ProfilingMiddleware
+    """
+
+    def authorize(scope: Scope) -> bool:
+        return role in scope.get("state", {}).get("roles", [])
+
+    return authorize
+
+
+class FileProfileStore:
+    """Profiles kept as files in a local directory, pruned after a TTL."""
+
+    def __init__(self, directory: str, ttl_seconds: int = 900) -> None:
+        """Initialize the store.
+
+        Args:
+            directory: Directory for profile files; created on first save
+            ttl_seconds: Age after which profiles are deleted
+        """
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+
+    async def save(self, profile_id: str, body: str, content_type: str) -> None:
+        """Store a profile and prune expired ones."""
+        await asyncio.to_thread(self._write, profile_id, body, content_type)
+
+    async def load(self, profile_id: str) -> tuple[str, str] | None:
+        """Return (body, content type) of a stored profile, or None."""
+        return await asyncio.to_thread(self._read, profile_id)
+
+    def _write(self, profile_id: str, body: str, content_type: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        expired = time.time() - self.ttl_seconds
+        for path in self.directory.glob("*.profile"):
+            try:
+                if path.stat().st_mtime < expired:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+        (self.directory / f"{profile_id}.profile").write_text(f"{content_type}\n{body}")
+
+    def _read(self, profile_id: str) -> tuple[str, str] | None:
+        path = self.directory / f"{profile_id}.profile"
+        try:
+            if path.stat().st_mtime < time.time() - self.ttl_seconds:
+                return None
+            content_type, body = path.read_text().split("\n", 1)
+        except FileNotFoundError:
+            return None
+        return body, content_type
+
+
+class RedisProfileStore:
+    """Profiles kept in Redis with a TTL, readable from any replica."""
+
+    def __init__(
+        self,
+        get_client: Callable[[], Any],
+        ttl_seconds: int = 900,
+        prefix: str = "profile",
+    ) -> None:
+        """Initialize the store.
+
+        Args:
+            get_client: Returns the redis.asyncio client (decode_responses=True)
+            ttl_seconds: Seconds a profile stays readable
+            prefix: Redis key prefix
+        """
+        self.get_client = get_client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    async def save(self, profile_id: str, body: str, content_type: str) -> None:
+        """Store a profile."""
+        async with self.get_client().pipeline(transaction=True) as pipe:
+            key = f"{self.prefix}:{profile_id}"
+            pipe.hset(key, mapping={"content_type": content_type, "body": body})
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+
+    async def load(self, profile_id: str) -> tuple[str, str] | None:
+        """Return (body, content type) of a stored profile, or None."""
+        fields = await self.get_client().hgetall(f"{self.prefix}:{profile_id}")
+        if not fields:
+            return None
+        return fields["body"], fields["content_type"]
+
+
+class _PyinstrumentSession:
+    """Statistical profile of the request's task, including time across awaits."""
+
+    def __init__(self) -> None:
+        self.profiler = PyinstrumentProfiler(interval=0.001, async_mode="enabled")
+        self.profiler.start()
+
+    def stop(self) -> tuple[str, str]:
+        self.profiler.stop()
+        return self.profiler.output_html(), "text/html; charset=utf-8"
+
+
+class _CProfileSession:
+    """Deterministic profile of the event loop thread while the request runs."""
+
+    def __init__(self) -> None:
+        global _cprofile_active
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        _cprofile_active = True
+
+    def stop(self) -> tuple[str, str]:
+        global _cprofile_active
+        self.profiler.disable()
+        _cprofile_active = False
+
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(60)
+        return out.getvalue(), "text/plain; charset=utf-8"
+
+
+def _start_session() -> _PyinstrumentSession | _CProfileSession | None:
+    if PyinstrumentProfiler is not None:
+        return _PyinstrumentSession()
+    if _cprofile_active:
+        return None
+    try:
+        return _CProfileSession()
+    except ValueError:
+        # Another profiler (e.g. a tracing agent's) already owns the hook
+        return None
+
+
+class ProfilingMiddleware:
+    """Runs selected requests under a profiler and stores the result.
+
+    A request is profiled when it carries `X-Ayvlo-Profile: 1` and passes
+    `authorize`, or when it is picked by 1-in-`sample_every` background
+    sampling. Explicit requests get an `X-Ayvlo-Profile-Location` response
+    header pointing at `GET /debug/profiles/<id>`, which serves the profile
+    to authorized callers until the store's TTL expires. Sampled profiles are
+    only logged with their id.
+
+    Profiles use pyinstrument (HTML, async-aware) when it is installed and
+    cProfile (text) otherwise. Both cover the event loop thread only; work
+    handed to worker threads shows up as time spent awaiting it. Requests
+    that are not profiled cost one header lookup.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: FileProfileStore | RedisProfileStore,
+        authorize: Callable[[Scope], bool],
+        sample_every: int = 0,
+    ) -> None:
+        """Initialize the middleware.
+
+        Args:
+            app: ASGI application
+            store: Where profiles are kept
+            authorize: Decides whether a request may ask for, or read, a profile
+            sample_every: Profile one in this many requests at random; 0 disables
+        """
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+        self.sample_every = sample_every
+
+    async def __call__(self, scope: Scope, receive: Callable, send: Callable) -> None:
+        """Profile the request if asked to or sampled, otherwise pass it through."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"].startswith(PROFILES_PATH):
+            await self._serve(scope, send)
+            return
+
+        flag = _header(scope, PROFILE_HEADER)
+        requested = flag is not None and flag not in (b"", b"0") and self.authorize(scope)
+        sampled = (
+            not requested
+            and self.sample_every > 0
+            and random.randrange(self.sample_every) == 0
+        )
+        if not (requested or sampled):
+            await self.app(scope, receive, send)
+            return
+
+        session = _start_session()
+        if session is None:
+            # Another request holds the (single) cProfile profiler
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = secrets.token_hex(8)
+        status = None
+
+        async def send_with_location(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    location = f"{PROFILES_PATH}{profile_id}".encode()
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (PROFILE_LOCATION_HEADER.lower().encode(), location),
+                        ],
+                    }
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_location)
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            body, content_type = session.stop()
+            try:
+                await self.store.save(profile_id, body, content_type)
+                logger.info(
+                    "Request profiled",
+                    profile_id=profile_id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status,
+                    duration_ms=duration_ms,
+                    sampled=sampled,
+                )
+            except Exception as e:
+                logger.warning("Failed to store profile", exc_info=e, profile_id=profile_id)
+
+    async def _serve(self, scope: Scope, send: Callable) -> None:
+        profile_id = scope["path"][len(PROFILES_PATH):]
+        found = None
+        if self.authorize(scope) and _PROFILE_ID.match(profile_id):
+            found = await self.store.load(profile_id)
+
+        if found is None:
+            status, body, content_type = 404, "Profile not found", "text/plain; charset=utf-8"
+        else:
+            status = 200
+            body, content_type = found
+
+        payload = body.encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", content_type.encode()),
+                    (b"content-length", str(len(payload)).encode()),
+                    (b"cache-control", b"no-store"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": payload})
@@ -0,0 +1,233 @@
+"""Head and tail trace sampling."""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Mapping, Sequence
+
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult
+from opentelemetry.trace import Link, SpanKind, StatusCode, TraceState
+from opentelemetry.util.types import Attributes
+
+# Tracestate entry marking traces kept by the head decision; it travels with
+# the trace so every service agrees on which fast traces to keep
+TRACESTATE_KEY = "ayvlo"
+TRACESTATE_HEAD = "head"
+
+_ROUTE_ATTRIBUTES = ("http.route", "url.path", "http.target")
+_TRACE_ID_LIMIT = 1 << 64
+
+
+class RouteRatioSampler(Sampler):
+    """Parent-based ratio sampler with per-route ratios.
+
+    Root spans are kept with the ratio of the longest route prefix matching
+    their `http.route` (or path), falling back to `ratio`; child spans and
+    spans continuing a remote trace follow their parent. Routes overridden
+    with a ratio of 0 are never recorded.
+
+    With `record_all`, traces the ratio would drop are still recorded and
+    flagged sampled, so a `TailSamplingSpanProcessor` downstream sees them
+    whole and can keep the slow or failed ones. Traces kept by the ratio
+    carry an `ayvlo=head` tracestate entry instead of being dropped.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 1.0,
+        route_ratios: Mapping[str, float] | None = None,
+        record_all: bool = False,
+    ) -> None:
+        """Initialize the sampler.
+
+        Args:
+            ratio: Fraction of root traces kept (0.0-1.0)
+            route_ratios: Ratio overrides by route prefix, e.g. {"/health": 0.0}
+            record_all: Record every trace for tail sampling
+        """
+        self.ratio = ratio
+        # Longest prefix first, so the most specific override wins
+        self.route_ratios = sorted((route_ratios or {}).items(), key=lambda item: -len(item[0]))
+        self.record_all = record_all
+
+    def should_sample(
+        self,
+        parent_context: Context | None,
+        trace_id: int,
+        name: str,
+        kind: SpanKind | None = None,
+        attributes: Attributes = None,
+        links: Sequence[Link] | None = None,
+        trace_state: TraceState | None = None,
+    ) -> SamplingResult:
+        parent = trace.get_current_span(parent_context).get_span_context()
+        if parent.is_valid:
+            decision = Decision.RECORD_AND_SAMPLE if parent.trace_flags.sampled else Decision.DROP
+            return SamplingResult(decision, None, parent.trace_state)
+
+        ratio = self._route_ratio(attributes)
+        if ratio is None:
+            ratio = self.ratio
+        elif ratio <= 0.0:
+            return SamplingResult(Decision.DROP)
+
+        # Same rule as TraceIdRatioBased, so the decision is stable per trace
+        head = (trace_id & (_TRACE_ID_LIMIT - 1)) < ratio * _TRACE_ID_LIMIT
+        if not self.record_all:
+            return SamplingResult(Decision.RECORD_AND_SAMPLE if head else Decision.DROP)
+
+        state = TraceState([(TRACESTATE_KEY, TRACESTATE_HEAD)]) if head else None
+        return SamplingResult(Decision.RECORD_AND_SAMPLE, None, state)
+
+    def get_description(self) -> str:
+        return f"RouteRatioSampler{{ratio={self.ratio}, routes={len(self.route_ratios)}, record_all={self.record_all}}}"
+
+    def _route_ratio(self, attributes: Attributes) -> float | None:
+        if attributes and self.route_ratios:
+            for name in _ROUTE_ATTRIBUTES:
+                route = attributes.get(name)
+                if isinstance(route, str):
+                    for prefix, ratio in self.route_ratios:
+                        if route.startswith(prefix):
+                            return ratio
+                    break
+        return None
+
+
+class RollingQuantile:
+    """Quantile of the most recent observations, recomputed in batches."""
+
+    def __init__(self, quantile: float = 0.99, window: int = 1000, min_samples: int = 100) -> None:
+        """Initialize the estimator.
+
+        Args:
+            quantile: Quantile tracked (0.0-1.0)
+            window: Number of recent observations kept
+            min_samples: Observations needed before a threshold is reported
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.values: deque[int] = deque(maxlen=window)
+        # Re-sorting the window costs O(n log n); do it every tenth of a window
+        self._recompute_every = max(1, window // 10)
+        self._pending = 0
+        self.threshold: int | None = None
+
+    def observe(self, value: int) -> None:
+        """Add an observation."""
+        self.values.append(value)
+        self._pending += 1
+        if len(self.values) >= self.min_samples and (
+            self.threshold is None or self._pending >= self._recompute_every
+        ):
+            ordered = sorted(self.values)
+            self.threshold = ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))]
+            self._pending = 0
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """Buffers each trace's spans and exports only the traces worth keeping.
+
+    A trace's spans are held until its local root span (the first span of the
+    trace in this process) ends. The trace is then forwarded to `processor`
+    when any of the following holds; otherwise it is dropped:
+
+    - it carries the head decision (`ayvlo=head` tracestate);
+    - any of its spans ended with an error status;
+    - the root ran longer than the rolling p99 of that root span name;
+    - the root ran longer than `slow_threshold_ms`.
+
+    Spans ending after their root follow the decision already made. Buffering
+    is bounded by `max_traces`; the oldest undecided trace is dropped when it
+    is exceeded.
+
+    Use with a `RouteRatioSampler(record_all=True)` in every service, so
+    traces arrive whole and services agree on the head decision.
+    """
+
+    def __init__(
+        self,
+        processor: SpanProcessor,
+        quantile: float = 0.99,
+        slow_threshold_ms: float = 0.0,
+        max_traces: int = 10_000,
+        window: int = 1000,
+    ) -> None:
+        """Initialize the processor.
+
+        Args:
+            processor: Processor kept traces are passed to, e.g. a BatchSpanProcessor
+            quantile: Latency quantile above which traces count as slow
+            slow_threshold_ms: Traces slower than this are always kept; 0 disables
+            max_traces: Most traces buffered at once
+            window: Recent root durations per span name the quantile is taken over
+        """
+        self.processor = processor
+        self.quantile = quantile
+        self.slow_threshold_ns = int(slow_threshold_ms * 1_000_000)
+        self.max_traces = max_traces
+        self.window = window
+        self._lock = threading.Lock()
+        self._buffers: OrderedDict[int, list[ReadableSpan]] = OrderedDict()
+        self._decisions: OrderedDict[int, bool] = OrderedDict()
+        self._latency: dict[str, RollingQuantile] = {}
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self.processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if not span.context.trace_flags.sampled:
+            return
+
+        trace_id = span.context.trace_id
+        with self._lock:
+            decision = self._decisions.get(trace_id)
+            if decision is None:
+                buffered = self._buffers.get(trace_id)
+                if buffered is None:
+                    buffered = self._buffers[trace_id] = []
+                    if len(self._buffers) > self.max_traces:
+                        self._buffers.popitem(last=False)
+                buffered.append(span)
+
+                if span.parent is not None and not span.parent.is_remote:
+                    return
+
+                # Local root ended: decide for the whole trace
+                spans = self._buffers.pop(trace_id)
+                decision = self._keep(span, spans)
+                self._decisions[trace_id] = decision
+                if len(self._decisions) > self.max_traces:
+                    self._decisions.popitem(last=False)
+            elif decision:
+                spans = [span]
+            else:
+                return
+
+        if decision:
+            for kept in spans:
+                self.processor.on_end(kept)
+
+    def _keep(self, root: ReadableSpan, spans: list[ReadableSpan]) -> bool:
+        duration = (root.end_time or 0) - (root.start_time or 0)
+        latency = self._latency.get(root.name)
+        if latency is None:
+            latency = self._latency[root.name] = RollingQuantile(self.quantile, self.window)
+        threshold = latency.threshold
+        latency.observe(duration)
+
+        if root.context.trace_state.get(TRACESTATE_KEY) == TRACESTATE_HEAD:
+            return True
+        if any(span.status.status_code is StatusCode.ERROR for span in spans):
+            return True
+        if threshold is not None and duration > threshold:
+            return True
+        return bool(self.slow_threshold_ns) and duration > self.slow_threshold_ns
+
+    def shutdown(self) -> None:
+        self.processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.processor.force_flush(timeout_millis)
@@ -0,0 +1,66 @@
+"""Packed binary encoding for (timestamp, value) series exchanged between services."""
+
+import struct
+
+import numpy as np
+
+SERIES_MEDIA_TYPE = "application/vnd.ayvlo.series"
+
+# Header: magic, format version, reserved, point count. 16 bytes keeps the
+# int64/float64 columns that follow 8-byte aligned.
+_HEADER = struct.Struct("<4sHHQ")
+_MAGIC = b"AYSR"
+_VERSION = 1
+
+
+class SeriesFormatError(ValueError):
+    """Payload is not a valid packed series."""
+
+    pass
+
+
+def encode_series(timestamps_ms: np.ndarray, values: np.ndarray) -> bytes:
+    """Pack a series as header + little-endian int64 epoch-ms + float64 values.
+
+    Args:
+        timestamps_ms: Milliseconds since the Unix epoch (UTC)
+        values: Values aligned with timestamps_ms
+
+    Returns:
+        Encoded payload
+    """
+    if len(timestamps_ms) != len(values):
+        raise ValueError("timestamps and values must have the same length")
+
+    ts = np.ascontiguousarray(timestamps_ms, dtype="<i8")
+    vals = np.ascontiguousarray(values, dtype="<f8")
+    return b"".join((_HEADER.pack(_MAGIC, _VERSION, 0, len(ts)), ts.data, vals.data))
+
+
+def decode_series(payload: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """Unpack a series without copying the column data.
+
+    Args:
+        payload: Bytes produced by encode_series
+
+    Returns:
+        (timestamps as datetime64[ms], values as float64), both read-only views
+        over payload
+
+    Raises:
+        SeriesFormatError: If the payload is malformed
+    """
+    if len(payload) < _HEADER.size:
+        raise SeriesFormatError("Payload shorter than header")
+
+    magic, version, _, count = _HEADER.unpack_from(payload)
+    if magic != _MAGIC or version != _VERSION:
+        raise SeriesFormatError(f"Unsupported series payload (magic={magic!r}, version={version})")
+
+    expected = _HEADER.size + 16 * count
+    if len(payload) != expected:
+        raise SeriesFormatError(f"Expected {expected} bytes, got {len(payload)}")
+
+    timestamps = np.frombuffer(payload, dtype="<i8", count=count, offset=_HEADER.size)
+    values = np.frombuffer(payload, dtype="<f8", count=count, offset=_HEADER.size + 8 * count)
+    return timestamps.view("datetime64[ms]"), values
@@ -0,0 +1,212 @@
+"""Request coalescing: concurrent identical calls share one execution."""
+
+import asyncio
+import hashlib
+import json
+import secrets
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Delete the lock only if it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def flight_key(namespace: str, **params: Any) -> str:
+    """Normalized key for a call: identical parameters give identical keys.
+
+    Args:
+        namespace: Kind of call, e.g. "metrics.query"
+        **params: Call parameters; dicts are compared irrespective of order
+
+    Returns:
+        Key of the form `<namespace>:<sha256 of the parameters>`
+    """
+    payload = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+    return f"{namespace}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+class SingleFlight:
+    """In-process singleflight.
+
+    The first caller for a key starts the computation as a task; callers that
+    arrive while it runs await the same task. A caller that is cancelled (e.g.
+    a client disconnect) does not cancel the computation for the others.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with no calls in flight."""
+        self._calls: dict[str, asyncio.Task] = {}
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        dumps: Callable[[T], str] | None = None,
+        loads: Callable[[str], T] | None = None,
+    ) -> T:
+        """Run fn once per key among concurrent callers and return its result.
+
+        Args:
+            key: Normalized call key (see flight_key)
+            fn: Zero-argument coroutine function computing the result
+            dumps: Unused in-process; see RedisSingleFlight
+            loads: Unused in-process; see RedisSingleFlight
+
+        Returns:
+            The result of fn, shared by every caller with the same key
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+
+class RedisSingleFlight(SingleFlight):
+    """Singleflight across processes, coordinated through Redis.
+
+    Calls are first coalesced in-process. The local leader then takes a Redis
+    lock for the key: the lock holder computes and publishes the serialized
+    result for `result_ttl` seconds, while leaders in other processes poll for
+    it. If the holder dies or fails, the lock expires or is released without a
+    result, and the waiters compute it themselves.
+    """
+
+    def __init__(
+        self,
+        get_client: Callable[[], Any],
+        lock_ttl: float = 30.0,
+        result_ttl: float = 2.0,
+        poll_interval: float = 0.02,
+        prefix: str = "singleflight",
+    ) -> None:
+        """Initialize the cross-process singleflight.
+
+        Args:
+            get_client: Returns the redis.asyncio client; called per use, so the
+                instance can be built before the service connects
+            lock_ttl: Seconds before an abandoned lock expires; should exceed
+                the slowest computation
+            result_ttl: Seconds a published result stays readable for waiters
+            poll_interval: Initial delay between polls for a result
+            prefix: Redis key prefix
+        """
+        super().__init__()
+        self.get_client = get_client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self._release = None
+
+    @property
+    def client(self) -> Any:
+        return self.get_client()
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        dumps: Callable[[T], str] | None = None,
+        loads: Callable[[str], T] | None = None,
+    ) -> T:
+        """Run fn once per key across processes and return its result.
+
+        Args:
+            key: Normalized call key (see flight_key)
+            fn: Zero-argument coroutine function computing the result
+            dumps: Serializes a result for other processes
+            loads: Deserializes a published result
+
+        Returns:
+            The result of fn; without dumps/loads, calls are only coalesced
+            in-process
+        """
+        if dumps is None or loads is None:
+            return await super().do(key, fn)
+        return await super().do(key, lambda: self._lead(key, fn, dumps, loads))
+
+    async def _lead(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        dumps: Callable[[T], str],
+        loads: Callable[[str], T],
+    ) -> T:
+        lock_key = f"{self.prefix}:lock:{key}"
+        result_key = f"{self.prefix}:result:{key}"
+        token = secrets.token_hex(8)
+        deadline = time.monotonic() + self.lock_ttl
+        delay = self.poll_interval
+
+        try:
+            while True:
+                # Checked before and after taking the lock: a holder may publish
+                # and release between our read and our SET
+                published = await self.client.get(result_key)
+                if published is None and await self.client.set(
+                    lock_key, token, nx=True, px=int(self.lock_ttl * 1000)
+                ):
+                    published = await self.client.get(result_key)
+                    if published is None:
+                        break
+                    await self._unlock(lock_key, token)
+
+                if published is not None:
+                    self.shared += 1
+                    return loads(published)
+                if time.monotonic() > deadline:
+                    logger.warning("Singleflight wait timed out", key=key)
+                    return await fn()
+
+                # Another process is computing: wait for its result
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.25)
+        except Exception as e:
+            # Redis trouble must not fail the request; compute without coordination
+            logger.warning("Singleflight coordination failed", exc_info=e, key=key)
+            return await fn()
+
+        try:
+            result = await fn()
+            try:
+                await self.client.set(result_key, dumps(result), px=int(self.result_ttl * 1000))
+            except Exception as e:
+                logger.warning("Failed to publish singleflight result", exc_info=e, key=key)
+            return result
+        finally:
+            try:
+                await self._unlock(lock_key, token)
+            except Exception as e:
+                logger.warning("Failed to release singleflight lock", exc_info=e, key=key)
+
+    async def _unlock(self, lock_key: str, token: str) -> None:
+        if self._release is None:
+            self._release = self.client.register_script(_RELEASE_SCRIPT)
+        await self._release(keys=[lock_key], args=[token])
@@ -1,18 +1,42 @@
 """Anomalies API endpoints"""
 
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from datetime import datetime, timezone
 from typing import Optional
-import structlog
+import asyncio
+import time
 import httpx
+import numpy as np
+import structlog
 
-from app.models.anomaly import DetectRequest, DetectResponse, AnomalyPoint, DetectionSummary
+from ayvlo_common.serialization import JSON_MEDIA_TYPE, dumps
+from ayvlo_common.singleflight import flight_key
+
+from app.models.anomaly import (
+    DetectRequest,
+    DetectResponse,
+    AnomalyPoint,
+    DetectionSummary,
+    ExplainRequest,
+    Explanation,
+    SliceDetectRequest,
+    SliceDetectResponse,
+)
+from app.models.monitor import MonitorCreate, MonitorList, MonitorStatus
 from app.core.config import settings
-from app.ml.detector import AnomalyDetector
-from app.main import get_detector
+from app.core.metric_data import fetch_dimension_breakdown, fetch_metric_data, fetch_slice_matrix
+from app.core.sharding import FORWARDED_HEADER, shard_membership
+from app.core.singleflight import detect_flights
+from app.scheduler.store import monitor_store
+from app.ml.detector import AnomalyDetector, get_detector
+from app.ml.explain import anomaly_window, explainer, naive_utc, preceding_baseline
+from app.ml.multiseries import detect_slices, slice_screen
 
 logger = structlog.get_logger()
 router = APIRouter()
 
+ANOMALY_POINT_FIELDS = tuple(AnomalyPoint.model_fields)
+
 
 async def get_tenant_id(x_tenant_id: Optional[str] = Header(None)) -> str:
     """Extract tenant ID from header"""
@@ -26,153 +50,419 @@ async def detect_anomalies(
     request: DetectRequest,
     tenant_id: str = Depends(get_tenant_id),
     detector: AnomalyDetector = Depends(get_detector),
+    forwarded_by: Optional[str] = Header(None, alias=FORWARDED_HEADER),
 ):
     """
     Detect anomalies in a metric using ML ensemble.
 
     Process:
-    1. Fetch metric data from Metrics Service
-    2. Run Prophet + IsolationForest detection
-    3. Ensemble voting (2/3 agreement)
-    4. Return anomalies with severity
+    1. Forward to the replica owning the series (when sharding is enabled)
+    2. Fetch metric data from ClickHouse (or the Metrics Service)
+    3. Run Prophet + IsolationForest detection
+    4. Ensemble voting (2/3 agreement)
+    5. With `explain`, rank the dimension values behind the anomalous window
+    6. Return anomalies with severity
     """
 
+    if settings.SHARDING_ENABLED and not forwarded_by:
+        owner = shard_membership.owner(tenant_id, request.metric_name)
+        if owner != shard_membership.node_url:
+            payload = await forward_detect(owner, request, tenant_id)
+            if payload is not None:
+                return Response(content=payload, media_type=JSON_MEDIA_TYPE)
+
+    # Identical concurrent requests (dashboards, alert checks) share one
+    # fetch + detection
+    key = flight_key(
+        "anomalies.detect",
+        tenant_id=tenant_id,
+        metric_name=request.metric_name,
+        start_time=request.start_time.isoformat(),
+        end_time=request.end_time.isoformat(),
+        dimensions=request.dimensions,
+        explain=request.explain,
+    )
+
     try:
-        # Fetch metric data from Metrics Service
-        logger.info(
-            "Fetching metric data",
-            tenant_id=tenant_id,
-            metric=request.metric_name,
-            start=request.start_time,
-            end=request.end_time,
+        payload = await detect_flights.do(
+            key,
+            lambda: run_detection(request, tenant_id, detector),
+            dumps=bytes.decode,
+            loads=str.encode,
         )
+        return Response(content=payload, media_type=JSON_MEDIA_TYPE)
 
-        metric_data = await fetch_metric_data(
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Anomaly detection failed", exc_info=e, tenant_id=tenant_id)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def run_detection(
+    request: DetectRequest,
+    tenant_id: str,
+    detector: AnomalyDetector,
+) -> bytes:
+    """Fetch the requested series, run the ensemble on it and encode the DetectResponse"""
+
+    logger.debug(
+        "Fetching metric data",
+        tenant_id=tenant_id,
+        metric=request.metric_name,
+        start=request.start_time,
+        end=request.end_time,
+    )
+
+    timestamps, values = await fetch_metric_data(
+        tenant_id=tenant_id,
+        metric_name=request.metric_name,
+        start_time=request.start_time.isoformat(),
+        end_time=request.end_time.isoformat(),
+        dimensions=request.dimensions,
+    )
+
+    if len(values) == 0:
+        return DetectResponse(
+            metric_name=request.metric_name,
+            tenant_id=tenant_id,
+            anomalies=[],
+            summary=DetectionSummary(
+                total_points=0,
+                anomaly_count=0,
+                severity="none",
+                error="No metric data found for specified time range",
+            ),
+        ).model_dump_json().encode()
+
+    logger.debug(
+        "Running anomaly detection",
+        metric=request.metric_name,
+        data_points=len(timestamps),
+    )
+
+    # Run ML detection off the event loop
+    result = await asyncio.to_thread(
+        detector.detect,
+        timestamps=timestamps,
+        values=values,
+        metric_name=request.metric_name,
+    )
+
+    summary = DetectionSummary(**result["summary"])
+
+    logger.info(
+        "Anomaly detection complete",
+        tenant_id=tenant_id,
+        metric=request.metric_name,
+        anomalies=len(result["anomalies"]),
+        severity=summary.severity,
+    )
+
+    explanation = None
+    if request.explain and result["anomalies"]:
+        explanation = await explain_anomalies(request, tenant_id, timestamps, result["anomalies"])
+
+    # Encoded directly rather than through one AnomalyPoint per point; the
+    # detector already produces points of that shape
+    return dumps({
+        "metric_name": request.metric_name,
+        "tenant_id": tenant_id,
+        "anomalies": [
+            {field: point[field] for field in ANOMALY_POINT_FIELDS}
+            for point in result["anomalies"]
+        ],
+        "summary": summary.model_dump(),
+        "algorithms": result.get("algorithms"),
+        "explanation": explanation,
+    })
+
+
+async def explain_anomalies(
+    request: DetectRequest,
+    tenant_id: str,
+    timestamps: np.ndarray,
+    anomalies: list[dict],
+) -> Optional[dict]:
+    """
+    Explain the window spanned by the detected anomalies against the rest of
+    the requested range before it.
+
+    Returns None if the breakdown fails; detection results are returned
+    either way.
+    """
+
+    window = anomaly_window(timestamps, anomalies)
+    baseline = preceding_baseline(window, naive_utc(request.start_time))
+
+    try:
+        breakdown = await fetch_dimension_breakdown(
             tenant_id=tenant_id,
             metric_name=request.metric_name,
-            start_time=request.start_time.isoformat(),
-            end_time=request.end_time.isoformat(),
+            window=window,
+            baseline=baseline,
             dimensions=request.dimensions,
         )
+    except Exception as e:
+        logger.warning("Anomaly explanation failed", exc_info=e, metric=request.metric_name)
+        return None
 
-        if not metric_data:
-            return DetectResponse(
-                metric_name=request.metric_name,
-                tenant_id=tenant_id,
-                anomalies=[],
-                summary=DetectionSummary(
-                    total_points=0,
-                    anomaly_count=0,
-                    severity="none",
-                    error="No metric data found for specified time range",
-                ),
-            )
+    return explainer.explain(breakdown, request.metric_name, window, baseline)
 
-        # Extract timestamps and values
-        timestamps = [point["timestamp"] for point in metric_data]
-        values = [point["value"] for point in metric_data]
 
-        logger.info(
-            "Running anomaly detection",
-            metric=request.metric_name,
-            data_points=len(timestamps),
-        )
+@router.post("/explain", response_model=Explanation)
+async def explain_change(
+    request: ExplainRequest,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Explain a change in a metric by dimension.
 
-        # Run ML detection
-        result = detector.detect(
-            timestamps=timestamps,
-            values=values,
-            metric_name=request.metric_name,
-        )
+    One ClickHouse query sums the metric by every dimension value over the
+    window and its baseline; the values whose change is largest and most
+    unlike the rest of their dimension are ranked as the root cause.
+    """
 
-        # Convert to response model
-        anomalies = [AnomalyPoint(**point) for point in result["anomalies"]]
-        summary = DetectionSummary(**result["summary"])
+    window = (naive_utc(request.start_time), naive_utc(request.end_time))
+    if window[1] <= window[0]:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    baseline = preceding_baseline(
+        window,
+        naive_utc(request.baseline_start) if request.baseline_start else None,
+    )
 
-        logger.info(
-            "Anomaly detection complete",
-            tenant_id=tenant_id,
-            metric=request.metric_name,
-            anomalies=len(anomalies),
-            severity=summary.severity,
-        )
+    breakdown = await fetch_dimension_breakdown(
+        tenant_id=tenant_id,
+        metric_name=request.metric_name,
+        window=window,
+        baseline=baseline,
+        dimensions=request.dimensions,
+    )
+    explanation = explainer.explain(breakdown, request.metric_name, window, baseline)
 
-        return DetectResponse(
-            metric_name=request.metric_name,
-            tenant_id=tenant_id,
-            anomalies=anomalies,
-            summary=summary,
-            algorithms=result.get("algorithms"),
+    logger.info(
+        "Change explained",
+        tenant_id=tenant_id,
+        metric=request.metric_name,
+        dimensions=len(explanation["dimensions"]),
+    )
+
+    return Response(content=dumps(explanation), media_type=JSON_MEDIA_TYPE)
+
+
+@router.post("/detect/slices", response_model=SliceDetectResponse)
+async def detect_anomalies_by_slice(
+    request: SliceDetectRequest,
+    tenant_id: str = Depends(get_tenant_id),
+    detector: AnomalyDetector = Depends(get_detector),
+):
+    """
+    Detect anomalies in every value of a dimension at once.
+
+    Process:
+    1. Fetch all slices as one time x slice matrix, summed per step, in a
+       single ClickHouse query
+    2. Screen the whole matrix with seasonal medians, EWMA and MAD
+    3. Run the ensemble on the most anomalous flagged slices (up to
+       SLICES_MAX_ESCALATIONS)
+    4. Return flagged slices only
+    """
+
+    start, end = naive_utc(request.start_time), naive_utc(request.end_time)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    buckets = (end - start).total_seconds() / request.step_seconds
+    if buckets > settings.SLICES_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{int(buckets)} time steps requested, at most {settings.SLICES_MAX_BUCKETS}; "
+                   "raise step_seconds or shorten the range",
         )
 
+    timestamps, slices, matrix = await fetch_slice_matrix(
+        tenant_id=tenant_id,
+        metric_name=request.metric_name,
+        start_time=request.start_time.isoformat(),
+        end_time=request.end_time.isoformat(),
+        key=request.dimension,
+        step_seconds=request.step_seconds,
+        dimensions=request.dimensions,
+    )
+
+    try:
+        result = await asyncio.to_thread(
+            detect_slices,
+            detector,
+            slice_screen,
+            request.metric_name,
+            timestamps,
+            slices,
+            matrix,
+            request.season_seconds // request.step_seconds,
+            settings.SLICES_MAX_ESCALATIONS if request.escalate else 0,
+        )
     except Exception as e:
-        logger.error("Anomaly detection failed", exc_info=e, tenant_id=tenant_id)
+        logger.error("Multi-series detection failed", exc_info=e, tenant_id=tenant_id)
         raise HTTPException(status_code=500, detail=str(e))
 
+    logger.info(
+        "Multi-series detection complete",
+        tenant_id=tenant_id,
+        metric=request.metric_name,
+        dimension=request.dimension,
+        slices=result["total_slices"],
+        flagged=result["flagged_slices"],
+        escalated=result["escalated_slices"],
+    )
 
-async def fetch_metric_data(
+    return Response(
+        content=dumps({
+            "metric_name": request.metric_name,
+            "tenant_id": tenant_id,
+            "dimension": request.dimension,
+            **result,
+        }),
+        media_type=JSON_MEDIA_TYPE,
+    )
+
+
+async def forward_detect(
+    owner: str,
+    request: DetectRequest,
     tenant_id: str,
-    metric_name: str,
-    start_time: str,
-    end_time: str,
-    dimensions: Optional[dict] = None,
-) -> list[dict]:
-    """Fetch metric data from Metrics Service"""
-
-    url = f"{settings.METRICS_SERVICE_URL}/api/v1/metrics/query"
-
-    payload = {
-        "metric_name": metric_name,
-        "start_time": start_time,
-        "end_time": end_time,
-        "dimensions": dimensions,
-        "aggregate": False,  # Need raw data for ML
-    }
+) -> Optional[bytes]:
+    """
+    Run detection on the replica owning the series, where its caches are warm.
 
-    headers = {"X-Tenant-ID": tenant_id}
+    Returns the owner's encoded DetectResponse, or None if the owner is
+    unreachable, so the caller detects locally.
+    """
+
+    url = f"{owner}/api/v1/anomalies/detect"
+    headers = {
+        "X-Tenant-ID": tenant_id,
+        FORWARDED_HEADER: shard_membership.node_url,
+    }
 
     async with httpx.AsyncClient() as client:
         try:
-            response = await client.post(url, json=payload, headers=headers, timeout=30.0)
-            response.raise_for_status()
+            response = await client.post(
+                url,
+                content=request.model_dump_json(),
+                headers={**headers, "Content-Type": "application/json"},
+                timeout=60.0,
+            )
+        except httpx.HTTPError as e:
+            logger.warning("Series owner unreachable, detecting locally", exc_info=e, owner=owner)
+            return None
 
-            data = response.json()
-            return data if data else []
+    if response.status_code >= 500:
+        logger.warning(
+            "Series owner failed, detecting locally",
+            owner=owner,
+            status=response.status_code,
+        )
+        return None
+    if response.status_code >= 400:
+        # A proxy in between may answer with a non-JSON body
+        try:
+            detail = response.json().get("detail")
+        except (ValueError, AttributeError):
+            detail = response.text
+        raise HTTPException(status_code=response.status_code, detail=detail)
 
-        except httpx.HTTPError as e:
-            logger.error(
-                "Failed to fetch metric data",
-                exc_info=e,
-                metric=metric_name,
-                url=url,
-            )
-            raise HTTPException(
-                status_code=502,
-                detail=f"Failed to fetch metric data from Metrics Service: {str(e)}",
-            )
+    return response.content
+
+
+def _isoformat(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+def _monitor_status(monitor: dict, now: float) -> MonitorStatus:
+    """API view of a stored monitor"""
+
+    next_due = monitor["next_due"]
+    overdue = now - next_due if next_due is not None and next_due < now else 0.0
 
+    if monitor["last_check"] is None:
+        status = "pending"
+    elif monitor["last_status"] == "error":
+        status = "error"
+    elif overdue > monitor["cadence_seconds"]:
+        status = "lagging"
+    else:
+        status = "active"
 
-@router.get("/metrics/{tenant_id}")
+    return MonitorStatus(
+        id=monitor["id"],
+        metric_name=monitor["metric_name"],
+        dimensions=monitor["dimensions"],
+        cadence_seconds=monitor["cadence_seconds"],
+        lookback_seconds=monitor["lookback_seconds"],
+        status=status,
+        last_check=_isoformat(monitor["last_check"]) if monitor["last_check"] else None,
+        next_check=_isoformat(next_due) if next_due is not None else None,
+        lag_seconds=round(overdue, 3) if overdue else monitor["lag_seconds"],
+        last_severity=monitor["last_severity"],
+        last_error=monitor["last_error"],
+        last_duration_ms=monitor["last_duration_ms"],
+        anomalies_detected=monitor["anomalies_detected"],
+    )
+
+
+@router.get("/metrics/{tenant_id}", response_model=MonitorList)
 async def list_monitored_metrics(tenant_id: str):
     """List all metrics being monitored for anomalies"""
 
-    # TODO: Implement metric tracking in database
-    # For now, return placeholder
+    monitors = await monitor_store.list_for_tenant(tenant_id)
+    now = time.time()
+
+    return MonitorList(
+        tenant_id=tenant_id,
+        monitored_metrics=[_monitor_status(monitor, now) for monitor in monitors],
+    )
+
+
+@router.post("/monitors", response_model=MonitorStatus, status_code=201)
+async def create_monitor(
+    request: MonitorCreate,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Monitor a metric series; detection runs every `cadence_seconds`"""
+
+    monitor = await monitor_store.upsert(
+        tenant_id=tenant_id,
+        metric_name=request.metric_name,
+        dimensions=request.dimensions,
+        cadence_seconds=request.cadence_seconds,
+        lookback_seconds=request.lookback_seconds,
+    )
+    logger.info("Monitor saved", tenant_id=tenant_id, monitor=monitor["id"], metric=request.metric_name)
+
+    return _monitor_status(monitor, time.time())
+
+
+@router.delete("/monitors/{monitor_id}", status_code=204)
+async def delete_monitor(
+    monitor_id: str,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Stop monitoring a series"""
+
+    if not await monitor_store.delete(tenant_id, monitor_id):
+        raise HTTPException(status_code=404, detail="Monitor not found")
+
+
+@router.get("/shards")
+async def shard_status():
+    """This replica's view of the shard ring"""
+
+    partitions = shard_membership.owned_partitions
 
     return {
-        "tenant_id": tenant_id,
-        "monitored_metrics": [
-            {
-                "metric_name": "revenue",
-                "status": "active",
-                "last_check": "2025-01-15T10:30:00Z",
-                "anomalies_detected": 3,
-            },
-            {
-                "metric_name": "signups",
-                "status": "active",
-                "last_check": "2025-01-15T10:30:00Z",
-                "anomalies_detected": 0,
-            },
-        ],
+        "node": shard_membership.node_url,
+        "sharding_enabled": settings.SHARDING_ENABLED,
+        "members": shard_membership.ring.members,
+        "owned_partitions": len(partitions),
+        "due_monitors": await monitor_store.backlog(time.time(), partitions),
     }
@@ -1,7 +1,9 @@
 """Health check endpoints"""
 
-from fastapi import APIRouter
-from app.core.redis import redis_client
+from fastapi import APIRouter, Response
+from app.core.config import settings
+from app.core.health import health_monitor
+from app.ml.registry import backends
 import structlog
 
 logger = structlog.get_logger()
@@ -19,25 +21,25 @@ async def health_check():
 
 
 @router.get("/ready")
-async def readiness_check():
-    """Readiness check"""
+async def readiness_check(response: Response):
+    """Readiness check; serves the background dependency probes and waits for
+    the detector backends in WARMUP_REQUIRED_BACKENDS"""
 
-    health = {"redis": False}
+    dependencies = health_monitor.dependencies()
+    checks = health_monitor.report()
+    warmup = backends.report()
 
-    try:
-        # Check Redis
-        if redis_client.client:
-            await redis_client.client.ping()
-            health["redis"] = True
+    if not health_monitor.ready():
+        status = "not ready"
+    elif not backends.ready(settings.WARMUP_REQUIRED_BACKENDS):
+        status = "warming"
+    else:
+        status = "ready"
 
-        return {
-            "status": "ready",
-            "dependencies": health,
-        }
+    if status != "ready":
+        response.status_code = 503
 
-    except Exception as e:
-        logger.error("Readiness check failed", exc_info=e)
-        return {"status": "not ready", "dependencies": health}
+    return {"status": status, "dependencies": dependencies, "checks": checks, "warmup": warmup}
 
 
 @router.get("/live")
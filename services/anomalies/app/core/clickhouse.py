@@ -0,0 +1,112 @@
+"""Read-only ClickHouse access to metric series"""
+
+import asyncio
+
+import numpy as np
+import structlog
+from ayvlo_common.clickhouse import MetricsReader, TracedClient, create_reader_client
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+class ClickHouseReader:
+    """Async wrapper around the shared tenant-scoped metrics reader"""
+
+    def __init__(self):
+        self.reader = MetricsReader(hot_dimensions=settings.HOT_DIMENSIONS)
+
+    @property
+    def available(self) -> bool:
+        return self.reader.client is not None
+
+    async def connect(self):
+        """Establish ClickHouse connection"""
+        try:
+            client = await asyncio.to_thread(
+                create_reader_client,
+                host=settings.CLICKHOUSE_HOST,
+                port=settings.CLICKHOUSE_PORT,
+                username=settings.CLICKHOUSE_USER,
+                password=settings.CLICKHOUSE_PASSWORD,
+                database=settings.CLICKHOUSE_DATABASE,
+            )
+            self.reader.client = TracedClient(client)
+            logger.info("ClickHouse reader connected")
+        except Exception as e:
+            logger.error("Failed to connect to ClickHouse", exc_info=e)
+            raise
+
+    async def disconnect(self):
+        """Close ClickHouse connection"""
+        if self.reader.client:
+            self.reader.client.close()
+            self.reader.client = None
+            logger.info("ClickHouse reader disconnected")
+
+    async def query_series(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: str,
+        end_time: str,
+        dimensions: dict | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Fetch a series as (datetime64[ms] timestamps, float64 values)"""
+        timestamps, values = await asyncio.to_thread(
+            self.reader.query_series,
+            tenant_id,
+            metric_name,
+            start_time,
+            end_time,
+            dimensions,
+        )
+        return timestamps.view("datetime64[ms]"), values
+
+    async def query_breakdown(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        window: tuple,
+        baseline: tuple,
+        dimensions: dict | None = None,
+    ) -> dict[str, np.ndarray]:
+        """Sums by dimension value over an anomaly window and its baseline"""
+        return await asyncio.to_thread(
+            self.reader.query_breakdown,
+            tenant_id,
+            metric_name,
+            window,
+            baseline,
+            dimensions,
+            settings.EXPLAIN_DIMENSION_KEYS or None,
+            settings.EXPLAIN_MAX_VALUES_PER_KEY,
+        )
+
+    async def query_slice_matrix(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: str,
+        end_time: str,
+        key: str,
+        step_seconds: int,
+        dimensions: dict | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Every value of `key` as one column of a time x slice matrix"""
+        grid, slices, matrix = await asyncio.to_thread(
+            self.reader.query_slice_matrix,
+            tenant_id,
+            metric_name,
+            start_time,
+            end_time,
+            key,
+            step_seconds,
+            dimensions,
+            settings.SLICES_MAX_SERIES,
+        )
+        return grid.view("datetime64[ms]"), slices, matrix
+
+
+# Global instance
+clickhouse_reader = ClickHouseReader()
@@ -2,7 +2,8 @@
 
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import List
+from typing import Dict, List
+import socket
 
 
 class Settings(BaseSettings):
@@ -13,6 +14,15 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = Field(default="development", env="ENVIRONMENT")
     DEBUG: bool = Field(default=True, env="DEBUG")
 
+    # Logging: hot-path events can be kept 1 in N (by event name) and every
+    # event is capped at LOG_MAX_EVENTS_PER_SECOND (0 = no cap)
+    LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
+    LOG_SAMPLE_RATES: Dict[str, int] = Field(
+        default={"Anomaly detection complete": 10},
+        env="LOG_SAMPLE_RATES",
+    )
+    LOG_MAX_EVENTS_PER_SECOND: float = Field(default=0.0, env="LOG_MAX_EVENTS_PER_SECOND")
+
     # API
     CORS_ORIGINS: List[str] = Field(
         default=["http://localhost:3000", "http://localhost:8000"],
@@ -25,6 +35,21 @@ class Settings(BaseSettings):
         env="METRICS_SERVICE_URL",
     )
 
+    # Where detection reads series from: "clickhouse" queries the metrics
+    # tables directly (falling back to the Metrics Service on error), "http"
+    # always goes through the Metrics Service
+    METRICS_READ_PATH: str = Field(default="clickhouse", env="METRICS_READ_PATH")
+
+    # ClickHouse (read-only; use a user granted SELECT on the metrics tables)
+    CLICKHOUSE_HOST: str = Field(default="localhost", env="CLICKHOUSE_HOST")
+    CLICKHOUSE_PORT: int = Field(default=8123, env="CLICKHOUSE_PORT")
+    CLICKHOUSE_USER: str = Field(default="default", env="CLICKHOUSE_USER")
+    CLICKHOUSE_PASSWORD: str = Field(default="", env="CLICKHOUSE_PASSWORD")
+    CLICKHOUSE_DATABASE: str = Field(default="ayvlo", env="CLICKHOUSE_DATABASE")
+
+    # Must match the Metrics Service so filters hit the materialized columns
+    HOT_DIMENSIONS: List[str] = Field(default=[], env="HOT_DIMENSIONS")
+
     # Redis
     REDIS_HOST: str = Field(default="localhost", env="REDIS_HOST")
     REDIS_PORT: int = Field(default=6379, env="REDIS_PORT")
@@ -36,6 +61,102 @@ class Settings(BaseSettings):
     PROPHET_INTERVAL_WIDTH: float = Field(default=0.99, env="PROPHET_INTERVAL_WIDTH")
     ISOLATION_CONTAMINATION: float = Field(default=0.05, env="ISOLATION_CONTAMINATION")
 
+    # Detector backends (pandas, prophet, isolation_forest) are imported on
+    # first use. Warm-up loads them in worker threads after startup;
+    # readiness waits only for WARMUP_REQUIRED_BACKENDS.
+    WARMUP_ENABLED: bool = Field(default=True, env="WARMUP_ENABLED")
+    WARMUP_BACKENDS: List[str] = Field(
+        default=["pandas", "isolation_forest", "prophet"],
+        env="WARMUP_BACKENDS",
+    )
+    WARMUP_PARALLEL: bool = Field(default=True, env="WARMUP_PARALLEL")
+    WARMUP_REQUIRED_BACKENDS: List[str] = Field(default=[], env="WARMUP_REQUIRED_BACKENDS")
+
+    # Request coalescing for identical concurrent detections: "local" shares
+    # one run per process, "redis" also across replicas
+    SINGLEFLIGHT_MODE: str = Field(default="local", env="SINGLEFLIGHT_MODE")
+    SINGLEFLIGHT_LOCK_TTL_SECONDS: float = Field(default=120.0, env="SINGLEFLIGHT_LOCK_TTL_SECONDS")
+    SINGLEFLIGHT_RESULT_TTL_SECONDS: float = Field(default=5.0, env="SINGLEFLIGHT_RESULT_TTL_SECONDS")
+
+    # Root-cause drill-down: dimension values explaining an anomaly, from one
+    # ClickHouse query over EXPLAIN_DIMENSION_KEYS (empty = every key)
+    EXPLAIN_DIMENSION_KEYS: List[str] = Field(default=[], env="EXPLAIN_DIMENSION_KEYS")
+    EXPLAIN_MAX_VALUES_PER_KEY: int = Field(default=100, env="EXPLAIN_MAX_VALUES_PER_KEY")
+    EXPLAIN_MAX_DIMENSIONS: int = Field(default=3, env="EXPLAIN_MAX_DIMENSIONS")
+    EXPLAIN_MAX_VALUES: int = Field(default=3, env="EXPLAIN_MAX_VALUES")
+    EXPLAIN_MIN_CONTRIBUTION: float = Field(default=0.1, env="EXPLAIN_MIN_CONTRIBUTION")
+    EXPLAIN_TARGET_CONTRIBUTION: float = Field(default=0.67, env="EXPLAIN_TARGET_CONTRIBUTION")
+
+    # Multi-series detection: every value of a dimension screened at once with
+    # seasonal medians, EWMA and MAD; flagged slices get the full ensemble
+    SLICES_MAX_SERIES: int = Field(default=2000, env="SLICES_MAX_SERIES")
+    # Time steps per request; the matrix is SLICES_MAX_BUCKETS x
+    # SLICES_MAX_SERIES float64 values, several times over while screening
+    SLICES_MAX_BUCKETS: int = Field(default=5000, env="SLICES_MAX_BUCKETS")
+    SLICES_THRESHOLD: float = Field(default=6.0, env="SLICES_THRESHOLD")
+    SLICES_SEASONS: int = Field(default=3, env="SLICES_SEASONS")
+    SLICES_EWMA_ALPHA: float = Field(default=0.3, env="SLICES_EWMA_ALPHA")
+    # Each escalation is a full ensemble run; they share a pool of
+    # SLICES_ESCALATION_CONCURRENCY threads across requests
+    SLICES_MAX_ESCALATIONS: int = Field(default=5, env="SLICES_MAX_ESCALATIONS")
+    SLICES_ESCALATION_CONCURRENCY: int = Field(default=4, env="SLICES_ESCALATION_CONCURRENCY")
+
+    # Continuous monitoring
+    SCHEDULER_ENABLED: bool = Field(default=True, env="SCHEDULER_ENABLED")
+    SCHEDULER_CONCURRENCY: int = Field(default=8, env="SCHEDULER_CONCURRENCY")
+    SCHEDULER_POLL_INTERVAL_SECONDS: float = Field(default=1.0, env="SCHEDULER_POLL_INTERVAL_SECONDS")
+    SCHEDULER_LEASE_SECONDS: int = Field(default=300, env="SCHEDULER_LEASE_SECONDS")
+    SCHEDULER_JITTER_SECONDS: float = Field(default=2.0, env="SCHEDULER_JITTER_SECONDS")
+    # Longest outage caught up on when a monitor resumes after downtime
+    SCHEDULER_MAX_BACKFILL_SECONDS: int = Field(default=86400, env="SCHEDULER_MAX_BACKFILL_SECONDS")
+    MONITOR_MIN_CADENCE_SECONDS: int = Field(default=60, env="MONITOR_MIN_CADENCE_SECONDS")
+    MONITOR_DEFAULT_LOOKBACK_SECONDS: int = Field(default=7 * 86400, env="MONITOR_DEFAULT_LOOKBACK_SECONDS")
+
+    # Sharding: series are owned by one replica, found on a consistent-hash ring
+    SHARDING_ENABLED: bool = Field(default=False, env="SHARDING_ENABLED")
+    # URL peers use to reach this replica (e.g. a StatefulSet pod DNS name)
+    SHARD_ADVERTISE_URL: str = Field(
+        default_factory=lambda: f"http://{socket.gethostname()}:8002",
+        env="SHARD_ADVERTISE_URL",
+    )
+    SHARD_VNODES: int = Field(default=256, env="SHARD_VNODES")
+    SHARD_HEARTBEAT_SECONDS: float = Field(default=5.0, env="SHARD_HEARTBEAT_SECONDS")
+    SHARD_MEMBER_TTL_SECONDS: float = Field(default=15.0, env="SHARD_MEMBER_TTL_SECONDS")
+
+    # Dependency health probes; /health/ready serves their last results
+    HEALTH_PROBE_INTERVAL_SECONDS: float = Field(default=5.0, env="HEALTH_PROBE_INTERVAL_SECONDS")
+    HEALTH_PROBE_TIMEOUT_SECONDS: float = Field(default=2.0, env="HEALTH_PROBE_TIMEOUT_SECONDS")
+
+    # Tracing: FastAPI requests, outgoing httpx calls, Redis and ClickHouse
+    # queries, exported over OTLP/HTTP
+    OTEL_ENABLED: bool = Field(default=False, env="OTEL_ENABLED")
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = Field(default="http://localhost:4318", env="OTEL_EXPORTER_OTLP_ENDPOINT")
+    # Head sampling: fraction of root traces kept, with per-route-prefix
+    # overrides (0 = never traced). Tail sampling also keeps traces slower than
+    # the rolling p99 of their route, or that failed, but records every
+    # request's spans and holds them in memory until the trace ends, instead
+    # of only the sampled ones; off by default. Set it alike on the gateway
+    # and every service, since downstream services record whatever the
+    # caller records.
+    OTEL_TRACES_SAMPLE_RATE: float = Field(default=0.05, env="OTEL_TRACES_SAMPLE_RATE")
+    OTEL_ROUTE_SAMPLE_RATES: Dict[str, float] = Field(
+        default={"/health": 0.0, "/metrics": 0.0},
+        env="OTEL_ROUTE_SAMPLE_RATES",
+    )
+    OTEL_TAIL_SAMPLING: bool = Field(default=False, env="OTEL_TAIL_SAMPLING")
+    OTEL_TAIL_SLOW_THRESHOLD_MS: float = Field(default=0.0, env="OTEL_TAIL_SLOW_THRESHOLD_MS")
+    SENTRY_DSN: str = Field(default="", env="SENTRY_DSN")
+    SENTRY_TRACES_SAMPLE_RATE: float = Field(default=0.01, env="SENTRY_TRACES_SAMPLE_RATE")
+
+    # Per-request profiling: requests sent with X-Ayvlo-Profile: 1 and a
+    # matching X-Ayvlo-Profile-Token are profiled, plus 1 in
+    # PROFILING_SAMPLE_EVERY at random. Off unless a token or sampling is set.
+    PROFILING_TOKEN: str = Field(default="", env="PROFILING_TOKEN")
+    PROFILING_SAMPLE_EVERY: int = Field(default=0, env="PROFILING_SAMPLE_EVERY")
+    PROFILING_STORE: str = Field(default="redis", env="PROFILING_STORE")  # redis | disk
+    PROFILING_DIR: str = Field(default="/tmp/ayvlo-profiles", env="PROFILING_DIR")
+    PROFILING_TTL_SECONDS: int = Field(default=900, env="PROFILING_TTL_SECONDS")
+
     class Config:
         env_file = ".env"
         case_sensitive = True
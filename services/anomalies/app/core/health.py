@@ -0,0 +1,10 @@
+"""Background dependency probes backing the readiness endpoint"""
+
+from ayvlo_common.health import HealthMonitor
+from app.core.config import settings
+
+# Global instance
+health_monitor = HealthMonitor(
+    interval=settings.HEALTH_PROBE_INTERVAL_SECONDS,
+    timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,187 @@
+"""Metric series retrieval for detection"""
+
+from typing import Optional
+
+from fastapi import HTTPException
+import httpx
+import numpy as np
+import structlog
+
+from ayvlo_common.series import SERIES_MEDIA_TYPE, decode_series
+
+from app.core.clickhouse import clickhouse_reader
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+async def fetch_metric_data(
+    tenant_id: str,
+    metric_name: str,
+    start_time: str,
+    end_time: str,
+    dimensions: Optional[dict] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fetch metric data as (timestamps, values) arrays.
+
+    Reads ClickHouse directly when METRICS_READ_PATH is "clickhouse" and the
+    reader is connected, falling back to the Metrics Service on failure.
+    """
+
+    if settings.METRICS_READ_PATH == "clickhouse" and clickhouse_reader.available:
+        try:
+            return await clickhouse_reader.query_series(
+                tenant_id=tenant_id,
+                metric_name=metric_name,
+                start_time=start_time,
+                end_time=end_time,
+                dimensions=dimensions,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.warning(
+                "ClickHouse read failed, falling back to Metrics Service",
+                exc_info=e,
+                metric=metric_name,
+            )
+
+    return await fetch_metric_data_http(
+        tenant_id=tenant_id,
+        metric_name=metric_name,
+        start_time=start_time,
+        end_time=end_time,
+        dimensions=dimensions,
+    )
+
+
+async def fetch_metric_data_http(
+    tenant_id: str,
+    metric_name: str,
+    start_time: str,
+    end_time: str,
+    dimensions: Optional[dict] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fetch metric data from Metrics Service.
+
+    Requests the packed series format and reads it zero-copy into NumPy;
+    falls back to JSON if the Metrics Service answers with it.
+
+    Returns:
+        (timestamps, values as float64); timestamps are datetime64[ms] for
+        the packed format and ISO strings for the JSON fallback
+    """
+
+    url = f"{settings.METRICS_SERVICE_URL}/api/v1/metrics/query"
+
+    payload = {
+        "metric_name": metric_name,
+        "start_time": start_time,
+        "end_time": end_time,
+        "dimensions": dimensions,
+        "aggregate": False,  # Need raw data for ML
+    }
+
+    headers = {
+        "X-Tenant-ID": tenant_id,
+        "Accept": f"{SERIES_MEDIA_TYPE}, application/json;q=0.5",
+    }
+
+    async with httpx.AsyncClient() as client:
+        try:
+            response = await client.post(url, json=payload, headers=headers, timeout=30.0)
+            response.raise_for_status()
+
+            if response.headers.get("content-type", "").startswith(SERIES_MEDIA_TYPE):
+                return decode_series(response.content)
+
+            data = response.json() or []
+            return (
+                # ISO strings may carry offsets; the detector parses them with pandas
+                np.array([point["timestamp"] for point in data], dtype=object),
+                np.array([point["value"] for point in data], dtype=np.float64),
+            )
+
+        except httpx.HTTPError as e:
+            logger.error(
+                "Failed to fetch metric data",
+                exc_info=e,
+                metric=metric_name,
+                url=url,
+            )
+            raise HTTPException(
+                status_code=502,
+                detail=f"Failed to fetch metric data from Metrics Service: {str(e)}",
+            )
+
+
+async def fetch_dimension_breakdown(
+    tenant_id: str,
+    metric_name: str,
+    window: tuple,
+    baseline: tuple,
+    dimensions: Optional[dict] = None,
+) -> dict[str, np.ndarray]:
+    """
+    Fetch sums by dimension value over an anomaly window and its baseline.
+
+    Only ClickHouse can answer this in one query; the Metrics Service has no
+    equivalent, so there is no fallback.
+    """
+
+    if not clickhouse_reader.available:
+        raise HTTPException(
+            status_code=503,
+            detail="Dimension breakdowns need direct ClickHouse reads",
+        )
+
+    try:
+        return await clickhouse_reader.query_breakdown(
+            tenant_id=tenant_id,
+            metric_name=metric_name,
+            window=window,
+            baseline=baseline,
+            dimensions=dimensions,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def fetch_slice_matrix(
+    tenant_id: str,
+    metric_name: str,
+    start_time: str,
+    end_time: str,
+    key: str,
+    step_seconds: int,
+    dimensions: Optional[dict] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fetch every value of a dimension key as an aligned time x slice matrix.
+
+    Needs direct ClickHouse reads, like fetch_dimension_breakdown.
+
+    Returns:
+        (datetime64[ms] bucket starts, slice values, float64 matrix)
+    """
+
+    if not clickhouse_reader.available:
+        raise HTTPException(
+            status_code=503,
+            detail="Multi-series detection needs direct ClickHouse reads",
+        )
+
+    try:
+        return await clickhouse_reader.query_slice_matrix(
+            tenant_id=tenant_id,
+            metric_name=metric_name,
+            start_time=start_time,
+            end_time=end_time,
+            key=key,
+            step_seconds=step_seconds,
+            dimensions=dimensions,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,16 @@
+"""Opt-in per-request profiling"""
+
+from ayvlo_common.profiling import FileProfileStore, RedisProfileStore
+from app.core.config import settings
+from app.core.redis import redis_client
+
+
+def create_profile_store() -> FileProfileStore | RedisProfileStore:
+    """Profile store for the configured PROFILING_STORE"""
+    if settings.PROFILING_STORE == "disk":
+        return FileProfileStore(settings.PROFILING_DIR, settings.PROFILING_TTL_SECONDS)
+    return RedisProfileStore(
+        lambda: redis_client.client,
+        ttl_seconds=settings.PROFILING_TTL_SECONDS,
+        prefix="profile:anomalies",
+    )
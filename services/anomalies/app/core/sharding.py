@@ -0,0 +1,135 @@
+"""Consistent-hash sharding of monitored series across service replicas"""
+
+import asyncio
+import bisect
+import hashlib
+import time
+
+import structlog
+from app.core.config import settings
+from app.core.redis import RedisClient, redis_client
+
+logger = structlog.get_logger()
+
+# Series hash into a fixed set of partitions and the ring assigns partitions
+# to replicas, so ownership changes never move data, only partitions.
+# Changing this remaps every series.
+PARTITIONS = 1024
+
+MEMBERS_KEY = "anomalies:members"
+
+# Marks a request already routed by a peer, so it is never forwarded twice
+FORWARDED_HEADER = "X-Ayvlo-Forwarded"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def partition_for(tenant_id: str, metric_name: str) -> int:
+    """Partition of a (tenant, metric) series"""
+    return _hash(f"{tenant_id}\x00{metric_name}") % PARTITIONS
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+
+    def __init__(self, members: list[str], vnodes: int):
+        self.members = sorted(members)
+        points = sorted(
+            (_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> str | None:
+        """Member owning `key`: the first virtual node clockwise from its hash"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+    def partition_owner(self, partition: int) -> str | None:
+        return self.owner(f"partition:{partition}")
+
+
+class ShardMembership:
+    """
+    Replica membership kept in a Redis sorted set scored by last heartbeat.
+
+    Every replica heartbeats its advertised URL and rebuilds the ring from the
+    members seen within SHARD_MEMBER_TTL_SECONDS, so a replica that stops
+    heartbeating loses its partitions to the survivors within one TTL.
+    """
+
+    def __init__(self, redis: RedisClient, node_url: str):
+        self.redis = redis
+        self.node_url = node_url
+        self.ring = HashRing([node_url], settings.SHARD_VNODES)
+        self._owned: list[int] = list(range(PARTITIONS))
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        """Join the ring and keep heartbeating"""
+        await self.refresh()
+        self._task = asyncio.create_task(self._heartbeat_loop())
+        logger.info("Joined shard ring", node=self.node_url, members=len(self.ring.members))
+
+    async def stop(self):
+        """Leave the ring so peers take over our partitions immediately"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        try:
+            await self.redis.client.zrem(MEMBERS_KEY, self.node_url)
+        except Exception as e:
+            logger.error("Failed to leave shard ring", exc_info=e)
+
+    async def refresh(self):
+        """Heartbeat, drop expired members and rebuild the ring if membership changed"""
+        now = time.time()
+        async with self.redis.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(MEMBERS_KEY, {self.node_url: now})
+            pipe.zremrangebyscore(MEMBERS_KEY, "-inf", now - settings.SHARD_MEMBER_TTL_SECONDS)
+            pipe.zrange(MEMBERS_KEY, 0, -1)
+            _, _, members = await pipe.execute()
+
+        if sorted(members) != self.ring.members:
+            self.ring = HashRing(members, settings.SHARD_VNODES)
+            self._owned = [
+                partition
+                for partition in range(PARTITIONS)
+                if self.ring.partition_owner(partition) == self.node_url
+            ]
+            logger.info(
+                "Shard ring rebuilt",
+                members=len(members),
+                owned_partitions=len(self._owned),
+            )
+
+    @property
+    def owned_partitions(self) -> list[int]:
+        return self._owned
+
+    def owner(self, tenant_id: str, metric_name: str) -> str:
+        """URL of the replica owning a series"""
+        return self.ring.partition_owner(partition_for(tenant_id, metric_name)) or self.node_url
+
+    def is_local(self, tenant_id: str, metric_name: str) -> bool:
+        return self.owner(tenant_id, metric_name) == self.node_url
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(settings.SHARD_HEARTBEAT_SECONDS)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Shard heartbeat failed", exc_info=e)
+
+
+# Global instance
+shard_membership = ShardMembership(redis_client, settings.SHARD_ADVERTISE_URL)
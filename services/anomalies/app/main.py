@@ -3,46 +3,112 @@ Ayvlo Anomalies Service - FastAPI Application
 ML ensemble for anomaly detection: Prophet + IsolationForest + LSTM
 """
 
+import asyncio
 from contextlib import asynccontextmanager
+import time
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import httpx
 from prometheus_client import make_asgi_app
 import structlog
+from ayvlo_common.health import http_probe
+from ayvlo_common.logging import setup_logging
+from ayvlo_common.observability import setup_observability
+from ayvlo_common.profiling import ProfilingMiddleware, token_authorizer
 
 from app.api import anomalies, health
+from app.core.clickhouse import clickhouse_reader
 from app.core.config import settings
+from app.core.health import health_monitor
+from app.core.profiling import create_profile_store
 from app.core.redis import redis_client
-from app.ml.detector import AnomalyDetector
+from app.core.sharding import shard_membership
+from app.ml.detector import detector
+from app.ml.registry import backends
+from app.scheduler.scheduler import Scheduler
+from app.scheduler.store import monitor_store
+
+setup_logging(
+    settings.SERVICE_NAME,
+    settings.LOG_LEVEL,
+    sample_rates=settings.LOG_SAMPLE_RATES,
+    max_events_per_second=settings.LOG_MAX_EVENTS_PER_SECOND,
+)
 
 logger = structlog.get_logger()
 
 
-# Global ML detector instance
-detector: AnomalyDetector | None = None
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global detector
+    scheduler: Scheduler | None = None
 
     # Startup
+    started = time.perf_counter()
     logger.info("Starting Ayvlo Anomalies Service", version="1.0.0")
 
     # Initialize Redis
     await redis_client.connect()
     logger.info("Redis connected", host=settings.REDIS_HOST)
 
-    # Initialize ML detector
-    detector = AnomalyDetector()
-    logger.info("ML detector initialized")
+    # Direct ClickHouse reads; detection falls back to the Metrics Service
+    # if ClickHouse is unreachable
+    if settings.METRICS_READ_PATH == "clickhouse":
+        try:
+            await clickhouse_reader.connect()
+        except Exception:
+            logger.warning("Reading metrics through the Metrics Service instead")
+
+    # Series ownership; without sharding this replica owns every partition
+    if settings.SHARDING_ENABLED:
+        await shard_membership.start()
+
+    # Continuous monitoring
+    if settings.SCHEDULER_ENABLED:
+        scheduler = Scheduler(monitor_store, detector, shard_membership)
+        await scheduler.start()
+
+    # Detector backends import on first use; warm them in the background so
+    # the service takes traffic without waiting on Prophet and scikit-learn
+    warmup = settings.WARMUP_BACKENDS if settings.WARMUP_ENABLED else []
+    backends.start_warmup(
+        dict.fromkeys([*warmup, *settings.WARMUP_REQUIRED_BACKENDS]),
+        parallel=settings.WARMUP_PARALLEL,
+    )
+
+    # Readiness is served from these probes. ClickHouse reads fall back to
+    # the Metrics Service, which is only required without them
+    health_monitor.add("redis", lambda: redis_client.client.ping())
+    if clickhouse_reader.available:
+        health_monitor.add(
+            "clickhouse",
+            lambda: asyncio.to_thread(clickhouse_reader.reader.client.ping),
+            critical=False,
+        )
+    probe_client = httpx.AsyncClient(timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS)
+    health_monitor.add(
+        "metrics_service",
+        http_probe(probe_client, f"{settings.METRICS_SERVICE_URL}/health/live"),
+        critical=not clickhouse_reader.available,
+    )
+    await health_monitor.start()
+
+    logger.info("Anomalies service started", startup_seconds=round(time.perf_counter() - started, 3))
 
     yield
 
     # Shutdown
     logger.info("Shutting down Ayvlo Anomalies Service")
+    await health_monitor.stop()
+    await probe_client.aclose()
+    await backends.stop_warmup()
+    if scheduler:
+        await scheduler.stop()
+    if settings.SHARDING_ENABLED:
+        await shard_membership.stop()
     await redis_client.disconnect()
+    await clickhouse_reader.disconnect()
 
 
 app = FastAPI(
@@ -61,6 +127,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tracing; instruments this app, outgoing httpx calls and Redis
+if settings.OTEL_ENABLED:
+    setup_observability(
+        service_name=settings.SERVICE_NAME,
+        service_namespace="ayvlo",
+        deployment_environment=settings.ENVIRONMENT,
+        otlp_endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT,
+        sentry_dsn=settings.SENTRY_DSN or None,
+        sample_rate=settings.OTEL_TRACES_SAMPLE_RATE,
+        app=app,
+        route_sample_rates=settings.OTEL_ROUTE_SAMPLE_RATES,
+        tail_sampling=settings.OTEL_TAIL_SAMPLING,
+        tail_slow_threshold_ms=settings.OTEL_TAIL_SLOW_THRESHOLD_MS,
+        sentry_sample_rate=settings.SENTRY_TRACES_SAMPLE_RATE,
+    )
+
+# Per-request profiling; not installed at all unless enabled
+if settings.PROFILING_TOKEN or settings.PROFILING_SAMPLE_EVERY:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=create_profile_store(),
+        authorize=token_authorizer(settings.PROFILING_TOKEN),
+        sample_every=settings.PROFILING_SAMPLE_EVERY,
+    )
+
 
 # Exception handler
 @app.exception_handler(Exception)
@@ -81,11 +172,6 @@ metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
 
-# Make detector accessible to routes
-def get_detector() -> AnomalyDetector:
-    return detector
-
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
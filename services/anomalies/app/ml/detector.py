@@ -3,15 +3,29 @@ ML Ensemble Anomaly Detector
 Combines Prophet (time-series), IsolationForest (outliers), and LSTM (patterns)
 """
 
-import pandas as pd
+from __future__ import annotations
+
 import numpy as np
-from prophet import Prophet
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 import structlog
-from typing import List, Tuple
+import time
+from typing import TYPE_CHECKING, List, Sequence, Tuple
 import warnings
 
+from app.core.config import settings
+from app.ml.registry import backends
+from app.ml.telemetry import (
+    ALGORITHM_FAILURES,
+    DETECTION_DURATION,
+    SERIES_POINTS,
+    size_bucket,
+    stage,
+    tracer,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from prophet import Prophet
+
 warnings.filterwarnings('ignore')
 
 logger = structlog.get_logger()
@@ -38,20 +52,19 @@ class AnomalyDetector:
         self.prophet_interval_width = prophet_interval_width
         self.isolation_contamination = isolation_contamination
         self.min_data_points = min_data_points
-        self.scaler = StandardScaler()
 
     def detect(
         self,
-        timestamps: List[str],
-        values: List[float],
+        timestamps: Sequence[str] | np.ndarray,
+        values: Sequence[float] | np.ndarray,
         metric_name: str,
     ) -> dict:
         """
         Run ensemble detection and return anomalies.
 
         Args:
-            timestamps: List of ISO timestamp strings
-            values: List of metric values
+            timestamps: ISO timestamp strings or a datetime64 array
+            values: Metric values (list or float array)
             metric_name: Name of the metric
 
         Returns:
@@ -79,28 +92,52 @@ class AnomalyDetector:
                 },
             }
 
+        points = len(timestamps)
+        SERIES_POINTS.observe(points)
+        started = time.perf_counter()
+
+        with tracer.start_as_current_span(
+            "detector.detect",
+            attributes={"detector.metric": metric_name, "detector.points": points},
+        ) as span:
+            result = self._detect(timestamps, values, metric_name)
+            span.set_attribute("detector.anomalies", result["summary"]["anomaly_count"])
+            span.set_attribute("detector.severity", result["summary"]["severity"])
+
+        DETECTION_DURATION.labels(size_bucket(points)).observe(time.perf_counter() - started)
+        return result
+
+    def _detect(
+        self,
+        timestamps: Sequence[str] | np.ndarray,
+        values: Sequence[float] | np.ndarray,
+        metric_name: str,
+    ) -> dict:
+        """Ensemble detection over a series with enough points"""
+
+        points = len(timestamps)
+
         try:
             # Prepare data
-            df = pd.DataFrame({
-                "ds": pd.to_datetime(timestamps),
-                "y": values,
-            })
+            with stage("build_frame", "ensemble", points):
+                df = self._build_frame(timestamps, values)
 
             # Run algorithms
             prophet_anomalies = self._detect_prophet(df)
             isolation_anomalies = self._detect_isolation_forest(df)
 
             # Ensemble voting (2/3 agreement)
-            anomalies = self._ensemble_vote(
-                df,
-                prophet_anomalies,
-                isolation_anomalies,
-            )
+            with stage("voting", "ensemble", points):
+                anomalies = self._ensemble_vote(
+                    df,
+                    prophet_anomalies,
+                    isolation_anomalies,
+                )
 
             # Calculate severity
             severity = self._calculate_severity(anomalies, len(timestamps))
 
-            logger.info(
+            logger.debug(
                 "Anomaly detection complete",
                 metric=metric_name,
                 total_points=len(timestamps),
@@ -127,33 +164,26 @@ class AnomalyDetector:
             logger.error("Anomaly detection failed", exc_info=e, metric=metric_name)
             raise
 
+    def _build_frame(
+        self,
+        timestamps: Sequence[str] | np.ndarray,
+        values: Sequence[float] | np.ndarray,
+    ) -> pd.DataFrame:
+        """Frame with Prophet's `ds` / `y` columns"""
+        pd = backends.load("pandas").pd
+        return pd.DataFrame({
+            "ds": pd.to_datetime(timestamps),
+            "y": values,
+        })
+
     def _detect_prophet(self, df: pd.DataFrame) -> List[int]:
         """Detect anomalies using Prophet (seasonal + trend)"""
 
         try:
-            # Configure Prophet
-            model = Prophet(
-                interval_width=self.prophet_interval_width,
-                daily_seasonality=True,
-                weekly_seasonality=True,
-                yearly_seasonality=False,  # Need more data
-                changepoint_prior_scale=0.05,
-            )
-
-            # Fit model
-            model.fit(df)
-
-            # Predict with uncertainty intervals
-            forecast = model.predict(df)
-
-            # Identify anomalies (values outside prediction intervals)
-            anomalies = []
-            for i, row in df.iterrows():
-                pred = forecast.iloc[i]
-                actual = row["y"]
-
-                if actual < pred["yhat_lower"] or actual > pred["yhat_upper"]:
-                    anomalies.append(i)
+            with stage("prophet_fit", "prophet", len(df)):
+                model = self._fit_prophet(df)
+            with stage("prophet_predict", "prophet", len(df)):
+                anomalies = self._predict_prophet(model, df)
 
             logger.debug(
                 "Prophet detection complete",
@@ -163,39 +193,51 @@ class AnomalyDetector:
             return anomalies
 
         except Exception as e:
+            ALGORITHM_FAILURES.labels("prophet", size_bucket(len(df))).inc()
             logger.error("Prophet detection failed", exc_info=e)
             return []
 
+    def _fit_prophet(self, df: pd.DataFrame) -> Prophet:
+        """Fit Prophet to the series"""
+
+        # Configure Prophet
+        model = backends.load("prophet").Prophet(
+            interval_width=self.prophet_interval_width,
+            daily_seasonality=True,
+            weekly_seasonality=True,
+            yearly_seasonality=False,  # Need more data
+            changepoint_prior_scale=0.05,
+        )
+
+        # Fit model
+        model.fit(df)
+        return model
+
+    def _predict_prophet(self, model: Prophet, df: pd.DataFrame) -> List[int]:
+        """Indices of points outside Prophet's prediction interval"""
+
+        # Predict with uncertainty intervals
+        forecast = model.predict(df)
+
+        # Identify anomalies (values outside prediction intervals)
+        anomalies = []
+        for i, row in df.iterrows():
+            pred = forecast.iloc[i]
+            actual = row["y"]
+
+            if actual < pred["yhat_lower"] or actual > pred["yhat_upper"]:
+                anomalies.append(i)
+
+        return anomalies
+
     def _detect_isolation_forest(self, df: pd.DataFrame) -> List[int]:
         """Detect anomalies using IsolationForest (statistical outliers)"""
 
         try:
-            # Prepare features
-            # - Value itself
-            # - Hour of day (cyclical)
-            # - Day of week (cyclical)
-            # - Rolling mean/std
-            df["hour"] = df["ds"].dt.hour
-            df["dayofweek"] = df["ds"].dt.dayofweek
-            df["rolling_mean"] = df["y"].rolling(window=7, min_periods=1).mean()
-            df["rolling_std"] = df["y"].rolling(window=7, min_periods=1).std().fillna(0)
-
-            features = df[["y", "hour", "dayofweek", "rolling_mean", "rolling_std"]].values
-
-            # Normalize
-            features_scaled = self.scaler.fit_transform(features)
-
-            # Train IsolationForest
-            model = IsolationForest(
-                contamination=self.isolation_contamination,
-                random_state=42,
-                n_estimators=100,
-            )
-
-            predictions = model.fit_predict(features_scaled)
-
-            # -1 = anomaly, 1 = normal
-            anomalies = [i for i, pred in enumerate(predictions) if pred == -1]
+            with stage("isolation_features", "isolation_forest", len(df)):
+                features = self._isolation_features(df)
+            with stage("isolation_fit", "isolation_forest", len(df)):
+                anomalies = self._fit_isolation_forest(features)
 
             logger.debug(
                 "IsolationForest detection complete",
@@ -205,9 +247,43 @@ class AnomalyDetector:
             return anomalies
 
         except Exception as e:
+            ALGORITHM_FAILURES.labels("isolation_forest", size_bucket(len(df))).inc()
             logger.error("IsolationForest detection failed", exc_info=e)
             return []
 
+    def _isolation_features(self, df: pd.DataFrame) -> np.ndarray:
+        """Scaled feature matrix for IsolationForest"""
+
+        # Prepare features
+        # - Value itself
+        # - Hour of day (cyclical)
+        # - Day of week (cyclical)
+        # - Rolling mean/std
+        df["hour"] = df["ds"].dt.hour
+        df["dayofweek"] = df["ds"].dt.dayofweek
+        df["rolling_mean"] = df["y"].rolling(window=7, min_periods=1).mean()
+        df["rolling_std"] = df["y"].rolling(window=7, min_periods=1).std().fillna(0)
+
+        features = df[["y", "hour", "dayofweek", "rolling_mean", "rolling_std"]].values
+
+        # Normalize (per call: the detector is shared across scheduler threads)
+        return backends.load("isolation_forest").StandardScaler().fit_transform(features)
+
+    def _fit_isolation_forest(self, features: np.ndarray) -> List[int]:
+        """Indices IsolationForest labels as outliers"""
+
+        # Train IsolationForest
+        model = backends.load("isolation_forest").IsolationForest(
+            contamination=self.isolation_contamination,
+            random_state=42,
+            n_estimators=100,
+        )
+
+        predictions = model.fit_predict(features)
+
+        # -1 = anomaly, 1 = normal
+        return [i for i, pred in enumerate(predictions) if pred == -1]
+
     def _ensemble_vote(
         self,
         df: pd.DataFrame,
@@ -261,3 +337,16 @@ class AnomalyDetector:
             return "info"
         else:
             return "low"
+
+
+# Global instance; cheap to build, backends load on first detection
+detector = AnomalyDetector(
+    prophet_interval_width=settings.PROPHET_INTERVAL_WIDTH,
+    isolation_contamination=settings.ISOLATION_CONTAMINATION,
+    min_data_points=settings.MIN_DATA_POINTS,
+)
+
+
+def get_detector() -> AnomalyDetector:
+    """Shared detector, for route dependencies"""
+    return detector
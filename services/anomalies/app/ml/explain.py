@@ -0,0 +1,246 @@
+"""
+Dimension drill-down: which dimension values explain a change in a metric.
+
+Scores follow Adtributor (Bhagwan et al., NSDI 2014). For every value of
+every dimension key, the baseline sum scaled to the window's length is the
+expected value, and:
+
+- contribution: the value's share of the metric's overall change
+- surprise: Jensen-Shannon divergence between the value's share of the
+  metric in the baseline and in the window
+
+Within a key, the most surprising values with at least
+EXPLAIN_MIN_CONTRIBUTION are taken until they explain
+EXPLAIN_TARGET_CONTRIBUTION of the change; keys are ranked by the surprise
+of the values taken.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class AnomalyExplainer:
+    """Ranks the dimension values behind a metric's change in an anomaly window"""
+
+    def __init__(
+        self,
+        max_dimensions: int = 3,
+        max_values: int = 3,
+        min_contribution: float = 0.1,
+        target_contribution: float = 0.67,
+    ):
+        self.max_dimensions = max_dimensions
+        self.max_values = max_values
+        self.min_contribution = min_contribution
+        self.target_contribution = target_contribution
+
+    def explain(
+        self,
+        breakdown: dict[str, np.ndarray],
+        metric_name: str,
+        window: tuple[datetime, datetime],
+        baseline: tuple[datetime, datetime],
+    ) -> dict:
+        """
+        Explain the change between the baseline and the window.
+
+        Args:
+            breakdown: Sums by dimension value from MetricsReader.query_breakdown
+            metric_name: Name of the metric
+            window: [start, end) of the anomaly
+            baseline: [start, end) it is compared with
+
+        Returns:
+            {
+                "actual": ..., "expected": ..., "change": ..., "relative_change": ...,
+                "dimensions": [{"key": ..., "contribution": ..., "surprise": ...,
+                                "contributors": [{"value": ..., "change": ..., ...}]}],
+                "narrative": "revenue fell 35% because region=eu fell 80% (...)"
+            }
+        """
+
+        scale = (window[1] - window[0]) / (baseline[1] - baseline[0])
+        keys = breakdown["key"]
+        actual = breakdown["window_sum"]
+        expected = breakdown["baseline_sum"] * scale
+
+        totals = keys == ""
+        total_actual = float(actual[totals].sum())
+        total_expected = float(expected[totals].sum())
+        total_change = total_actual - total_expected
+
+        explanation = {
+            "metric_name": metric_name,
+            "window": {"start": window[0].isoformat(), "end": window[1].isoformat()},
+            "baseline": {"start": baseline[0].isoformat(), "end": baseline[1].isoformat()},
+            "actual": total_actual,
+            "expected": total_expected,
+            "change": total_change,
+            "relative_change": _ratio(total_change, total_expected),
+            "dimensions": [],
+        }
+
+        rows = ~totals
+        if total_change == 0 or not rows.any():
+            explanation["narrative"] = _narrative(metric_name, explanation, [])
+            return explanation
+
+        keys, values = keys[rows], breakdown["value"][rows]
+        actual, expected = actual[rows], expected[rows]
+        change = actual - expected
+        contribution = change / total_change
+        surprise = _js_divergence(
+            expected / total_expected if total_expected else np.zeros_like(expected),
+            actual / total_actual if total_actual else np.zeros_like(actual),
+        )
+
+        # Group by key, most surprising value first
+        key_names, key_codes = np.unique(keys, return_inverse=True)
+        order = np.lexsort((-surprise, key_codes))
+        key_codes, values, surprise = key_codes[order], values[order], surprise[order]
+        actual, expected, change, contribution = (
+            actual[order], expected[order], change[order], contribution[order]
+        )
+
+        # Take candidates in that order until their key explains the target
+        # share; the running total restarts at each key
+        candidate = np.where(contribution >= self.min_contribution, contribution, 0.0)
+        cumulative = np.cumsum(candidate)
+        starts = np.flatnonzero(np.r_[True, key_codes[1:] != key_codes[:-1]])
+        offset = np.repeat(cumulative[starts] - candidate[starts], np.diff(np.r_[starts, len(order)]))
+        taken = (candidate > 0) & (cumulative - candidate - offset < self.target_contribution)
+
+        key_surprise = np.bincount(key_codes, weights=np.where(taken, surprise, 0.0), minlength=len(key_names))
+        key_contribution = np.bincount(key_codes, weights=np.where(taken, contribution, 0.0), minlength=len(key_names))
+        ranked = [code for code in np.argsort(-key_surprise, kind="stable") if key_contribution[code] > 0]
+
+        for code in ranked[: self.max_dimensions]:
+            members = np.flatnonzero(taken & (key_codes == code))[: self.max_values]
+            explanation["dimensions"].append({
+                "key": key_names[code],
+                "contribution": round(float(key_contribution[code]), 4),
+                "surprise": round(float(key_surprise[code]), 4),
+                "contributors": [
+                    {
+                        "value": values[i],
+                        "actual": float(actual[i]),
+                        "expected": float(expected[i]),
+                        "change": float(change[i]),
+                        "relative_change": _ratio(change[i], expected[i]),
+                        "contribution": round(float(contribution[i]), 4),
+                        "surprise": round(float(surprise[i]), 4),
+                    }
+                    for i in members
+                ],
+            })
+
+        explanation["narrative"] = _narrative(metric_name, explanation, explanation["dimensions"])
+        return explanation
+
+
+def anomaly_window(
+    timestamps: Sequence[str] | np.ndarray,
+    anomalies: list[dict],
+) -> tuple[datetime, datetime]:
+    """
+    [start, end) around the anomalous points of a series.
+
+    The window ends at the first timestamp after the last anomaly, or one
+    median step after it if the series ends in an anomaly.
+    """
+
+    series = _datetime64(timestamps)
+    ticks = np.unique(series)
+    first = series[min(point["index"] for point in anomalies)]
+    last = series[max(point["index"] for point in anomalies)]
+
+    position = np.searchsorted(ticks, last, side="right")
+    if position < len(ticks):
+        end = ticks[position]
+    elif len(ticks) > 1:
+        steps = np.sort(np.diff(ticks))
+        end = last + steps[len(steps) // 2]
+    else:
+        end = last + np.timedelta64(1, "ms")
+    return _as_datetime(first), _as_datetime(end)
+
+
+def preceding_baseline(
+    window: tuple[datetime, datetime],
+    start: Optional[datetime] = None,
+) -> tuple[datetime, datetime]:
+    """Baseline ending where the window starts, from `start` or as long as the window"""
+    if start is None or start >= window[0]:
+        start = window[0] - (window[1] - window[0])
+    return start, window[0]
+
+
+def _js_divergence(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Jensen-Shannon divergence of each value's share, p = baseline and q = window"""
+    m = (p + q) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        left = np.where(p > 0, p * np.log(p / m), 0.0)
+        right = np.where(q > 0, q * np.log(q / m), 0.0)
+    return 0.5 * (left + right)
+
+
+def _ratio(change: float, expected: float) -> Optional[float]:
+    return round(float(change / expected), 4) if expected else None
+
+
+def _datetime64(timestamps: Sequence[str] | np.ndarray) -> np.ndarray:
+    """Timestamps as naive UTC datetime64[ms]"""
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == "M":
+        return timestamps.astype("datetime64[ms]")
+    return np.array([naive_utc(ts) for ts in timestamps], dtype="datetime64[ms]")
+
+
+def naive_utc(ts: str | datetime) -> datetime:
+    """Naive UTC datetime, as the metrics tables store"""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _as_datetime(ts: np.datetime64) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(ts.astype("datetime64[ms]").astype(np.int64)))
+
+
+def _describe(relative_change: Optional[float]) -> str:
+    if relative_change is None:
+        return "appeared"
+    verb = "rose" if relative_change > 0 else "fell"
+    return f"{verb} {abs(relative_change):.0%}"
+
+
+def _narrative(metric_name: str, explanation: dict, dimensions: list[dict]) -> str:
+    """One line, e.g. "revenue fell 20% because region=eu fell 80% (86% of the change)" """
+
+    if explanation["change"] == 0:
+        return f"{metric_name} did not change against the baseline"
+
+    summary = f"{metric_name} {_describe(explanation['relative_change'])}"
+    causes = [
+        f"{dimension['key']}={contributor['value']} {_describe(contributor['relative_change'])}"
+        f" ({contributor['contribution']:.0%} of the change)"
+        for dimension in dimensions
+        for contributor in dimension["contributors"][:1]
+    ]
+    if not causes:
+        return f"{summary}; no single dimension value explains the change"
+    return f"{summary} because {', '.join(causes)}"
+
+
+# Global instance
+explainer = AnomalyExplainer(
+    max_dimensions=settings.EXPLAIN_MAX_DIMENSIONS,
+    max_values=settings.EXPLAIN_MAX_VALUES,
+    min_contribution=settings.EXPLAIN_MIN_CONTRIBUTION,
+    target_contribution=settings.EXPLAIN_TARGET_CONTRIBUTION,
+)
@@ -0,0 +1,188 @@
+"""Detector backends imported on first use, with optional background warm-up"""
+
+import asyncio
+import importlib
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Iterable
+
+import numpy as np
+import structlog
+
+from app.ml.telemetry import BACKEND_LOAD_SECONDS
+
+logger = structlog.get_logger()
+
+
+def _warm_prophet(backend: SimpleNamespace) -> None:
+    """Fit a tiny series so the Stan model is loaded before the first request"""
+    pd = backends.load("pandas").pd
+    frame = pd.DataFrame({
+        "ds": pd.date_range("2024-01-01", periods=48, freq="h"),
+        "y": np.sin(np.arange(48) / 4.0),
+    })
+    backend.Prophet(daily_seasonality=False, weekly_seasonality=False, yearly_seasonality=False).fit(frame)
+
+
+def _warm_isolation_forest(backend: SimpleNamespace) -> None:
+    """Fit once so sklearn's lazily imported internals are loaded"""
+    features = backend.StandardScaler().fit_transform(np.random.default_rng(0).normal(size=(64, 5)))
+    backend.IsolationForest(n_estimators=10, random_state=0).fit(features)
+
+
+class Backend:
+    """One lazily imported algorithm backend"""
+
+    def __init__(
+        self,
+        name: str,
+        imports: dict[str, str],
+        warm: Callable[[SimpleNamespace], None] | None = None,
+    ):
+        self.name = name
+        # attribute -> "module" or "module:attribute"
+        self.imports = imports
+        self.warm = warm
+        # cold -> importing -> imported -> warming -> ready, or failed
+        self.state = "cold"
+        self.namespace: SimpleNamespace | None = None
+        self.import_seconds: float | None = None
+        self.warm_seconds: float | None = None
+        self.error: str | None = None
+        self.lock = threading.Lock()
+
+    def report(self) -> dict:
+        return {
+            "state": self.state,
+            "import_seconds": self.import_seconds,
+            "warm_seconds": self.warm_seconds,
+            "error": self.error,
+        }
+
+
+class DetectorRegistry:
+    """
+    Algorithm backends (pandas, Prophet, scikit-learn) imported on first use.
+
+    Importing Prophet and scikit-learn takes seconds, so the service starts
+    without them. `load` imports a backend the first time it is needed;
+    `start_warmup` loads backends in the background once the service is up,
+    so most requests never wait on an import. Each import is timed, logged
+    and exported as `anomaly_detector_backend_load_seconds`.
+    """
+
+    def __init__(self, backends: Iterable[Backend]):
+        self.backends = {backend.name: backend for backend in backends}
+        self.warmup_task: asyncio.Task | None = None
+
+    def load(self, name: str) -> SimpleNamespace:
+        """Backend namespace, importing it on first use; thread-safe"""
+        backend = self.backends[name]
+        if backend.namespace is not None:
+            return backend.namespace
+
+        with backend.lock:
+            if backend.state == "failed":
+                # Not retried: a missing or broken package stays that way
+                raise ImportError(f"Detector backend {name} unavailable: {backend.error}")
+            if backend.namespace is None:
+                self._import(backend)
+        return backend.namespace
+
+    def warm(self, name: str) -> None:
+        """Import a backend and run its warm-up fit; failures are logged"""
+        backend = self.backends[name]
+        try:
+            namespace = self.load(name)
+        except Exception:
+            return
+
+        with backend.lock:
+            if backend.state != "imported":
+                return
+            backend.state = "warming"
+
+        started = time.perf_counter()
+        try:
+            backend.warm(namespace)
+        except Exception as e:
+            # The backend still imported; fits at request time may still work
+            backend.error = f"{type(e).__name__}: {e}"
+            logger.warning("Detector backend warm-up failed", exc_info=e, backend=name)
+        backend.warm_seconds = round(time.perf_counter() - started, 3)
+        BACKEND_LOAD_SECONDS.labels(name, "warm").set(backend.warm_seconds)
+        backend.state = "ready"
+
+    def start_warmup(self, names: Iterable[str], parallel: bool = True) -> None:
+        """Warm backends in worker threads without blocking startup"""
+        names = [name for name in names if name in self.backends]
+        if names:
+            self.warmup_task = asyncio.create_task(self._warmup(names, parallel))
+
+    async def stop_warmup(self) -> None:
+        """Stop waiting on warm-up; imports already running finish in their threads"""
+        if self.warmup_task and not self.warmup_task.done():
+            self.warmup_task.cancel()
+            try:
+                await self.warmup_task
+            except asyncio.CancelledError:
+                pass
+
+    def ready(self, names: Iterable[str]) -> bool:
+        """Whether all the named backends are imported and warmed up"""
+        return all(self.backends[name].state == "ready" for name in names if name in self.backends)
+
+    def report(self) -> dict[str, dict]:
+        """Load state and timings per backend"""
+        return {name: backend.report() for name, backend in self.backends.items()}
+
+    async def _warmup(self, names: list[str], parallel: bool) -> None:
+        started = time.perf_counter()
+        if parallel:
+            await asyncio.gather(*(asyncio.to_thread(self.warm, name) for name in names))
+        else:
+            for name in names:
+                await asyncio.to_thread(self.warm, name)
+
+        logger.info(
+            "Detector warm-up complete",
+            seconds=round(time.perf_counter() - started, 3),
+            backends={name: self.backends[name].report() for name in names},
+        )
+
+    def _import(self, backend: Backend) -> None:
+        backend.state = "importing"
+        started = time.perf_counter()
+        try:
+            namespace = SimpleNamespace()
+            for attribute, target in backend.imports.items():
+                module_name, _, member = target.partition(":")
+                module = importlib.import_module(module_name)
+                setattr(namespace, attribute, getattr(module, member) if member else module)
+        except Exception as e:
+            backend.state = "failed"
+            backend.error = f"{type(e).__name__}: {e}"
+            logger.error("Failed to load detector backend", exc_info=e, backend=backend.name)
+            raise
+
+        backend.import_seconds = round(time.perf_counter() - started, 3)
+        backend.namespace = namespace
+        backend.state = "imported" if backend.warm else "ready"
+        BACKEND_LOAD_SECONDS.labels(backend.name, "import").set(backend.import_seconds)
+        logger.info("Detector backend loaded", backend=backend.name, seconds=backend.import_seconds)
+
+
+# Global instance
+backends = DetectorRegistry([
+    Backend("pandas", {"pd": "pandas"}),
+    Backend("prophet", {"Prophet": "prophet:Prophet"}, warm=_warm_prophet),
+    Backend(
+        "isolation_forest",
+        {
+            "IsolationForest": "sklearn.ensemble:IsolationForest",
+            "StandardScaler": "sklearn.preprocessing:StandardScaler",
+        },
+        warm=_warm_isolation_forest,
+    ),
+])
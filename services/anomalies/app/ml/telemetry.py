@@ -0,0 +1,95 @@
+"""Prometheus metrics and OpenTelemetry spans for detector stages"""
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from opentelemetry import trace
+from prometheus_client import Counter, Gauge, Histogram
+
+tracer = trace.get_tracer("ayvlo.anomalies.detector")
+
+# Series sizes are bucketed so label cardinality stays fixed
+SIZE_BUCKETS = (
+    (1_000, "lt_1k"),
+    (10_000, "1k_10k"),
+    (100_000, "10k_100k"),
+)
+
+# Prophet fits on large series take minutes; the upper buckets catch them
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+STAGE_DURATION = Histogram(
+    "anomaly_detector_stage_duration_seconds",
+    "Duration of one detector stage",
+    ["stage", "algorithm", "size_bucket"],
+    buckets=DURATION_BUCKETS,
+)
+
+STAGE_FAILURES = Counter(
+    "anomaly_detector_stage_failures_total",
+    "Detector stages that raised",
+    ["stage", "algorithm", "size_bucket", "error"],
+)
+
+# An algorithm that fails is dropped from the vote instead of failing the
+# detection, so these failures are otherwise invisible in the response
+ALGORITHM_FAILURES = Counter(
+    "anomaly_detector_algorithm_failures_total",
+    "Algorithm runs that failed and contributed no detections",
+    ["algorithm", "size_bucket"],
+)
+
+DETECTION_DURATION = Histogram(
+    "anomaly_detector_duration_seconds",
+    "Duration of a full ensemble detection",
+    ["size_bucket"],
+    buckets=DURATION_BUCKETS,
+)
+
+SERIES_POINTS = Histogram(
+    "anomaly_detector_series_points",
+    "Points per series passed to the detector",
+    buckets=(100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000),
+)
+
+SLICES_SCREENED = Counter(
+    "anomaly_detector_slices_total",
+    "Slices checked by multi-series detection, by outcome (clear, flagged, escalated)",
+    ["outcome"],
+)
+
+BACKEND_LOAD_SECONDS = Gauge(
+    "anomaly_detector_backend_load_seconds",
+    "Time taken to import (phase=import) or warm up (phase=warm) a detector backend",
+    ["backend", "phase"],
+)
+
+
+def size_bucket(points: int) -> str:
+    for limit, label in SIZE_BUCKETS:
+        if points < limit:
+            return label
+    return "gte_100k"
+
+
+@contextmanager
+def stage(name: str, algorithm: str, points: int) -> Iterator[trace.Span]:
+    """Time a detector stage into the stage histogram, inside its own span"""
+    bucket = size_bucket(points)
+    with tracer.start_as_current_span(
+        f"detector.{name}",
+        attributes={
+            "detector.stage": name,
+            "detector.algorithm": algorithm,
+            "detector.points": points,
+        },
+    ) as span:
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            STAGE_FAILURES.labels(name, algorithm, bucket, type(e).__name__).inc()
+            raise
+        finally:
+            STAGE_DURATION.labels(name, algorithm, bucket).observe(time.perf_counter() - started)
@@ -12,6 +12,33 @@ class DetectRequest(BaseModel):
     start_time: datetime = Field(..., description="Start of time range")
     end_time: datetime = Field(..., description="End of time range")
     dimensions: Optional[Dict[str, str]] = Field(default=None, description="Dimension filters")
+    explain: bool = Field(default=False, description="Explain the anomalous window by dimension")
+
+
+class SliceDetectRequest(BaseModel):
+    """Request to detect anomalies in every slice of a metric"""
+
+    metric_name: str = Field(..., description="Name of the metric to analyze")
+    dimension: str = Field(..., description="Dimension key whose values are the slices")
+    start_time: datetime = Field(..., description="Start of time range")
+    end_time: datetime = Field(..., description="End of time range")
+    dimensions: Optional[Dict[str, str]] = Field(default=None, description="Dimension filters")
+    step_seconds: int = Field(default=3600, ge=1, description="Bucket width; slices are summed per bucket")
+    season_seconds: int = Field(default=86400, ge=0, description="Season length (0 = none)")
+    escalate: bool = Field(default=True, description="Run the full ensemble on flagged slices")
+
+
+class ExplainRequest(BaseModel):
+    """Request to explain a change in a metric by dimension"""
+
+    metric_name: str = Field(..., description="Name of the metric to analyze")
+    start_time: datetime = Field(..., description="Start of the anomalous window")
+    end_time: datetime = Field(..., description="End of the anomalous window (exclusive)")
+    baseline_start: Optional[datetime] = Field(
+        default=None,
+        description="Start of the baseline, which ends at start_time; defaults to a window of the same length",
+    )
+    dimensions: Optional[Dict[str, str]] = Field(default=None, description="Dimension filters")
 
 
 class AnomalyPoint(BaseModel):
@@ -34,6 +61,79 @@ class DetectionSummary(BaseModel):
     error: Optional[str] = None
 
 
+class SlicePoint(BaseModel):
+    """Point of a slice screened as an outlier"""
+
+    timestamp: str
+    value: float
+    expected: float
+    score: float = Field(..., description="Robust z-score: error over the slice's scaled MAD")
+
+
+class SliceResult(BaseModel):
+    """Screening and, if escalated, ensemble results for one slice"""
+
+    value: str
+    score: float = Field(..., description="Largest |score| of the slice")
+    points: List[SlicePoint]
+    anomalies: Optional[List[AnomalyPoint]] = None
+    summary: Optional[DetectionSummary] = None
+
+
+class SliceDetectResponse(BaseModel):
+    """Response from multi-series detection; only flagged slices are listed"""
+
+    metric_name: str
+    tenant_id: str
+    dimension: str
+    total_slices: int
+    flagged_slices: int
+    escalated_slices: int
+    slices: List[SliceResult]
+
+
+class TimeWindow(BaseModel):
+    """Half-open [start, end) time range"""
+
+    start: str
+    end: str
+
+
+class DimensionContributor(BaseModel):
+    """One dimension value's part in a change"""
+
+    value: str
+    actual: float
+    expected: float
+    change: float
+    relative_change: Optional[float] = None
+    contribution: float = Field(..., description="Share of the metric's overall change")
+    surprise: float = Field(..., description="Jensen-Shannon divergence of the value's share")
+
+
+class DimensionExplanation(BaseModel):
+    """Values of one dimension key that explain a change"""
+
+    key: str
+    contribution: float
+    surprise: float
+    contributors: List[DimensionContributor]
+
+
+class Explanation(BaseModel):
+    """Root cause of a change, by dimension"""
+
+    metric_name: str
+    window: TimeWindow
+    baseline: TimeWindow
+    actual: float
+    expected: float
+    change: float
+    relative_change: Optional[float] = None
+    dimensions: List[DimensionExplanation]
+    narrative: str
+
+
 class DetectResponse(BaseModel):
     """Response from anomaly detection"""
 
@@ -42,3 +142,4 @@ class DetectResponse(BaseModel):
     anomalies: List[AnomalyPoint]
     summary: DetectionSummary
     algorithms: Optional[Dict[str, List[int]]] = None
+    explanation: Optional[Explanation] = None
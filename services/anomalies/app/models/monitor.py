@@ -0,0 +1,48 @@
+"""Pydantic models for monitored metrics"""
+
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+class MonitorCreate(BaseModel):
+    """Request to monitor a metric series continuously"""
+
+    metric_name: str = Field(..., description="Name of the metric to monitor")
+    dimensions: Optional[Dict[str, str]] = Field(default=None, description="Dimension filters")
+    cadence_seconds: int = Field(
+        default=300,
+        ge=settings.MONITOR_MIN_CADENCE_SECONDS,
+        description="Seconds between detection runs",
+    )
+    lookback_seconds: int = Field(
+        default=settings.MONITOR_DEFAULT_LOOKBACK_SECONDS,
+        ge=3600,
+        description="History each run feeds to the detector",
+    )
+
+
+class MonitorStatus(BaseModel):
+    """A monitored series and its latest run"""
+
+    id: str
+    metric_name: str
+    dimensions: Dict[str, str]
+    cadence_seconds: int
+    lookback_seconds: int
+    status: str = Field(..., description="pending, active, lagging or error")
+    last_check: Optional[str] = None
+    next_check: Optional[str] = None
+    lag_seconds: Optional[float] = Field(default=None, description="Delay of the latest run, or current overdue time")
+    last_severity: Optional[str] = None
+    last_error: Optional[str] = None
+    last_duration_ms: Optional[float] = None
+    anomalies_detected: int = 0
+
+
+class MonitorList(BaseModel):
+    """Monitored series of a tenant"""
+
+    tenant_id: str
+    monitored_metrics: List[MonitorStatus]
@@ -0,0 +1,207 @@
+"""Continuous anomaly detection over monitored series"""
+
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+import numpy as np
+import structlog
+from app.core.config import settings
+from app.core.metric_data import fetch_metric_data
+from app.core.sharding import ShardMembership
+from app.ml.detector import AnomalyDetector
+from app.scheduler.store import MonitorStore, next_slot
+
+logger = structlog.get_logger()
+
+
+def _epoch_seconds(timestamps: np.ndarray) -> np.ndarray:
+    """Epoch seconds for datetime64 or ISO string timestamps"""
+    if timestamps.dtype.kind == "M":
+        return timestamps.astype("datetime64[ms]").astype(np.int64) / 1000.0
+    # JSON fallback; ISO strings may carry offsets, which numpy cannot parse
+    parsed = (datetime.fromisoformat(ts.replace("Z", "+00:00")) for ts in timestamps)
+    return np.array(
+        [(ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp() for ts in parsed],
+        dtype=np.float64,
+    )
+
+
+def _isoformat(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class Scheduler:
+    """
+    Runs detection for monitors as they fall due.
+
+    Every replica polls the schedule partitions it owns on the shard ring and
+    leases only as many due monitors as it has free slots. Leases keep a
+    monitor from running twice while ownership moves between replicas, and are
+    renewed for as long as the run is in flight.
+    """
+
+    def __init__(self, store: MonitorStore, detector: AnomalyDetector, membership: ShardMembership):
+        self.store = store
+        self.detector = detector
+        self.membership = membership
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        """Start polling the schedule"""
+        try:
+            # Cheap at startup, and covers schedules written before the index
+            await self.store.reindex()
+        except Exception as e:
+            logger.error("Failed to rebuild the schedule index", exc_info=e)
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Scheduler started", owner=self.owner, concurrency=settings.SCHEDULER_CONCURRENCY)
+
+    async def stop(self):
+        """Stop claiming work and wait for in-flight runs"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        if self._running:
+            # Unfinished runs keep their lease and are retried once it expires
+            await asyncio.wait(self._running, timeout=30)
+        logger.info("Scheduler stopped", owner=self.owner)
+
+    async def _loop(self):
+        while True:
+            free = settings.SCHEDULER_CONCURRENCY - len(self._running)
+            claimed = []
+
+            if free > 0:
+                try:
+                    claimed = await self.store.claim(
+                        owner=self.owner,
+                        now=time.time(),
+                        limit=free,
+                        lease_seconds=settings.SCHEDULER_LEASE_SECONDS,
+                        partitions=self.membership.owned_partitions,
+                    )
+                except Exception as e:
+                    logger.error("Failed to claim monitors", exc_info=e)
+
+            for monitor_id, due in claimed:
+                task = asyncio.create_task(self._run(monitor_id, due))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            # More work may be due right away if every free slot was filled
+            if not claimed or len(claimed) < free:
+                await asyncio.sleep(settings.SCHEDULER_POLL_INTERVAL_SECONDS)
+            else:
+                await asyncio.sleep(0)
+
+    async def _run(self, monitor_id: str, due: float):
+        """Detect over one monitor's window, then record the run and reschedule it"""
+        monitor = await self.store.get(monitor_id)
+        if not monitor:
+            return
+
+        started = time.time()
+        cadence = monitor["cadence_seconds"]
+
+        # Windows missed while no replica was running are covered by widening
+        # this run's window instead of replaying them one by one
+        missed = max(0, int((started - due) // cadence))
+        backfill = min(missed * cadence, settings.SCHEDULER_MAX_BACKFILL_SECONDS)
+        window_end = started
+        since = max(monitor["last_window_end"] or 0.0, window_end - cadence - backfill)
+        window_start = min(since, window_end - monitor["lookback_seconds"])
+
+        state = {
+            "last_check": started,
+            "lag_seconds": round(max(0.0, started - due), 3),
+            "backfilled_seconds": backfill,
+            "last_error": None,
+        }
+        new_anomalies = 0
+        heartbeat = asyncio.create_task(self._heartbeat(monitor))
+
+        try:
+            timestamps, values = await fetch_metric_data(
+                tenant_id=monitor["tenant_id"],
+                metric_name=monitor["metric_name"],
+                start_time=_isoformat(window_start),
+                end_time=_isoformat(window_end),
+                dimensions=monitor["dimensions"] or None,
+            )
+
+            if len(values) == 0:
+                state.update(last_status="no_data", last_severity="none", last_window_end=window_end)
+            else:
+                result = await asyncio.to_thread(
+                    self.detector.detect,
+                    timestamps,
+                    values,
+                    monitor["metric_name"],
+                )
+                point_times = _epoch_seconds(timestamps)
+                new_anomalies = sum(
+                    1 for anomaly in result["anomalies"] if point_times[anomaly["index"]] > since
+                )
+                state.update(
+                    last_status="error" if result["summary"].get("error") else "ok",
+                    last_error=result["summary"].get("error"),
+                    last_severity=result["summary"]["severity"],
+                    last_window_end=window_end,
+                )
+
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error("Scheduled detection failed", exc_info=e, monitor=monitor_id)
+            state.update(last_status="error", last_error=detail)
+
+        finally:
+            heartbeat.cancel()
+
+        state["last_duration_ms"] = round((time.time() - started) * 1000, 1)
+        next_due = next_slot(monitor_id, cadence, time.time())
+        next_due += random.uniform(0, min(settings.SCHEDULER_JITTER_SECONDS, cadence / 10))
+
+        try:
+            recorded = await self.store.complete(monitor, self.owner, next_due, new_anomalies, state)
+            if not recorded:
+                logger.warning("Monitor lease lost or monitor deleted", monitor=monitor_id)
+        except Exception as e:
+            # The lease expires and another replica retries the monitor
+            logger.error("Failed to record monitor run", exc_info=e, monitor=monitor_id)
+
+        if missed:
+            logger.info(
+                "Monitor backfilled",
+                monitor=monitor_id,
+                missed_runs=missed,
+                backfilled_seconds=backfill,
+            )
+
+    async def _heartbeat(self, monitor: dict):
+        """Renew a run's lease until cancelled, so long runs are not reclaimed"""
+        interval = settings.SCHEDULER_LEASE_SECONDS / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await self.store.renew(
+                    monitor, self.owner, settings.SCHEDULER_LEASE_SECONDS
+                )
+            except Exception as e:
+                # Retried next interval, well before the lease runs out
+                logger.error("Failed to renew monitor lease", exc_info=e, monitor=monitor["id"])
+                continue
+            if not renewed:
+                logger.warning("Monitor lease lost mid-run", monitor=monitor["id"])
+                return
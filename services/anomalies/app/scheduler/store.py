@@ -0,0 +1,348 @@
+"""Monitored series persisted in Redis"""
+
+import hashlib
+import json
+import math
+import time
+import zlib
+
+import structlog
+from app.core.redis import RedisClient, redis_client
+from app.core.sharding import PARTITIONS, partition_for
+
+logger = structlog.get_logger()
+
+LEASE_PREFIX = "monitor:lease:"
+
+# Schedule partitions scored by (at most) the due time of their earliest
+# monitor, so a poll only reads the partitions with work due. Writers lower a
+# partition's score with ZADD LT; claims recompute it for partitions they read.
+SCHEDULE_INDEX = "monitors:schedule:due"
+
+# Claim the ARGV[3] most overdue monitors across the owned schedule partitions
+# KEYS[2..]. Each is pushed out to the lease expiry, so a replica that dies
+# mid-run only delays it until the lease lapses, and its lease key records
+# the owner allowed to renew and reschedule it.
+CLAIM_SCRIPT = """
+local limit = tonumber(ARGV[3])
+local owned = {}
+for i = 2, #KEYS do
+    owned[KEYS[i]] = true
+end
+local due = {}
+local visited = {}
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])) do
+    if owned[key] then
+        table.insert(visited, key)
+        local items = redis.call('ZRANGEBYSCORE', key, '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, limit)
+        for i = 1, #items, 2 do
+            table.insert(due, {key, items[i], items[i + 1], tonumber(items[i + 1])})
+        end
+    end
+end
+table.sort(due, function(a, b) return a[4] < b[4] end)
+local claimed = {}
+for i = 1, math.min(limit, #due) do
+    local item = due[i]
+    redis.call('ZADD', item[1], 'XX', ARGV[2], item[2])
+    redis.call('SET', ARGV[5] .. item[2], ARGV[4], 'PX', tonumber(ARGV[6]))
+    table.insert(claimed, item[2])
+    table.insert(claimed, item[3])
+end
+for _, key in ipairs(visited) do
+    local first = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    if #first == 0 then
+        redis.call('ZREM', KEYS[1], key)
+    else
+        redis.call('ZADD', KEYS[1], first[2], key)
+    end
+end
+return claimed
+"""
+
+# Extend a lease still held by ARGV[1] and push its monitor out to match
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('PEXPIRE', KEYS[2], tonumber(ARGV[3]))
+redis.call('ZADD', KEYS[1], 'XX', ARGV[2], ARGV[4])
+return 1
+"""
+
+# Rebuild the index entries of the given schedule partitions
+REINDEX_SCRIPT = """
+for i = 2, #KEYS do
+    local first = redis.call('ZRANGE', KEYS[i], 0, 0, 'WITHSCORES')
+    if #first == 0 then
+        redis.call('ZREM', KEYS[1], KEYS[i])
+    else
+        redis.call('ZADD', KEYS[1], first[2], KEYS[i])
+    end
+end
+return #KEYS - 1
+"""
+
+# Reschedule a monitor and record its run, only if the lease is still ours and
+# the monitor was not deleted meanwhile
+COMPLETE_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[2], ARGV[3])
+redis.call('ZADD', KEYS[4], 'LT', ARGV[2], KEYS[1])
+redis.call('HINCRBY', KEYS[3], 'anomalies_detected', tonumber(ARGV[4]))
+if #ARGV > 4 then
+    redis.call('HSET', KEYS[3], unpack(ARGV, 5))
+end
+return 1
+"""
+
+
+def schedule_key(partition: int) -> str:
+    """Priority queue of one partition: monitor ids scored by next due epoch second"""
+    return f"monitors:schedule:{partition}"
+
+
+def monitor_key(monitor_id: str) -> str:
+    return f"monitor:{monitor_id}"
+
+
+def tenant_key(tenant_id: str) -> str:
+    return f"monitors:tenant:{tenant_id}"
+
+
+def lease_key(monitor_id: str) -> str:
+    return f"{LEASE_PREFIX}{monitor_id}"
+
+
+def monitor_id_for(tenant_id: str, metric_name: str, dimensions: dict | None) -> str:
+    """Stable id for a (tenant, metric, dimensions) series"""
+    key = json.dumps([tenant_id, metric_name, dimensions or {}], sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def next_slot(monitor_id: str, cadence: int, after: float) -> float:
+    """
+    First run time strictly after `after`.
+
+    Each monitor runs on its own grid offset by a phase derived from its id, so
+    monitors sharing a cadence spread evenly instead of all firing on the
+    minute, and the grid never drifts however late individual runs start.
+    """
+    phase = (zlib.crc32(monitor_id.encode()) % 10_000) / 10_000 * cadence
+    return (math.floor((after - phase) / cadence) + 1) * cadence + phase
+
+
+class MonitorStore:
+    """Monitored series definitions, schedule and run state"""
+
+    def __init__(self, redis: RedisClient):
+        self.redis = redis
+        self._claim = None
+        self._renew = None
+        self._complete = None
+        self._reindex = None
+
+    @property
+    def client(self):
+        return self.redis.client
+
+    async def upsert(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        dimensions: dict | None,
+        cadence_seconds: int,
+        lookback_seconds: int,
+    ) -> dict:
+        """Create a monitor, or update the cadence of an existing one"""
+        monitor_id = monitor_id_for(tenant_id, metric_name, dimensions)
+        key = monitor_key(monitor_id)
+        schedule = schedule_key(partition_for(tenant_id, metric_name))
+        previous_cadence = await self.client.hget(key, "cadence_seconds")
+        in_flight = await self.client.exists(lease_key(monitor_id))
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                key,
+                mapping={
+                    "id": monitor_id,
+                    "partition": partition_for(tenant_id, metric_name),
+                    "tenant_id": tenant_id,
+                    "metric_name": metric_name,
+                    "dimensions": json.dumps(dimensions or {}, sort_keys=True),
+                    "cadence_seconds": cadence_seconds,
+                    "lookback_seconds": lookback_seconds,
+                },
+            )
+            pipe.hsetnx(key, "created_at", time.time())
+            pipe.sadd(tenant_key(tenant_id), monitor_id)
+
+            first_run = next_slot(monitor_id, cadence_seconds, time.time())
+            if previous_cadence is None:
+                pipe.zadd(schedule, {monitor_id: first_run}, nx=True)
+                pipe.zadd(SCHEDULE_INDEX, {schedule: first_run}, lt=True)
+            elif int(previous_cadence) != cadence_seconds and not in_flight:
+                # An in-flight run reschedules itself on the new cadence
+                pipe.zadd(schedule, {monitor_id: first_run}, xx=True)
+                pipe.zadd(SCHEDULE_INDEX, {schedule: first_run}, lt=True)
+            await pipe.execute()
+
+        return await self.get(monitor_id)
+
+    async def delete(self, tenant_id: str, monitor_id: str) -> bool:
+        """Delete a tenant's monitor"""
+        key = monitor_key(monitor_id)
+        owner, partition = await self.client.hmget(key, "tenant_id", "partition")
+        if owner != tenant_id:
+            return False
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.srem(tenant_key(tenant_id), monitor_id)
+            pipe.zrem(schedule_key(int(partition)), monitor_id)
+            await pipe.execute()
+        return True
+
+    async def get(self, monitor_id: str) -> dict | None:
+        """Monitor definition and run state, with its next due time"""
+        fields = await self.client.hgetall(monitor_key(monitor_id))
+        if not fields:
+            return None
+
+        next_due = await self.client.zscore(schedule_key(int(fields["partition"])), monitor_id)
+        return self._decode(fields, next_due)
+
+    async def list_for_tenant(self, tenant_id: str) -> list[dict]:
+        """All monitors of a tenant"""
+        monitor_ids = sorted(await self.client.smembers(tenant_key(tenant_id)))
+        if not monitor_ids:
+            return []
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for monitor_id in monitor_ids:
+                pipe.hgetall(monitor_key(monitor_id))
+            found = [fields for fields in await pipe.execute() if fields]
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for fields in found:
+                pipe.zscore(schedule_key(int(fields["partition"])), fields["id"])
+            next_due = await pipe.execute()
+
+        return [self._decode(fields, due) for fields, due in zip(found, next_due)]
+
+    async def backlog(self, now: float, partitions: list[int] | None = None) -> int:
+        """Number of monitors currently due or overdue"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            for partition in range(PARTITIONS) if partitions is None else partitions:
+                pipe.zcount(schedule_key(partition), "-inf", now)
+            return sum(await pipe.execute())
+
+    async def claim(
+        self,
+        owner: str,
+        now: float,
+        limit: int,
+        lease_seconds: int,
+        partitions: list[int],
+    ) -> list[tuple[str, float]]:
+        """Atomically lease up to `limit` due monitors of `partitions` as (monitor_id, due time)"""
+        if not partitions:
+            return []
+        if self._claim is None:
+            self._claim = self.client.register_script(CLAIM_SCRIPT)
+
+        result = await self._claim(
+            keys=[SCHEDULE_INDEX] + [schedule_key(partition) for partition in partitions],
+            args=[now, now + lease_seconds, limit, owner, LEASE_PREFIX, lease_seconds * 1000],
+        )
+        return [(result[i], float(result[i + 1])) for i in range(0, len(result), 2)]
+
+    async def renew(self, monitor: dict, owner: str, lease_seconds: int) -> bool:
+        """Extend a lease held by `owner`; False if it was lost"""
+        if self._renew is None:
+            self._renew = self.client.register_script(RENEW_SCRIPT)
+
+        monitor_id = monitor["id"]
+        result = await self._renew(
+            keys=[schedule_key(monitor["partition"]), lease_key(monitor_id)],
+            args=[owner, time.time() + lease_seconds, lease_seconds * 1000, monitor_id],
+        )
+        return bool(result)
+
+    async def reindex(self, partitions: list[int] | None = None) -> int:
+        """Rebuild the due index of `partitions` (all by default) from their schedules"""
+        if self._reindex is None:
+            self._reindex = self.client.register_script(REINDEX_SCRIPT)
+
+        if partitions is None:
+            partitions = range(PARTITIONS)
+        keys = [SCHEDULE_INDEX] + [schedule_key(partition) for partition in partitions]
+        return await self._reindex(keys=keys)
+
+    async def complete(
+        self,
+        monitor: dict,
+        owner: str,
+        next_due: float,
+        new_anomalies: int,
+        state: dict,
+    ) -> bool:
+        """Record a run and reschedule; False if the lease was lost or the monitor deleted"""
+        if self._complete is None:
+            self._complete = self.client.register_script(COMPLETE_SCRIPT)
+
+        monitor_id = monitor["id"]
+        args = [owner, next_due, monitor_id, new_anomalies]
+        for field, value in state.items():
+            args += [field, "" if value is None else value]
+
+        result = await self._complete(
+            keys=[
+                schedule_key(monitor["partition"]),
+                lease_key(monitor_id),
+                monitor_key(monitor_id),
+                SCHEDULE_INDEX,
+            ],
+            args=args,
+        )
+        return bool(result)
+
+    @staticmethod
+    def _decode(fields: dict, next_due: float | None) -> dict | None:
+        if not fields:
+            return None
+
+        def number(name: str) -> float | None:
+            value = fields.get(name)
+            return float(value) if value not in (None, "") else None
+
+        return {
+            "id": fields["id"],
+            "partition": int(fields["partition"]),
+            "tenant_id": fields["tenant_id"],
+            "metric_name": fields["metric_name"],
+            "dimensions": json.loads(fields.get("dimensions") or "{}"),
+            "cadence_seconds": int(fields["cadence_seconds"]),
+            "lookback_seconds": int(fields["lookback_seconds"]),
+            "created_at": number("created_at"),
+            "next_due": next_due,
+            "last_check": number("last_check"),
+            "last_window_end": number("last_window_end"),
+            "last_status": fields.get("last_status") or None,
+            "last_error": fields.get("last_error") or None,
+            "last_severity": fields.get("last_severity") or None,
+            "last_duration_ms": number("last_duration_ms"),
+            "lag_seconds": number("lag_seconds"),
+            "backfilled_seconds": number("backfilled_seconds"),
+            "anomalies_detected": int(fields.get("anomalies_detected") or 0),
+        }
+
+
+# Global instance
+monitor_store = MonitorStore(redis_client)
@@ -0,0 +1,341 @@
+"""
+Benchmarks for the anomaly detector (app/ml/detector.py).
+
+Generates synthetic seasonal series with injected anomalies, times every
+detector stage and records peak RSS. Each case runs in a fresh subprocess so
+memory and import state never leak between cases. Results are JSON and can be
+compared across commits.
+
+Usage (from services/anomalies):
+    python -m benchmarks.bench_detector run [--quick] [--output results.json]
+    python -m benchmarks.bench_detector run --freq minutely --sizes 1000 100000
+    python -m benchmarks.bench_detector compare base.json head.json [--threshold 0.15]
+
+`compare` exits with status 1 if any stage, peak RSS or recall regressed
+beyond the thresholds, so it can gate CI.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+RESULT_MARKER = "BENCH_RESULT "
+
+FREQ_SECONDS = {"hourly": 3600, "minutely": 60}
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 500_000]
+QUICK_SIZES = [1_000, 10_000]
+STAGES = [
+    "build_frame",
+    "prophet_fit",
+    "prophet_predict",
+    "isolation_features",
+    "isolation_fit",
+    "voting",
+]
+
+
+def synthetic_series(
+    points: int,
+    freq: str,
+    seed: int,
+    anomaly_rate: float = 0.005,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Trend + daily and weekly seasonality + Gaussian noise, with spikes and dips
+    injected at random points.
+
+    Returns (datetime64[s] timestamps, values, sorted injected indices).
+    """
+    rng = np.random.default_rng(seed)
+    step = FREQ_SECONDS[freq]
+    seconds = np.arange(points, dtype=np.int64) * step
+
+    timestamps = np.datetime64("2024-01-01T00:00:00", "s") + seconds.astype("timedelta64[s]")
+    values = (
+        100.0
+        + 5.0 * seconds / seconds[-1]
+        + 20.0 * np.sin(2 * np.pi * seconds / 86_400)
+        + 10.0 * np.sin(2 * np.pi * seconds / 604_800)
+        + rng.normal(0.0, 3.0, points)
+    )
+
+    count = max(1, int(points * anomaly_rate))
+    injected = np.sort(rng.choice(points, size=count, replace=False))
+    values[injected] += rng.choice([-1.0, 1.0], size=count) * rng.uniform(30.0, 60.0, size=count)
+
+    return timestamps, values, injected
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_case(case: dict) -> dict:
+    """Time each detector stage for one case (runs inside the subprocess)"""
+    from app.ml.detector import AnomalyDetector
+    from app.ml.registry import backends
+
+    # Backends otherwise import inside the first timed stage that uses them
+    backends.load("pandas")
+    backends.load("isolation_forest")
+    if case["prophet"]:
+        backends.load("prophet")
+
+    rss_baseline = peak_rss_mb()
+    timestamps, values, injected = synthetic_series(case["points"], case["freq"], case["seed"])
+    detector = AnomalyDetector()
+    timings: dict[str, list[float]] = {stage: [] for stage in STAGES}
+
+    def timed(stage: str, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[stage].append(time.perf_counter() - started)
+        return result
+
+    for _ in range(case["repeat"]):
+        df = timed("build_frame", detector._build_frame, timestamps, values)
+
+        if case["prophet"]:
+            model = timed("prophet_fit", detector._fit_prophet, df)
+            prophet_anomalies = timed("prophet_predict", detector._predict_prophet, model, df)
+
+        features = timed("isolation_features", detector._isolation_features, df)
+        isolation_anomalies = timed("isolation_fit", detector._fit_isolation_forest, features)
+
+        if not case["prophet"]:
+            # Vote over IsolationForest labels alone to still time the stage
+            prophet_anomalies = isolation_anomalies
+        anomalies = timed("voting", detector._ensemble_vote, df, prophet_anomalies, isolation_anomalies)
+
+    detected = {anomaly["index"] for anomaly in anomalies}
+    hits = len(detected.intersection(injected.tolist()))
+
+    stages = {
+        stage: {
+            "median_s": round(statistics.median(samples), 6),
+            "min_s": round(min(samples), 6),
+        }
+        if samples
+        else {"skipped": True}
+        for stage, samples in timings.items()
+    }
+
+    return {
+        **case,
+        "stages": stages,
+        "total_median_s": round(sum(s.get("median_s", 0.0) for s in stages.values()), 6),
+        "rss_baseline_mb": rss_baseline,
+        "peak_rss_mb": peak_rss_mb(),
+        "injected": len(injected),
+        "detected": len(detected),
+        "precision": round(hits / len(detected), 4) if detected else None,
+        "recall": round(hits / len(injected), 4),
+    }
+
+
+def run_in_subprocess(case: dict, timeout: float) -> dict:
+    """Run one case in a fresh interpreter and collect its result"""
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_detector", "_case", json.dumps(case)],
+            cwd=SERVICE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {**case, "error": f"timed out after {timeout}s"}
+
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+
+    return {**case, "error": (completed.stderr or completed.stdout).strip()[-2000:]}
+
+
+def environment() -> dict:
+    """Commit, interpreter, library versions and host, for comparing runs"""
+
+    def version(package: str) -> str | None:
+        try:
+            return metadata.version(package)
+        except metadata.PackageNotFoundError:
+            return None
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=SERVICE_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "libraries": {
+            package: version(package)
+            for package in ("numpy", "pandas", "prophet", "scikit-learn", "cmdstanpy")
+        },
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    repeat = args.repeat or (1 if args.quick else 3)
+
+    cases = [
+        {
+            "name": f"{freq}-{points}",
+            "freq": freq,
+            "points": points,
+            "repeat": repeat,
+            "seed": args.seed,
+            "prophet": points <= args.prophet_max_points,
+        }
+        for freq in args.freq
+        for points in sizes
+    ]
+
+    results = []
+    for case in cases:
+        print(f"running {case['name']}", file=sys.stderr)
+        result = run_in_subprocess(case, args.timeout)
+        if "error" in result:
+            print(f"  failed: {result['error'][-300:]}", file=sys.stderr)
+        else:
+            print(
+                f"  total {result['total_median_s']:.3f}s  peak RSS {result['peak_rss_mb']} MB"
+                f"  recall {result['recall']}",
+                file=sys.stderr,
+            )
+        results.append(result)
+
+    return {"environment": environment(), "results": results}
+
+
+def compare(base: dict, head: dict, threshold: float, min_delta: float, rss_threshold: float) -> int:
+    """
+    Print per-stage changes; return the number of regressions.
+
+    Stages are compared on their fastest run, which is far less sensitive to
+    scheduler noise than the median.
+    """
+    base_cases = {result["name"]: result for result in base["results"] if "error" not in result}
+    regressions = 0
+
+    print(f"base {base['environment'].get('commit')}  head {head['environment'].get('commit')}")
+    print(f"{'case':<18}{'metric':<22}{'base':>12}{'head':>12}{'change':>10}")
+
+    for result in head["results"]:
+        name = result["name"]
+        if "error" in result:
+            print(f"{name:<18}{'error':<22}{result['error'][:60]}")
+            regressions += 1
+            continue
+        if name not in base_cases:
+            continue
+        previous = base_cases[name]
+
+        rows = [
+            (stage, previous["stages"][stage].get("min_s"), result["stages"][stage].get("min_s"))
+            for stage in STAGES
+            if stage in previous["stages"]
+        ]
+        rows.append(("total (median)", previous["total_median_s"], result["total_median_s"]))
+
+        for metric, old, new in rows:
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            regressed = change > threshold and new - old > min_delta
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<18}{metric + ' (s)':<22}{old:>12.4f}{new:>12.4f}{change:>+10.1%}{flag}")
+
+        rss_change = (result["peak_rss_mb"] - previous["peak_rss_mb"]) / previous["peak_rss_mb"]
+        rss_regressed = rss_change > rss_threshold
+        regressions += rss_regressed
+        flag = "  REGRESSION" if rss_regressed else ""
+        print(
+            f"{name:<18}{'peak RSS (MB)':<22}{previous['peak_rss_mb']:>12.1f}"
+            f"{result['peak_rss_mb']:>12.1f}{rss_change:>+10.1%}{flag}"
+        )
+
+        recall_drop = previous["recall"] - result["recall"]
+        if recall_drop > 0.05:
+            regressions += 1
+            print(f"{name:<18}{'recall':<22}{previous['recall']:>12.4f}{result['recall']:>12.4f}  REGRESSION")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = sub.add_parser("run", help="Run the benchmark matrix")
+    run_cmd.add_argument("--freq", nargs="+", choices=sorted(FREQ_SECONDS), default=["hourly", "minutely"])
+    run_cmd.add_argument("--sizes", nargs="+", type=int)
+    run_cmd.add_argument("--repeat", type=int, help="Runs per case (default 3, 1 with --quick)")
+    run_cmd.add_argument("--quick", action="store_true", help="Small sizes, one run each")
+    run_cmd.add_argument("--seed", type=int, default=7)
+    run_cmd.add_argument(
+        "--prophet-max-points",
+        type=int,
+        default=100_000,
+        help="Skip Prophet stages above this many points",
+    )
+    run_cmd.add_argument("--timeout", type=float, default=3600, help="Seconds per case")
+    run_cmd.add_argument("--output", help="Write results here instead of stdout")
+
+    compare_cmd = sub.add_parser("compare", help="Compare two result files")
+    compare_cmd.add_argument("base")
+    compare_cmd.add_argument("head")
+    compare_cmd.add_argument("--threshold", type=float, default=0.15, help="Relative stage slowdown")
+    compare_cmd.add_argument("--min-delta", type=float, default=0.005, help="Ignore slowdowns below this (s)")
+    compare_cmd.add_argument("--rss-threshold", type=float, default=0.15, help="Relative peak RSS growth")
+
+    case_cmd = sub.add_parser("_case", help=argparse.SUPPRESS)
+    case_cmd.add_argument("case")
+
+    args = parser.parse_args()
+
+    if args.command == "_case":
+        print(RESULT_MARKER + json.dumps(run_case(json.loads(args.case))))
+    elif args.command == "run":
+        report = json.dumps(run(args), indent=2)
+        if args.output:
+            Path(args.output).write_text(report + "\n")
+        else:
+            print(report)
+    else:
+        base = json.loads(Path(args.base).read_text())
+        head = json.loads(Path(args.head).read_text())
+        regressions = compare(base, head, args.threshold, args.min_delta, args.rss_threshold)
+        print(f"{regressions} regression(s)")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Tests for consistent-hash partition ownership"""
+
+import pytest
+from app.core.sharding import PARTITIONS, HashRing, partition_for
+
+pytestmark = pytest.mark.unit
+
+MEMBERS = [f"http://anomalies-{i}:8002" for i in range(4)]
+
+
+def ownership(ring: HashRing) -> dict[int, str]:
+    return {partition: ring.partition_owner(partition) for partition in range(PARTITIONS)}
+
+
+def test_partition_for_is_stable_and_in_range():
+    partition = partition_for("tenant", "revenue")
+    assert partition == partition_for("tenant", "revenue")
+    assert 0 <= partition < PARTITIONS
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing([], vnodes=16).partition_owner(0) is None
+
+
+def test_ownership_does_not_depend_on_member_order():
+    assert ownership(HashRing(MEMBERS, 64)) == ownership(HashRing(MEMBERS[::-1], 64))
+
+
+def test_partitions_spread_over_members():
+    counts = {member: 0 for member in MEMBERS}
+    for owner in ownership(HashRing(MEMBERS, 256)).values():
+        counts[owner] += 1
+    assert min(counts.values()) > PARTITIONS / len(MEMBERS) / 2
+
+
+def test_joining_node_only_takes_partitions():
+    before = ownership(HashRing(MEMBERS, 256))
+    joined = "http://anomalies-new:8002"
+    after = ownership(HashRing(MEMBERS + [joined], 256))
+
+    moved = [partition for partition in before if before[partition] != after[partition]]
+    assert moved
+    assert all(after[partition] == joined for partition in moved)
+
+
+def test_leaving_node_only_gives_up_its_partitions():
+    before = ownership(HashRing(MEMBERS, 256))
+    left = MEMBERS[1]
+    after = ownership(HashRing([member for member in MEMBERS if member != left], 256))
+
+    for partition, owner in before.items():
+        if owner == left:
+            assert after[partition] != left
+        else:
+            assert after[partition] == owner
@@ -1,8 +1,7 @@
 """Health check endpoints"""
 
-from fastapi import APIRouter, HTTPException
-from app.core.clickhouse import clickhouse_client
-from app.core.redis import redis_client
+from fastapi import APIRouter, Response
+from app.core.health import health_monitor
 import structlog
 
 logger = structlog.get_logger()
@@ -20,38 +19,18 @@ async def health_check():
 
 
 @router.get("/ready")
-async def readiness_check():
-    """Readiness check - verifies all dependencies"""
+async def readiness_check(response: Response):
+    """Readiness check - last results of the background ClickHouse and Redis probes"""
 
-    health = {
-        "clickhouse": False,
-        "redis": False,
-    }
-
-    try:
-        # Check ClickHouse
-        if clickhouse_client.client:
-            result = clickhouse_client.client.query("SELECT 1")
-            health["clickhouse"] = len(result.result_rows) > 0
-
-        # Check Redis
-        if redis_client.client:
-            await redis_client.client.ping()
-            health["redis"] = True
-
-        all_healthy = all(health.values())
+    ready = health_monitor.ready()
+    if not ready:
+        response.status_code = 503
 
-        if not all_healthy:
-            raise HTTPException(status_code=503, detail=health)
-
-        return {
-            "status": "ready",
-            "dependencies": health,
-        }
-
-    except Exception as e:
-        logger.error("Readiness check failed", exc_info=e)
-        raise HTTPException(status_code=503, detail={"status": "not ready", "dependencies": health})
+    return {
+        "status": "ready" if ready else "not ready",
+        "dependencies": health_monitor.dependencies(),
+        "checks": health_monitor.report(),
+    }
 
 
 @router.get("/live")
@@ -1,10 +1,16 @@
 """Metrics API endpoints"""
 
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from typing import Optional
-import uuid
+import asyncio
+import base64
+from functools import partial
 import structlog
 
+from ayvlo_common.serialization import JSON_MEDIA_TYPE, dumps
+from ayvlo_common.series import SERIES_MEDIA_TYPE, encode_series
+from ayvlo_common.singleflight import flight_key
+
 from app.models.metric import (
     MetricCreate,
     MetricBatchCreate,
@@ -14,7 +20,10 @@ from app.models.metric import (
     IngestResponse,
 )
 from app.core.clickhouse import clickhouse_client
+from app.core.ingest_buffer import BufferFullError, ingest_buffer
+from app.core.ingest_log import ingest_log
 from app.core.redis import redis_client
+from app.core.singleflight import query_flights
 from app.core.config import settings
 
 logger = structlog.get_logger()
@@ -41,6 +50,16 @@ async def check_rate_limit(tenant_id: str, limit_type: str = "ingestion"):
         )
 
 
+async def write_metrics(tenant_id: str, data: list[dict]):
+    """Write rows to ClickHouse inline, append them to the ingest log, or buffer them"""
+    if settings.INGEST_MODE == "log":
+        await ingest_log.append(tenant_id, data)
+    elif settings.INGEST_MODE == "buffered":
+        await ingest_buffer.add(data)
+    else:
+        clickhouse_client.insert_metrics(data)
+
+
 @router.post("/ingest", response_model=IngestResponse)
 async def ingest_metric(
     metric: MetricCreate,
@@ -51,10 +70,8 @@ async def ingest_metric(
     await check_rate_limit(tenant_id, "ingestion")
 
     try:
-        metric_id = uuid.uuid4()
         data = [{
             "tenant_id": tenant_id,
-            "metric_id": str(metric_id),
             "metric_name": metric.metric_name,
             "timestamp": metric.timestamp.isoformat(),
             "value": metric.value,
@@ -62,9 +79,9 @@ async def ingest_metric(
             "metadata": metric.metadata or {},
         }]
 
-        clickhouse_client.insert_metrics(data)
+        await write_metrics(tenant_id, data)
 
-        logger.info(
+        logger.debug(
             "Metric ingested",
             tenant_id=tenant_id,
             metric_name=metric.metric_name,
@@ -77,6 +94,12 @@ async def ingest_metric(
             message="Metric ingested successfully",
         )
 
+    except BufferFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(settings.BATCH_TIMEOUT_SECONDS)},
+        )
     except Exception as e:
         logger.error("Failed to ingest metric", exc_info=e, tenant_id=tenant_id)
         raise HTTPException(status_code=500, detail=str(e))
@@ -100,10 +123,8 @@ async def ingest_metrics_batch(
     try:
         data = []
         for metric in batch.metrics:
-            metric_id = uuid.uuid4()
             data.append({
                 "tenant_id": tenant_id,
-                "metric_id": str(metric_id),
                 "metric_name": metric.metric_name,
                 "timestamp": metric.timestamp.isoformat(),
                 "value": metric.value,
@@ -111,7 +132,7 @@ async def ingest_metrics_batch(
                 "metadata": metric.metadata or {},
             })
 
-        clickhouse_client.insert_metrics(data)
+        await write_metrics(tenant_id, data)
 
         logger.info(
             "Metrics batch ingested",
@@ -125,62 +146,115 @@ async def ingest_metrics_batch(
             message=f"{len(data)} metrics ingested successfully",
         )
 
+    except BufferFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(settings.BATCH_TIMEOUT_SECONDS)},
+        )
     except Exception as e:
         logger.error("Failed to ingest metrics batch", exc_info=e, tenant_id=tenant_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/query", response_model=list[MetricResponse] | list[MetricAggregateResponse])
+def _encoded_series(params: dict, dimensions: Optional[dict]) -> bytes:
+    """Query a raw series and pack it in the binary series format"""
+    timestamps, values = clickhouse_client.query_series(**params, dimensions=dimensions)
+    return encode_series(timestamps, values)
+
+
+def _raw_rows_json(params: dict, dimensions: Optional[dict]) -> bytes:
+    """Query raw points and encode them as the MetricResponse list"""
+    rows = clickhouse_client.query_metrics(**params, dimensions=dimensions)
+    return dumps([
+        {
+            "timestamp": timestamp,
+            "value": value,
+            "dimensions": row_dimensions or {},
+            "metadata": metadata or {},
+        }
+        for timestamp, value, row_dimensions, metadata in rows
+    ])
+
+
+def _aggregated_rows_json(params: dict) -> bytes:
+    """Query hourly aggregates and encode them as the MetricAggregateResponse list"""
+    rows = clickhouse_client.query_aggregated(**params)
+    return dumps([
+        {
+            "timestamp": row[0],
+            "count": row[1],
+            "avg": row[2],
+            "min": row[3],
+            "max": row[4],
+            "p50": row[5],
+            "p95": row[6],
+            "p99": row[7],
+        }
+        for row in rows
+    ])
+
+
+@router.post(
+    "/query",
+    response_model=list[MetricResponse] | list[MetricAggregateResponse],
+    responses={200: {"content": {SERIES_MEDIA_TYPE: {}}}},
+)
 async def query_metrics(
     query: MetricQuery,
     tenant_id: str = Depends(get_tenant_id),
+    accept: Optional[str] = Header(None),
 ):
-    """Query metrics with filters"""
+    """
+    Query metrics with filters.
+
+    Raw queries sent with `Accept: application/vnd.ayvlo.series` return packed
+    int64 epoch-ms / float64 value columns instead of JSON (timestamp and value
+    only), for service-to-service reads of large series.
+
+    JSON bodies are encoded straight from the ClickHouse rows, off the event
+    loop, without building a response model per row.
+    """
 
     await check_rate_limit(tenant_id, "query")
 
+    series = not query.aggregate and bool(accept) and SERIES_MEDIA_TYPE in accept
+    params = dict(
+        tenant_id=tenant_id,
+        metric_name=query.metric_name,
+        start_time=query.start_time.isoformat(),
+        end_time=query.end_time.isoformat(),
+    )
+
+    # Identical concurrent queries (dashboards, alert checks) share one
+    # ClickHouse round trip
+    key = flight_key(
+        "metrics.query",
+        **params,
+        dimensions=query.dimensions,
+        aggregate=query.aggregate,
+        series=series,
+    )
+
     try:
-        if query.aggregate:
-            # Query aggregated hourly data
-            rows = clickhouse_client.query_aggregated(
-                tenant_id=tenant_id,
-                metric_name=query.metric_name,
-                start_time=query.start_time.isoformat(),
-                end_time=query.end_time.isoformat(),
+        if series:
+            payload = await query_flights.do(
+                key,
+                lambda: asyncio.to_thread(_encoded_series, params, query.dimensions),
+                dumps=lambda data: base64.b64encode(data).decode(),
+                loads=base64.b64decode,
             )
+            return Response(content=payload, media_type=SERIES_MEDIA_TYPE)
 
-            return [
-                MetricAggregateResponse(
-                    timestamp=row[0],
-                    count=row[1],
-                    avg=row[2],
-                    min=row[3],
-                    max=row[4],
-                    p50=row[5],
-                    p95=row[6],
-                    p99=row[7],
-                )
-                for row in rows
-            ]
+        if query.aggregate:
+            # Query aggregated hourly data
+            encode = partial(asyncio.to_thread, _aggregated_rows_json, params)
         else:
             # Query raw metrics
-            rows = clickhouse_client.query_metrics(
-                tenant_id=tenant_id,
-                metric_name=query.metric_name,
-                start_time=query.start_time.isoformat(),
-                end_time=query.end_time.isoformat(),
-                dimensions=query.dimensions,
-            )
+            encode = partial(asyncio.to_thread, _raw_rows_json, params, query.dimensions)
 
-            return [
-                MetricResponse(
-                    timestamp=row[0],
-                    value=row[1],
-                    dimensions=row[2] if row[2] else {},
-                    metadata=row[3] if row[3] else {},
-                )
-                for row in rows
-            ]
+        payload = await query_flights.do(key, encode, dumps=bytes.decode, loads=str.encode)
+        return Response(content=payload, media_type=JSON_MEDIA_TYPE)
 
     except Exception as e:
         logger.error("Failed to query metrics", exc_info=e, tenant_id=tenant_id)
@@ -191,18 +265,34 @@ async def query_metrics(
 async def list_metrics(tenant_id: str):
     """List all metric names for a tenant"""
 
-    try:
-        query = f"""
-        SELECT DISTINCT metric_name
-        FROM metrics
-        WHERE tenant_id = '{tenant_id}'
-        ORDER BY metric_name
-        """
-
-        result = clickhouse_client.client.query(query)
-        metric_names = [row[0] for row in result.result_rows]
+    cache_key = f"metric_catalog:{tenant_id}"
 
-        return {"tenant_id": tenant_id, "metrics": metric_names, "count": len(metric_names)}
+    try:
+        cached = await redis_client.get(cache_key)
+        if cached:
+            return Response(content=cached, media_type=JSON_MEDIA_TYPE)
+
+        rows = await asyncio.to_thread(clickhouse_client.list_metric_catalog, tenant_id)
+        catalog = [
+            {
+                "metric_name": row[0],
+                "first_seen": row[1].isoformat(),
+                "last_seen": row[2].isoformat(),
+                "point_count": row[3],
+                "dimension_keys": row[4],
+            }
+            for row in rows
+        ]
+        response = {
+            "tenant_id": tenant_id,
+            "metrics": [entry["metric_name"] for entry in catalog],
+            "count": len(catalog),
+            "catalog": catalog,
+        }
+
+        payload = dumps(response)
+        await redis_client.set(cache_key, payload, ex=settings.METRIC_CATALOG_CACHE_TTL)
+        return Response(content=payload, media_type=JSON_MEDIA_TYPE)
 
     except Exception as e:
         logger.error("Failed to list metrics", exc_info=e, tenant_id=tenant_id)
@@ -0,0 +1,119 @@
+"""
+Ayvlo Metrics Sink - ingest log consumer
+Reads large batches from the ingest log and writes them to ClickHouse.
+Offsets are committed only after ClickHouse has accepted the insert
+(at-least-once delivery).
+
+Run with: python -m app.consumer
+"""
+
+import asyncio
+import signal
+import time
+
+import structlog
+
+from app.core.clickhouse import ClickHouseClient, clickhouse_client
+from app.core.config import settings
+from app.core.ingest_log import decode_rows, ingest_log
+from app.core.migrations import check_schema
+
+logger = structlog.get_logger()
+
+
+class ClickHouseSink:
+    """Moves batches from an ingest log consumer into ClickHouse"""
+
+    def __init__(
+        self,
+        source,
+        clickhouse: ClickHouseClient,
+        batch_rows: int = settings.SINK_BATCH_ROWS,
+        max_wait_ms: int = settings.SINK_MAX_WAIT_MS,
+    ):
+        self.source = source
+        self.clickhouse = clickhouse
+        self.batch_rows = batch_rows
+        self.max_wait_ms = max_wait_ms
+        self._stopping = asyncio.Event()
+
+    async def collect(self) -> list[dict]:
+        """Accumulate rows until the batch is full or max_wait_ms has elapsed"""
+        rows: list[dict] = []
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        while len(rows) < self.batch_rows and not self._stopping.is_set():
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+
+            payloads = await self.source.getmany(max_records=1000, timeout_ms=remaining_ms)
+            for payload in payloads:
+                rows.extend(decode_rows(payload))
+
+        return rows
+
+    async def run_once(self) -> int:
+        """Insert one batch and commit its offsets; returns the number of rows written"""
+        rows = await self.collect()
+        if not rows:
+            return 0
+
+        try:
+            await asyncio.to_thread(self.clickhouse.insert_metrics, rows)
+        except Exception:
+            # Nothing was committed, so the same records are redelivered on the next poll
+            await self.source.rewind()
+            raise
+
+        await self.source.commit()
+        return len(rows)
+
+    async def run(self):
+        """Consume until stopped, backing off while ClickHouse is unavailable"""
+        backoff = 1.0
+        await self.source.start()
+        logger.info(
+            "ClickHouse sink started",
+            topic=settings.INGEST_LOG_TOPIC,
+            group=settings.SINK_CONSUMER_GROUP,
+            batch_rows=self.batch_rows,
+        )
+
+        try:
+            while not self._stopping.is_set():
+                try:
+                    written = await self.run_once()
+                    backoff = 1.0
+                    if written:
+                        logger.info("Sink batch committed", rows=written)
+                except Exception as e:
+                    logger.error("Sink batch failed, retrying", exc_info=e, backoff=backoff)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30.0)
+        finally:
+            await self.source.stop()
+            logger.info("ClickHouse sink stopped")
+
+    def stop(self):
+        self._stopping.set()
+
+
+async def main():
+    await clickhouse_client.connect()
+    if clickhouse_client.client is not None:
+        check_schema(clickhouse_client.client, clickhouse_client.hot_dimensions)
+    sink = ClickHouseSink(ingest_log.consumer(), clickhouse_client)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, sink.stop)
+
+    try:
+        await sink.run()
+    finally:
+        await clickhouse_client.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,33 +1,186 @@
 """ClickHouse client and connection management"""
 
+import bisect
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from operator import itemgetter
+from uuid import UUID
+
 import clickhouse_connect
-from clickhouse_connect.driver.client import Client
+import numpy as np
 import structlog
+from ayvlo_common.clickhouse import MetricsReader, TracedClient, hot_dimension_column
 from app.core.config import settings
 
 logger = structlog.get_logger()
 
 
+# Metrics table (OLAP-optimized). Column codecs: DoubleDelta for the
+# near-regular timestamps, Gorilla for slowly changing float values, ZSTD on top.
+METRICS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    tenant_id UUID,
+    metric_name LowCardinality(String),
+    timestamp DateTime64(3) CODEC(DoubleDelta, ZSTD(1)),
+    value Float64 CODEC(Gorilla, ZSTD(1)),
+    dimensions Map(String, String) CODEC(ZSTD(1)),
+    metadata Map(String, String) CODEC(ZSTD(1)),
+    created_at DateTime64(3) DEFAULT now64() CODEC(DoubleDelta, ZSTD(1)),
+    INDEX idx_dim_keys mapKeys(dimensions) TYPE bloom_filter(0.01) GRANULARITY 1,
+    INDEX idx_dim_values mapValues(dimensions) TYPE bloom_filter(0.01) GRANULARITY 1
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(timestamp)
+ORDER BY (tenant_id, metric_name, timestamp)
+TTL timestamp + INTERVAL 90 DAY
+SETTINGS index_granularity = 8192
+"""
+
+# Aggregated metrics (materialized view for performance)
+METRICS_HOURLY_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS metrics_hourly (
+    tenant_id UUID,
+    metric_name LowCardinality(String),
+    timestamp DateTime CODEC(DoubleDelta, ZSTD(1)),
+    count UInt64 CODEC(T64, ZSTD(1)),
+    sum Float64 CODEC(ZSTD(1)),
+    avg Float64 CODEC(ZSTD(1)),
+    min Float64 CODEC(ZSTD(1)),
+    max Float64 CODEC(ZSTD(1)),
+    p50 Float64 CODEC(ZSTD(1)),
+    p95 Float64 CODEC(ZSTD(1)),
+    p99 Float64 CODEC(ZSTD(1))
+) ENGINE = SummingMergeTree()
+PARTITION BY toYYYYMM(timestamp)
+ORDER BY (tenant_id, metric_name, timestamp)
+TTL timestamp + INTERVAL 90 DAY
+"""
+
+METRICS_HOURLY_SELECT = """
+SELECT
+    tenant_id,
+    metric_name,
+    toStartOfHour(timestamp) as timestamp,
+    count() as count,
+    sum(value) as sum,
+    avg(value) as avg,
+    min(value) as min,
+    max(value) as max,
+    quantile(0.50)(value) as p50,
+    quantile(0.95)(value) as p95,
+    quantile(0.99)(value) as p99
+FROM metrics
+"""
+
+# Materialized views only take rows created from {cutoff} (epoch
+# milliseconds) on; whoever creates one backfills the rows before it, and no
+# row is counted twice
+VIEW_CUTOFF_WHERE = "created_at >= fromUnixTimestamp64Milli(toInt64({cutoff}))"
+
+METRICS_HOURLY_MV_DDL = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS metrics_hourly_mv
+TO metrics_hourly
+AS {METRICS_HOURLY_SELECT}
+WHERE {VIEW_CUTOFF_WHERE}
+GROUP BY tenant_id, metric_name, timestamp
+"""
+
+# Metric catalog: one row per (tenant, metric), maintained at ingest time so
+# listing metrics never scans the raw table
+METRIC_CATALOG_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS metric_catalog (
+    tenant_id UUID,
+    metric_name LowCardinality(String),
+    first_seen SimpleAggregateFunction(min, DateTime64(3)),
+    last_seen SimpleAggregateFunction(max, DateTime64(3)),
+    point_count SimpleAggregateFunction(sum, UInt64),
+    dimension_keys SimpleAggregateFunction(groupUniqArrayArray, Array(String))
+) ENGINE = AggregatingMergeTree()
+ORDER BY (tenant_id, metric_name)
+"""
+
+METRIC_CATALOG_SELECT = """
+SELECT
+    tenant_id,
+    metric_name,
+    min(timestamp) as first_seen,
+    max(timestamp) as last_seen,
+    count() as point_count,
+    groupUniqArrayArray(mapKeys(dimensions)) as dimension_keys
+FROM metrics
+"""
+
+METRIC_CATALOG_MV_DDL = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS metric_catalog_mv
+TO metric_catalog
+AS {METRIC_CATALOG_SELECT}
+WHERE {VIEW_CUTOFF_WHERE}
+GROUP BY tenant_id, metric_name
+"""
+
+METRICS_INSERT_COLUMNS = (
+    "tenant_id",
+    "metric_name",
+    "timestamp",
+    "value",
+    "dimensions",
+    "metadata",
+)
+
+
+def _as_datetime(value: datetime | str) -> datetime:
+    """Rows from the ingest log / WAL carry ISO strings; the driver needs datetimes"""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def dimension_index_ddl(table: str, hot_dimensions: set[str]) -> list[str]:
+    """
+    ALTERs adding dimension skip indexes and hot dimension columns to `table`.
+
+    Idempotent, so they also upgrade tables created before these existed.
+    Existing parts are only covered by an index after a one-off MATERIALIZE INDEX.
+    """
+    statements = [
+        f"ALTER TABLE {table} ADD INDEX IF NOT EXISTS idx_dim_keys "
+        "mapKeys(dimensions) TYPE bloom_filter(0.01) GRANULARITY 1",
+        f"ALTER TABLE {table} ADD INDEX IF NOT EXISTS idx_dim_values "
+        "mapValues(dimensions) TYPE bloom_filter(0.01) GRANULARITY 1",
+    ]
+
+    # Hot dimensions: materialized LowCardinality columns, filled on insert
+    for key in sorted(hot_dimensions):
+        column = hot_dimension_column(key)
+        statements += [
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} "
+            f"LowCardinality(String) MATERIALIZED dimensions['{key}']",
+            f"ALTER TABLE {table} ADD INDEX IF NOT EXISTS idx_{column} "
+            f"{column} TYPE bloom_filter(0.01) GRANULARITY 1",
+        ]
+    return statements
+
+
 class ClickHouseClient:
     """Async-friendly ClickHouse client wrapper"""
 
     def __init__(self):
-        self.client: Client | None = None
+        self.client: TracedClient | None = None
+        self.hot_dimensions: set[str] = set(settings.HOT_DIMENSIONS)
+        # Read queries are shared with services that read ClickHouse directly
+        self.reader = MetricsReader(hot_dimensions=self.hot_dimensions)
 
     async def connect(self):
         """Establish ClickHouse connection"""
         try:
-            self.client = clickhouse_connect.get_client(
-                host=settings.CLICKHOUSE_HOST,
-                port=settings.CLICKHOUSE_PORT,
-                username=settings.CLICKHOUSE_USER,
-                password=settings.CLICKHOUSE_PASSWORD,
-                database=settings.CLICKHOUSE_DATABASE,
+            self.client = TracedClient(
+                clickhouse_connect.get_client(
+                    host=settings.CLICKHOUSE_HOST,
+                    port=settings.CLICKHOUSE_PORT,
+                    username=settings.CLICKHOUSE_USER,
+                    password=settings.CLICKHOUSE_PASSWORD,
+                    database=settings.CLICKHOUSE_DATABASE,
+                )
             )
-
-            # Initialize schema
-            await self.init_schema()
-
+            self.reader.client = self.client
             logger.info("ClickHouse client connected")
         except Exception as e:
             logger.error("Failed to connect to ClickHouse", exc_info=e)
@@ -39,95 +192,34 @@ class ClickHouseClient:
             self.client.close()
             logger.info("ClickHouse client disconnected")
 
-    async def init_schema(self):
-        """Initialize ClickHouse tables"""
-
-        # Metrics table (OLAP-optimized)
-        create_metrics_table = """
-        CREATE TABLE IF NOT EXISTS metrics (
-            tenant_id UUID,
-            metric_id UUID,
-            metric_name String,
-            timestamp DateTime64(3),
-            value Float64,
-            dimensions Map(String, String),
-            metadata Map(String, String),
-            created_at DateTime64(3) DEFAULT now64()
-        ) ENGINE = MergeTree()
-        PARTITION BY toYYYYMM(timestamp)
-        ORDER BY (tenant_id, metric_name, timestamp)
-        TTL timestamp + INTERVAL 90 DAY
-        SETTINGS index_granularity = 8192
-        """
-
-        # Aggregated metrics (materialized view for performance)
-        create_agg_metrics_table = """
-        CREATE TABLE IF NOT EXISTS metrics_hourly (
-            tenant_id UUID,
-            metric_name String,
-            timestamp DateTime,
-            count UInt64,
-            sum Float64,
-            avg Float64,
-            min Float64,
-            max Float64,
-            p50 Float64,
-            p95 Float64,
-            p99 Float64
-        ) ENGINE = SummingMergeTree()
-        PARTITION BY toYYYYMM(timestamp)
-        ORDER BY (tenant_id, metric_name, timestamp)
-        TTL timestamp + INTERVAL 90 DAY
-        """
-
-        create_mv = """
-        CREATE MATERIALIZED VIEW IF NOT EXISTS metrics_hourly_mv
-        TO metrics_hourly
-        AS SELECT
-            tenant_id,
-            metric_name,
-            toStartOfHour(timestamp) as timestamp,
-            count() as count,
-            sum(value) as sum,
-            avg(value) as avg,
-            min(value) as min,
-            max(value) as max,
-            quantile(0.50)(value) as p50,
-            quantile(0.95)(value) as p95,
-            quantile(0.99)(value) as p99
-        FROM metrics
-        GROUP BY tenant_id, metric_name, timestamp
-        """
-
-        try:
-            self.client.command(create_metrics_table)
-            self.client.command(create_agg_metrics_table)
-            self.client.command(create_mv)
-            logger.info("ClickHouse schema initialized")
-        except Exception as e:
-            logger.error("Failed to initialize ClickHouse schema", exc_info=e)
-            raise
+    def ping(self) -> bool:
+        """Whether the server answers"""
+        return self.client is not None and self.client.ping()
 
     def insert_metrics(self, data: list[dict]):
         """Insert metrics in batch"""
         if not data:
             return
 
+        rows = [
+            [
+                row["tenant_id"],
+                row["metric_name"],
+                _as_datetime(row["timestamp"]),
+                row["value"],
+                row["dimensions"],
+                row["metadata"],
+            ]
+            for row in data
+        ]
+
         try:
             self.client.insert(
                 "metrics",
-                data,
-                column_names=[
-                    "tenant_id",
-                    "metric_id",
-                    "metric_name",
-                    "timestamp",
-                    "value",
-                    "dimensions",
-                    "metadata",
-                ],
+                rows,
+                column_names=list(METRICS_INSERT_COLUMNS),
             )
-            logger.info("Inserted metrics batch", count=len(data))
+            logger.debug("Inserted metrics batch", count=len(data))
         except Exception as e:
             logger.error("Failed to insert metrics", exc_info=e, count=len(data))
             raise
@@ -142,29 +234,26 @@ class ClickHouseClient:
     ):
         """Query metrics with optional dimension filters"""
 
-        query = f"""
-        SELECT
-            timestamp,
-            value,
-            dimensions,
-            metadata
-        FROM metrics
-        WHERE tenant_id = '{tenant_id}'
-          AND metric_name = '{metric_name}'
-          AND timestamp BETWEEN '{start_time}' AND '{end_time}'
-        """
-
-        if dimensions:
-            for key, value in dimensions.items():
-                query += f" AND dimensions['{key}'] = '{value}'"
+        try:
+            return self.reader.query_rows(tenant_id, metric_name, start_time, end_time, dimensions)
+        except Exception as e:
+            logger.error("Failed to query metrics", exc_info=e, metric=metric_name)
+            raise
 
-        query += " ORDER BY timestamp ASC"
+    def query_series(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: str,
+        end_time: str,
+        dimensions: dict | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Query a series as columnar arrays: (epoch milliseconds int64, values float64)"""
 
         try:
-            result = self.client.query(query)
-            return result.result_rows
+            return self.reader.query_series(tenant_id, metric_name, start_time, end_time, dimensions)
         except Exception as e:
-            logger.error("Failed to query metrics", exc_info=e, metric=metric_name)
+            logger.error("Failed to query metric series", exc_info=e, metric=metric_name)
             raise
 
     def query_aggregated(
@@ -200,6 +289,169 @@ class ClickHouseClient:
             logger.error("Failed to query aggregated metrics", exc_info=e, metric=metric_name)
             raise
 
+    def list_metric_catalog(self, tenant_id: str):
+        """List a tenant's metrics from the catalog (one row per metric)"""
+
+        query = """
+        SELECT
+            metric_name,
+            min(first_seen),
+            max(last_seen),
+            sum(point_count),
+            arraySort(groupUniqArrayArray(dimension_keys))
+        FROM metric_catalog
+        WHERE tenant_id = {tenant_id:UUID}
+        GROUP BY metric_name
+        HAVING max(last_seen) >= now64(3) - INTERVAL 90 DAY
+        ORDER BY metric_name
+        """
+
+        try:
+            result = self.client.query(query, parameters={"tenant_id": tenant_id})
+            return result.result_rows
+        except Exception as e:
+            logger.error("Failed to list metric catalog", exc_info=e, tenant_id=tenant_id)
+            raise
+
+
+def _as_utc(value: datetime | str) -> datetime:
+    """Naive UTC datetime, as ClickHouse stores DateTime64"""
+    value = _as_datetime(value.replace("Z", "+00:00") if isinstance(value, str) else value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class InMemoryClickHouseClient:
+    """
+    Single-process stand-in for ClickHouse (load tests and local runs).
+
+    Keeps rows per (tenant, metric) series, sorted lazily on read, and answers
+    the same calls as ClickHouseClient. Aggregates are computed on the fly
+    rather than read from metrics_hourly.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.series: dict[tuple[str, str], list[tuple]] = defaultdict(list)
+        self._unsorted: set[tuple[str, str]] = set()
+        # Inserts run on the event loop or in worker threads, queries in threads
+        self._lock = threading.Lock()
+
+    async def connect(self):
+        logger.info("In-memory ClickHouse ready")
+
+    async def disconnect(self):
+        pass
+
+    def ping(self) -> bool:
+        return True
+
+    def insert_metrics(self, data: list[dict]):
+        with self._lock:
+            for row in data:
+                key = (str(UUID(str(row["tenant_id"]))), row["metric_name"])
+                self.series[key].append(
+                    (_as_utc(row["timestamp"]), float(row["value"]), row["dimensions"], row["metadata"])
+                )
+                self._unsorted.add(key)
+
+    def _range(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: datetime | str,
+        end_time: datetime | str,
+        dimensions: dict | None = None,
+    ) -> list[tuple]:
+        """Rows of one series within [start_time, end_time], ordered by timestamp"""
+        key = (str(UUID(str(tenant_id))), metric_name)
+        with self._lock:
+            rows = self.series.get(key, [])
+            if key in self._unsorted:
+                rows.sort(key=itemgetter(0))
+                self._unsorted.discard(key)
+
+            first = bisect.bisect_left(rows, _as_utc(start_time), key=itemgetter(0))
+            last = bisect.bisect_right(rows, _as_utc(end_time), key=itemgetter(0))
+            rows = rows[first:last]
+
+        if dimensions:
+            rows = [
+                row for row in rows
+                if all(row[2].get(name) == value for name, value in dimensions.items())
+            ]
+        return rows
+
+    def query_metrics(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: str,
+        end_time: str,
+        dimensions: dict | None = None,
+    ):
+        return self._range(tenant_id, metric_name, start_time, end_time, dimensions)
+
+    def query_series(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: str,
+        end_time: str,
+        dimensions: dict | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        rows = self._range(tenant_id, metric_name, start_time, end_time, dimensions)
+        timestamps = np.array([row[0] for row in rows], dtype="datetime64[ms]").astype(np.int64)
+        return timestamps, np.array([row[1] for row in rows], dtype=np.float64)
+
+    def query_aggregated(
+        self,
+        tenant_id: str,
+        metric_name: str,
+        start_time: str,
+        end_time: str,
+    ):
+        buckets: dict[datetime, list[float]] = defaultdict(list)
+        for timestamp, value, _, _ in self._range(tenant_id, metric_name, start_time, end_time):
+            buckets[timestamp.replace(minute=0, second=0, microsecond=0)].append(value)
+
+        rows = []
+        for hour, values in buckets.items():
+            values = np.array(values)
+            p50, p95, p99 = np.quantile(values, [0.5, 0.95, 0.99])
+            rows.append(
+                (hour, len(values), values.mean(), values.min(), values.max(), p50, p95, p99)
+            )
+        return rows
+
+    def list_metric_catalog(self, tenant_id: str):
+        tenant_id = str(UUID(str(tenant_id)))
+        with self._lock:
+            series = [
+                (metric_name, list(rows))
+                for (tenant, metric_name), rows in self.series.items()
+                if tenant == tenant_id and rows
+            ]
+
+        return [
+            (
+                metric_name,
+                min(row[0] for row in rows),
+                max(row[0] for row in rows),
+                len(rows),
+                sorted({key for row in rows for key in row[2]}),
+            )
+            for metric_name, rows in sorted(series)
+        ]
+
+
+def create_clickhouse_client() -> ClickHouseClient | InMemoryClickHouseClient:
+    """Build the configured ClickHouse backend"""
+    if settings.CLICKHOUSE_BACKEND == "memory":
+        return InMemoryClickHouseClient()
+    return ClickHouseClient()
+
 
 # Global instance
-clickhouse_client = ClickHouseClient()
+clickhouse_client = create_clickhouse_client()
@@ -1,8 +1,8 @@
 """Configuration management using Pydantic Settings"""
 
 from pydantic_settings import BaseSettings
-from pydantic import Field
-from typing import List
+from pydantic import Field, model_validator
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -13,6 +13,15 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = Field(default="development", env="ENVIRONMENT")
     DEBUG: bool = Field(default=True, env="DEBUG")
 
+    # Logging: hot-path events can be kept 1 in N (by event name) and every
+    # event is capped at LOG_MAX_EVENTS_PER_SECOND (0 = no cap)
+    LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
+    LOG_SAMPLE_RATES: Dict[str, int] = Field(
+        default={"Metrics batch ingested": 100},
+        env="LOG_SAMPLE_RATES",
+    )
+    LOG_MAX_EVENTS_PER_SECOND: float = Field(default=0.0, env="LOG_MAX_EVENTS_PER_SECOND")
+
     # API
     API_V1_PREFIX: str = "/api/v1"
     CORS_ORIGINS: List[str] = Field(
@@ -21,12 +30,16 @@ class Settings(BaseSettings):
     )
 
     # ClickHouse
+    CLICKHOUSE_BACKEND: str = Field(default="clickhouse", env="CLICKHOUSE_BACKEND")  # clickhouse | memory
     CLICKHOUSE_HOST: str = Field(default="localhost", env="CLICKHOUSE_HOST")
     CLICKHOUSE_PORT: int = Field(default=8123, env="CLICKHOUSE_PORT")
     CLICKHOUSE_USER: str = Field(default="default", env="CLICKHOUSE_USER")
     CLICKHOUSE_PASSWORD: str = Field(default="", env="CLICKHOUSE_PASSWORD")
     CLICKHOUSE_DATABASE: str = Field(default="ayvlo", env="CLICKHOUSE_DATABASE")
 
+    # Dimension keys materialized into LowCardinality columns (e.g. ["region", "plan"])
+    HOT_DIMENSIONS: List[str] = Field(default=[], env="HOT_DIMENSIONS")
+
     # PostgreSQL (for metadata)
     POSTGRES_HOST: str = Field(default="localhost", env="POSTGRES_HOST")
     POSTGRES_PORT: int = Field(default=5432, env="POSTGRES_PORT")
@@ -44,6 +57,49 @@ class Settings(BaseSettings):
     REDIS_DB: int = Field(default=0, env="REDIS_DB")
     REDIS_PASSWORD: str = Field(default="", env="REDIS_PASSWORD")
 
+    # Metric catalog
+    METRIC_CATALOG_CACHE_TTL: int = Field(default=60, env="METRIC_CATALOG_CACHE_TTL")  # seconds
+
+    # Request coalescing for identical concurrent queries: "local" shares one
+    # ClickHouse query per process, "redis" also across replicas
+    SINGLEFLIGHT_MODE: str = Field(default="local", env="SINGLEFLIGHT_MODE")
+    SINGLEFLIGHT_LOCK_TTL_SECONDS: float = Field(default=30.0, env="SINGLEFLIGHT_LOCK_TTL_SECONDS")
+    SINGLEFLIGHT_RESULT_TTL_SECONDS: float = Field(default=2.0, env="SINGLEFLIGHT_RESULT_TTL_SECONDS")
+
+    # Dependency health probes; /health/ready serves their last results
+    HEALTH_PROBE_INTERVAL_SECONDS: float = Field(default=5.0, env="HEALTH_PROBE_INTERVAL_SECONDS")
+    HEALTH_PROBE_TIMEOUT_SECONDS: float = Field(default=2.0, env="HEALTH_PROBE_TIMEOUT_SECONDS")
+
+    # Tracing: FastAPI requests, outgoing httpx calls, Redis and ClickHouse
+    # queries, exported over OTLP/HTTP
+    OTEL_ENABLED: bool = Field(default=False, env="OTEL_ENABLED")
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = Field(default="http://localhost:4318", env="OTEL_EXPORTER_OTLP_ENDPOINT")
+    # Head sampling: fraction of root traces kept, with per-route-prefix
+    # overrides (0 = never traced). Tail sampling also keeps traces slower than
+    # the rolling p99 of their route, or that failed, but records every
+    # request's spans and holds them in memory until the trace ends, instead
+    # of only the sampled ones; off by default. Set it alike on the gateway
+    # and every service, since downstream services record whatever the
+    # caller records.
+    OTEL_TRACES_SAMPLE_RATE: float = Field(default=0.05, env="OTEL_TRACES_SAMPLE_RATE")
+    OTEL_ROUTE_SAMPLE_RATES: Dict[str, float] = Field(
+        default={"/health": 0.0, "/metrics": 0.0},
+        env="OTEL_ROUTE_SAMPLE_RATES",
+    )
+    OTEL_TAIL_SAMPLING: bool = Field(default=False, env="OTEL_TAIL_SAMPLING")
+    OTEL_TAIL_SLOW_THRESHOLD_MS: float = Field(default=0.0, env="OTEL_TAIL_SLOW_THRESHOLD_MS")
+    SENTRY_DSN: str = Field(default="", env="SENTRY_DSN")
+    SENTRY_TRACES_SAMPLE_RATE: float = Field(default=0.01, env="SENTRY_TRACES_SAMPLE_RATE")
+
+    # Per-request profiling: requests sent with X-Ayvlo-Profile: 1 and a
+    # matching X-Ayvlo-Profile-Token are profiled, plus 1 in
+    # PROFILING_SAMPLE_EVERY at random. Off unless a token or sampling is set.
+    PROFILING_TOKEN: str = Field(default="", env="PROFILING_TOKEN")
+    PROFILING_SAMPLE_EVERY: int = Field(default=0, env="PROFILING_SAMPLE_EVERY")
+    PROFILING_STORE: str = Field(default="redis", env="PROFILING_STORE")  # redis | disk
+    PROFILING_DIR: str = Field(default="/tmp/ayvlo-profiles", env="PROFILING_DIR")
+    PROFILING_TTL_SECONDS: int = Field(default=900, env="PROFILING_TTL_SECONDS")
+
     # Auth
     JWT_SECRET_KEY: str = Field(default="dev-secret-key-change-in-production", env="JWT_SECRET_KEY")
     JWT_ALGORITHM: str = "HS256"
@@ -57,6 +113,42 @@ class Settings(BaseSettings):
     BATCH_SIZE: int = Field(default=1000, env="BATCH_SIZE")
     BATCH_TIMEOUT_SECONDS: int = Field(default=5, env="BATCH_TIMEOUT_SECONDS")
 
+    # Ingest mode: "direct" inserts into ClickHouse inline, "log" appends to the ingest log,
+    # "buffered" acks after a local WAL fsync and inserts in batches
+    INGEST_MODE: str = Field(default="direct", env="INGEST_MODE")
+
+    # Ingest log (Redpanda / Kafka API)
+    INGEST_LOG_BACKEND: str = Field(default="redpanda", env="INGEST_LOG_BACKEND")  # redpanda | memory
+    INGEST_LOG_TOPIC: str = Field(default="metrics.ingest.v1", env="INGEST_LOG_TOPIC")
+    INGEST_LOG_PARTITIONS: int = Field(default=12, env="INGEST_LOG_PARTITIONS")
+    INGEST_LOG_REPLICATION: int = Field(default=1, env="INGEST_LOG_REPLICATION")
+    INGEST_LOG_LINGER_MS: int = Field(default=5, env="INGEST_LOG_LINGER_MS")
+    REDPANDA_BROKER: str = Field(default="localhost:9092", env="REDPANDA_BROKER")
+    REDPANDA_SECURITY_PROTOCOL: str = Field(default="PLAINTEXT", env="REDPANDA_SECURITY_PROTOCOL")
+    REDPANDA_SASL_MECHANISM: str = Field(default="PLAIN", env="REDPANDA_SASL_MECHANISM")
+    REDPANDA_USERNAME: str = Field(default="", env="REDPANDA_USERNAME")
+    REDPANDA_PASSWORD: str = Field(default="", env="REDPANDA_PASSWORD")
+
+    # Buffered ingestion (local write-ahead log)
+    BUFFER_FLUSH_ROWS: int = Field(default=20000, env="BUFFER_FLUSH_ROWS")
+    # Ingest is refused with 503 above this many unflushed rows
+    BUFFER_MAX_ROWS: int = Field(default=500000, env="BUFFER_MAX_ROWS")
+    WAL_DIR: str = Field(default="/var/lib/ayvlo/metrics-wal", env="WAL_DIR")
+    WAL_SEGMENT_BYTES: int = Field(default=64 * 1024 * 1024, env="WAL_SEGMENT_BYTES")
+    WAL_FSYNC_INTERVAL_MS: int = Field(default=1, env="WAL_FSYNC_INTERVAL_MS")
+
+    # ClickHouse sink consumer
+    SINK_CONSUMER_GROUP: str = Field(default="metrics-clickhouse-sink", env="SINK_CONSUMER_GROUP")
+    SINK_BATCH_ROWS: int = Field(default=50000, env="SINK_BATCH_ROWS")
+    SINK_MAX_WAIT_MS: int = Field(default=1000, env="SINK_MAX_WAIT_MS")
+
+    @model_validator(mode="after")
+    def validate_ingest_log(self) -> "Settings":
+        """The in-memory log is lost on restart and invisible to other processes"""
+        if self.INGEST_MODE == "log" and self.INGEST_LOG_BACKEND == "memory" and self.ENVIRONMENT != "test":
+            raise ValueError("INGEST_LOG_BACKEND=memory with INGEST_MODE=log is only allowed with ENVIRONMENT=test")
+        return self
+
     class Config:
         env_file = ".env"
         case_sensitive = True
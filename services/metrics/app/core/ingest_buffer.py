@@ -0,0 +1,165 @@
+"""In-memory ingest buffer made crash-safe by a local write-ahead log"""
+
+import asyncio
+
+import structlog
+from app.core.clickhouse import ClickHouseClient, clickhouse_client
+from app.core.config import settings
+from app.core.ingest_log import decode_rows, encode_rows
+from app.core.wal import WriteAheadLog
+
+logger = structlog.get_logger()
+
+
+class BufferFullError(Exception):
+    """BUFFER_MAX_ROWS rows are waiting for ClickHouse; the client should retry later"""
+
+
+class IngestBuffer:
+    """
+    Acknowledges rows once they are fsynced to the WAL, then inserts them into
+    ClickHouse in large batches. WAL segments are only truncated after the
+    insert that covers them succeeds, and are replayed on startup otherwise.
+
+    Delivery is at-least-once: rows inserted just before a crash, or in the
+    chunks of a flush that failed part-way, are inserted again on replay.
+    """
+
+    def __init__(self, clickhouse: ClickHouseClient, wal: WriteAheadLog):
+        self.clickhouse = clickhouse
+        self.wal = wal
+        self.rows: list[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_now = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        """Replay leftover segments, then start the periodic flusher"""
+        pending = self.wal.open()
+        if pending:
+            await self._replay(self.wal, pending)
+
+        # Slots of workers that no longer exist, e.g. after scaling down
+        for orphan in self.wal.orphans():
+            try:
+                await self._replay(orphan, orphan.segments())
+            finally:
+                orphan.release()
+
+        await self.wal.start()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Flush buffered rows and close the WAL"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        try:
+            await self.flush()
+        finally:
+            await self.wal.close()
+
+    async def add(self, rows: list[dict]):
+        """Buffer rows and return once they are durable on local disk"""
+        # Backpressure while ClickHouse is unavailable, instead of growing
+        # memory and the WAL without bound
+        if len(self.rows) + len(rows) > settings.BUFFER_MAX_ROWS:
+            raise BufferFullError(f"{len(self.rows)} rows are waiting for ClickHouse")
+
+        # WAL write and buffer append happen together so a concurrent flush can
+        # never truncate a segment whose rows are not in the batch it inserted.
+        self.wal.write(encode_rows(rows))
+        self.rows.extend(rows)
+
+        if len(self.rows) >= settings.BUFFER_FLUSH_ROWS:
+            self._flush_now.set()
+
+        try:
+            await self.wal.sync()
+        except Exception:
+            # The request fails, so take the rows back or the client's retry
+            # would store them twice; a flush may already have stored them
+            async with self._flush_lock:
+                if self._discard(rows):
+                    raise
+            logger.warning("WAL fsync failed after the rows were stored", rows=len(rows))
+
+    async def flush(self):
+        """Insert everything buffered so far and truncate the covered segments"""
+        async with self._flush_lock:
+            if not self.rows:
+                return
+
+            rows, self.rows = self.rows, []
+            sealed = self.wal.rotate()
+
+            inserted = 0
+            try:
+                for start in range(0, len(rows), settings.BUFFER_FLUSH_ROWS):
+                    chunk = rows[start:start + settings.BUFFER_FLUSH_ROWS]
+                    await asyncio.to_thread(self.clickhouse.insert_metrics, chunk)
+                    inserted += len(chunk)
+            except Exception:
+                # Keep the rows not yet inserted (and every segment) for the next attempt
+                self.rows = rows[inserted:] + self.rows
+                raise
+
+            self.wal.truncate_through(sealed)
+
+    def _discard(self, rows: list[dict]) -> bool:
+        """Remove `rows` from the buffer; False if a flush already took them"""
+        ids = {id(row) for row in rows}
+        kept = [row for row in self.rows if id(row) not in ids]
+        discarded = len(kept) < len(self.rows)
+        self.rows = kept
+        return discarded
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_now.wait(),
+                    timeout=settings.BATCH_TIMEOUT_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Buffered flush failed", exc_info=e, buffered=len(self.rows))
+
+    async def _replay(self, wal: WriteAheadLog, segments: list[int]):
+        """Insert rows left in a WAL slot by a previous process"""
+        batch: list[dict] = []
+        replayed = 0
+
+        for payload in wal.replay(segments):
+            batch.extend(decode_rows(payload))
+            if len(batch) >= settings.BUFFER_FLUSH_ROWS:
+                await asyncio.to_thread(self.clickhouse.insert_metrics, batch)
+                replayed += len(batch)
+                batch = []
+
+        if batch:
+            await asyncio.to_thread(self.clickhouse.insert_metrics, batch)
+            replayed += len(batch)
+
+        wal.truncate_through(segments[-1])
+        logger.info("WAL replayed", directory=str(wal.directory), segments=len(segments), rows=replayed)
+
+
+# Global instance
+ingest_buffer = IngestBuffer(
+    clickhouse_client,
+    WriteAheadLog(
+        directory=settings.WAL_DIR,
+        segment_bytes=settings.WAL_SEGMENT_BYTES,
+        fsync_interval_ms=settings.WAL_FSYNC_INTERVAL_MS,
+    ),
+)
@@ -0,0 +1,221 @@
+"""Durable ingest log (Redpanda) decoupling ingestion from ClickHouse writes"""
+
+import asyncio
+import json
+import zlib
+
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+from aiokafka.admin import AIOKafkaAdminClient, NewTopic
+from aiokafka.errors import TopicAlreadyExistsError
+import structlog
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+def encode_rows(rows: list[dict]) -> bytes:
+    """Serialize a batch of metric rows into a log record"""
+    return json.dumps(rows, separators=(",", ":")).encode()
+
+
+def decode_rows(payload: bytes) -> list[dict]:
+    """Deserialize a log record back into metric rows"""
+    return json.loads(payload)
+
+
+def _security_options() -> dict:
+    """Kafka client security options shared by producer and consumer"""
+    options = {"security_protocol": settings.REDPANDA_SECURITY_PROTOCOL}
+    if settings.REDPANDA_SECURITY_PROTOCOL.startswith("SASL"):
+        options.update(
+            sasl_mechanism=settings.REDPANDA_SASL_MECHANISM,
+            sasl_plain_username=settings.REDPANDA_USERNAME,
+            sasl_plain_password=settings.REDPANDA_PASSWORD,
+        )
+    return options
+
+
+class KafkaIngestLog:
+    """Appends ingest batches to a tenant-keyed Redpanda topic"""
+
+    def __init__(self):
+        self.producer: AIOKafkaProducer | None = None
+
+    async def connect(self):
+        """Start the producer"""
+        try:
+            await self.ensure_topic()
+            self.producer = AIOKafkaProducer(
+                bootstrap_servers=settings.REDPANDA_BROKER,
+                acks="all",
+                enable_idempotence=True,
+                linger_ms=settings.INGEST_LOG_LINGER_MS,
+                **_security_options(),
+            )
+            await self.producer.start()
+            logger.info("Ingest log producer started", topic=settings.INGEST_LOG_TOPIC)
+        except Exception as e:
+            logger.error("Failed to start ingest log producer", exc_info=e)
+            raise
+
+    async def ensure_topic(self):
+        """Create the ingest topic with the configured partition count if missing"""
+        admin = AIOKafkaAdminClient(
+            bootstrap_servers=settings.REDPANDA_BROKER,
+            **_security_options(),
+        )
+        await admin.start()
+        try:
+            await admin.create_topics([
+                NewTopic(
+                    name=settings.INGEST_LOG_TOPIC,
+                    num_partitions=settings.INGEST_LOG_PARTITIONS,
+                    replication_factor=settings.INGEST_LOG_REPLICATION,
+                )
+            ])
+        except TopicAlreadyExistsError:
+            pass
+        finally:
+            await admin.close()
+
+    async def disconnect(self):
+        """Flush pending records and stop the producer"""
+        if self.producer:
+            await self.producer.stop()
+            logger.info("Ingest log producer stopped")
+
+    async def append(self, tenant_id: str, rows: list[dict]):
+        """Append rows for a tenant; returns once the broker has acknowledged them"""
+        await self.producer.send_and_wait(
+            settings.INGEST_LOG_TOPIC,
+            encode_rows(rows),
+            key=tenant_id.encode(),
+        )
+
+    def consumer(self) -> "KafkaLogConsumer":
+        """Create a consumer for the sink process"""
+        return KafkaLogConsumer()
+
+
+class KafkaLogConsumer:
+    """Consumer-group reader with manual, commit-after-insert offsets"""
+
+    def __init__(self):
+        self.consumer: AIOKafkaConsumer | None = None
+
+    async def start(self):
+        self.consumer = AIOKafkaConsumer(
+            settings.INGEST_LOG_TOPIC,
+            bootstrap_servers=settings.REDPANDA_BROKER,
+            group_id=settings.SINK_CONSUMER_GROUP,
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+            max_partition_fetch_bytes=8 * 1024 * 1024,
+            **_security_options(),
+        )
+        await self.consumer.start()
+
+    async def stop(self):
+        if self.consumer:
+            await self.consumer.stop()
+
+    async def getmany(self, max_records: int, timeout_ms: int) -> list[bytes]:
+        """Fetch up to max_records payloads across all assigned partitions"""
+        batches = await self.consumer.getmany(timeout_ms=timeout_ms, max_records=max_records)
+        return [record.value for records in batches.values() for record in records]
+
+    async def commit(self):
+        """Commit the positions of everything returned so far"""
+        await self.consumer.commit()
+
+    async def rewind(self):
+        """Return to the last committed offsets so uncommitted records are redelivered"""
+        await self.consumer.seek_to_committed()
+
+
+class InMemoryIngestLog:
+    """
+    Single-process stand-in for the Redpanda topic (tests).
+
+    Only a sink in the same process can read it, so the API runs one itself.
+    Records are dropped once committed; offsets stay absolute.
+    """
+
+    def __init__(self, partitions: int | None = None):
+        self.partitions: list[list[bytes]] = [
+            [] for _ in range(partitions or settings.INGEST_LOG_PARTITIONS)
+        ]
+        self.committed: list[int] = [0] * len(self.partitions)
+        # Offset of each partition's first retained record
+        self.base: list[int] = [0] * len(self.partitions)
+
+    async def connect(self):
+        logger.info("In-memory ingest log ready", partitions=len(self.partitions))
+
+    async def disconnect(self):
+        pass
+
+    def partition_for(self, tenant_id: str) -> int:
+        """Stable tenant -> partition assignment"""
+        return zlib.crc32(tenant_id.encode()) % len(self.partitions)
+
+    async def append(self, tenant_id: str, rows: list[dict]):
+        self.partitions[self.partition_for(tenant_id)].append(encode_rows(rows))
+
+    def consumer(self) -> "InMemoryLogConsumer":
+        return InMemoryLogConsumer(self)
+
+    def commit(self, positions: list[int]):
+        """Record committed offsets and drop the records before them"""
+        self.committed = list(positions)
+        for partition, records in enumerate(self.partitions):
+            done = self.committed[partition] - self.base[partition]
+            if done > 0:
+                del records[:done]
+                self.base[partition] += done
+
+
+class InMemoryLogConsumer:
+    """Consumer over InMemoryIngestLog with the same offset semantics as Kafka"""
+
+    def __init__(self, log: InMemoryIngestLog):
+        self.log = log
+        self.positions: list[int] = list(log.committed)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def getmany(self, max_records: int, timeout_ms: int) -> list[bytes]:
+        payloads: list[bytes] = []
+        for partition, records in enumerate(self.log.partitions):
+            start = self.positions[partition] - self.log.base[partition]
+            take = records[start:start + max_records - len(payloads)]
+            payloads.extend(take)
+            self.positions[partition] += len(take)
+            if len(payloads) >= max_records:
+                break
+
+        if not payloads:
+            # Mirror Kafka's long-poll instead of spinning
+            await asyncio.sleep(min(timeout_ms, 50) / 1000)
+        return payloads
+
+    async def commit(self):
+        self.log.commit(self.positions)
+
+    async def rewind(self):
+        self.positions = list(self.log.committed)
+
+
+def create_ingest_log() -> KafkaIngestLog | InMemoryIngestLog:
+    """Build the configured ingest log backend"""
+    if settings.INGEST_LOG_BACKEND == "memory":
+        return InMemoryIngestLog()
+    return KafkaIngestLog()
+
+
+# Global instance
+ingest_log = create_ingest_log()
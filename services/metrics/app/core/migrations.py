@@ -0,0 +1,435 @@
+"""Versioned ClickHouse schema migrations"""
+
+import hashlib
+import re
+import time
+from datetime import datetime, timezone
+
+import structlog
+from ayvlo_common.clickhouse import hot_dimension_column
+
+from app.core.clickhouse import (
+    METRIC_CATALOG_MV_DDL,
+    METRIC_CATALOG_SELECT,
+    METRIC_CATALOG_TABLE_DDL,
+    METRICS_HOURLY_MV_DDL,
+    METRICS_HOURLY_SELECT,
+    METRICS_HOURLY_TABLE_DDL,
+    METRICS_TABLE_DDL,
+    dimension_index_ddl,
+)
+
+logger = structlog.get_logger()
+
+
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version UInt32,
+    name String,
+    checksum String,
+    applied_at DateTime64(3) DEFAULT now64(3),
+    backfill_before Nullable(DateTime64(3))
+) ENGINE = ReplacingMergeTree(applied_at)
+ORDER BY version
+"""
+
+# One row per (migration, source partition) backfilled, so an interrupted
+# backfill resumes where it stopped
+SCHEMA_BACKFILLS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_backfills (
+    version UInt32,
+    partition_id String,
+    rows UInt64,
+    seconds Float64,
+    finished_at DateTime64(3) DEFAULT now64(3)
+) ENGINE = ReplacingMergeTree(finished_at)
+ORDER BY (version, partition_id)
+"""
+
+# Restricts a backfill to one source partition and to rows the new view
+# did not already see
+BACKFILL_WHERE = (
+    "_partition_id = {partition_id:String} AND created_at < {before:DateTime64(3)}"
+)
+
+# Reads the cutoff back from a view created by upgrade (see VIEW_CUTOFF_WHERE)
+VIEW_CUTOFF_PATTERN = re.compile(r"fromUnixTimestamp64Milli\(toInt64\((\d+)\)\)")
+
+# How far ahead of the server clock a migration's cutoff is set. Views must
+# exist before it, or rows inserted in between would be missed by both the
+# view and the backfill; creating them takes milliseconds.
+CUTOFF_DELAY_MS = 30_000
+
+
+class Migration:
+    """
+    One schema version: DDL applied in order, plus an optional backfill.
+
+    Materialized views in `views` take rows created from a `{cutoff}` on. A
+    backfill is an `INSERT INTO {table} SELECT ...` over `source` with a
+    `{where}` placeholder; it fills `target`, the table fed by those views,
+    with the rows created before the cutoff.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        statements: list[str],
+        views: list[str] | None = None,
+        backfill: str | None = None,
+        target: str | None = None,
+        source: str = "metrics",
+    ):
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.views = views or []
+        self.backfill = backfill
+        self.target = target
+        self.source = source
+
+    @property
+    def checksum(self) -> str:
+        text = "\n;\n".join([*self.statements, self.backfill or ""])
+        return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+# Append only: never edit a migration once it has been applied anywhere
+MIGRATIONS = [
+    Migration(
+        1,
+        "metrics",
+        [
+            METRICS_TABLE_DDL.format(table="metrics"),
+            METRICS_HOURLY_TABLE_DDL,
+            METRICS_HOURLY_MV_DDL,
+        ],
+        views=["metrics_hourly_mv"],
+        backfill=f"""
+        INSERT INTO {{table}}
+        {METRICS_HOURLY_SELECT}
+        WHERE {{where}}
+        GROUP BY tenant_id, metric_name, timestamp
+        """,
+        target="metrics_hourly",
+    ),
+    Migration(
+        2,
+        "metric_catalog",
+        [METRIC_CATALOG_TABLE_DDL, METRIC_CATALOG_MV_DDL],
+        views=["metric_catalog_mv"],
+        backfill=f"""
+        INSERT INTO {{table}}
+        {METRIC_CATALOG_SELECT}
+        WHERE {{where}}
+        GROUP BY tenant_id, metric_name
+        """,
+        target="metric_catalog",
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+class MigrationRunner:
+    """
+    Applies pending migrations and their backfills.
+
+    Run from one place per deployment (a release job or
+    `make clickhouse-migrate`), never from service workers. Applied versions
+    are recorded in `schema_migrations`. DDL is applied first and quickly;
+    backfills copy one source partition at a time, can run afterwards in the
+    background and resume after an interruption.
+    """
+
+    def __init__(self, client, migrations: list[Migration] = MIGRATIONS, hot_dimensions: set[str] | None = None):
+        self.client = client
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.hot_dimensions = hot_dimensions or set()
+
+    def ensure_tables(self):
+        self.client.command(SCHEMA_MIGRATIONS_DDL)
+        self.client.command(SCHEMA_BACKFILLS_DDL)
+
+    def applied(self) -> dict[int, dict]:
+        """Applied migrations by version"""
+        rows = self.client.query(
+            "SELECT version, name, checksum, applied_at, backfill_before FROM schema_migrations FINAL"
+        ).result_rows
+        return {
+            row[0]: {"name": row[1], "checksum": row[2], "applied_at": row[3], "backfill_before": row[4]}
+            for row in rows
+        }
+
+    def pending(self, target: int | None = None) -> list[Migration]:
+        applied = self.applied()
+        return [
+            migration
+            for migration in self.migrations
+            if migration.version not in applied and (target is None or migration.version <= target)
+        ]
+
+    def upgrade(self, target: int | None = None) -> list[Migration]:
+        """
+        Apply pending migrations up to `target` (default: latest), then sync hot dimensions.
+
+        Views the service created before this runner existed have seen every
+        row, so their migration is stamped instead (backfilling would count
+        rows twice). Views left by an interrupted upgrade keep their cutoff.
+        """
+        self.ensure_tables()
+        self._warn_modified()
+
+        pending = self.pending(target)
+        for migration in pending:
+            existing = self._view_cutoffs(migration.views)
+            if existing and all(cutoff is None for cutoff in existing.values()):
+                self._record(migration, None)
+                logger.warning(
+                    "ClickHouse schema predates migrations; stamped without backfill",
+                    version=migration.version,
+                    name=migration.name,
+                    views=sorted(existing),
+                )
+                continue
+
+            started = time.perf_counter()
+            # Views take rows created from the cutoff on, older rows are left
+            # to the backfill; the cutoff is ahead so the views exist by then
+            known = [cutoff for cutoff in existing.values() if cutoff is not None]
+            cutoff = min(known) if known else self._now_ms() + CUTOFF_DELAY_MS
+            for statement in migration.statements:
+                self.client.command(statement.format(cutoff=cutoff))
+            if set(migration.views) - set(existing) and self._now_ms() >= cutoff:
+                logger.error(
+                    "ClickHouse views created after their cutoff; rows inserted in between are missing from them",
+                    version=migration.version,
+                    views=migration.views,
+                )
+
+            self._record(migration, _from_epoch_ms(cutoff) if migration.backfill else None)
+            logger.info(
+                "ClickHouse migration applied",
+                version=migration.version,
+                name=migration.name,
+                resumed=bool(known),
+                seconds=round(time.perf_counter() - started, 2),
+            )
+
+        self.sync_hot_dimensions()
+        return pending
+
+    def stamp(self, version: int):
+        """Record migrations up to `version` as applied without running them (schemas created before the runner)"""
+        self.ensure_tables()
+        applied = self.applied()
+        for migration in self.migrations:
+            if migration.version <= version and migration.version not in applied:
+                self._record(migration, None)
+                logger.info("ClickHouse migration stamped", version=migration.version, name=migration.name)
+
+    def sync_hot_dimensions(self):
+        """Add columns and indexes for HOT_DIMENSIONS; idempotent, so safe on every upgrade"""
+        for statement in dimension_index_ddl("metrics", self.hot_dimensions):
+            self.client.command(statement)
+        logger.info("Hot dimensions synced", hot_dimensions=sorted(self.hot_dimensions))
+
+    def backfill(self, versions: list[int] | None = None, max_threads: int = 2) -> int:
+        """Run outstanding backfills partition by partition; returns rows written"""
+        self.ensure_tables()
+        applied = self.applied()
+        total = 0
+
+        for migration in self.migrations:
+            record = applied.get(migration.version)
+            if not migration.backfill or record is None or record["backfill_before"] is None:
+                continue
+            if versions and migration.version not in versions:
+                continue
+
+            # Rows created up to the cutoff belong to the backfill; wait for it to pass
+            wait_ms = self.client.query(
+                "SELECT toUnixTimestamp64Milli({before:DateTime64(3)}) - toUnixTimestamp64Milli(now64(3))",
+                parameters={"before": record["backfill_before"]},
+            ).result_rows[0][0]
+            if wait_ms > 0:
+                logger.info("Waiting for the migration cutoff", version=migration.version, seconds=wait_ms / 1000)
+                time.sleep(wait_ms / 1000)
+
+            done = self._backfilled_partitions(migration.version)
+            for partition_id in self._partitions(migration.source):
+                if partition_id in done:
+                    continue
+                total += self._backfill_partition(migration, partition_id, record["backfill_before"], max_threads)
+        return total
+
+    def status(self) -> dict:
+        """Applied and pending versions, and backfill progress"""
+        self.ensure_tables()
+        applied = self.applied()
+        migrations = []
+        for migration in self.migrations:
+            record = applied.get(migration.version)
+            entry = {
+                "version": migration.version,
+                "name": migration.name,
+                "applied_at": str(record["applied_at"]) if record else None,
+                "modified": bool(record) and record["checksum"] != migration.checksum,
+            }
+            if record and migration.backfill and record["backfill_before"] is not None:
+                partitions = self._partitions(migration.source)
+                done = self._backfilled_partitions(migration.version)
+                entry["backfill"] = {
+                    "partitions": len(partitions),
+                    "remaining": len([p for p in partitions if p not in done]),
+                }
+            migrations.append(entry)
+
+        return {
+            "current": max(applied, default=0),
+            "latest": self.migrations[-1].version if self.migrations else 0,
+            "migrations": migrations,
+        }
+
+    def _backfill_partition(self, migration: Migration, partition_id: str, before: datetime, max_threads: int) -> int:
+        """
+        Backfill one source partition exactly once, even if interrupted.
+
+        Rows are written to a staging table, which is renamed once complete
+        and then moved into the target partition by partition; each step is
+        atomic. An interrupted run redoes an incomplete staging table and
+        finishes moving a complete one.
+        """
+        started = time.perf_counter()
+        loading = f"`_backfill_{migration.version}_{partition_id}_loading`"
+        ready = f"`_backfill_{migration.version}_{partition_id}`"
+
+        rows = 0
+        if not self._table_exists(ready.strip("`")):
+            self.client.command(f"DROP TABLE IF EXISTS {loading}")
+            self.client.command(f"CREATE TABLE {loading} AS {migration.target}")
+            summary = self.client.command(
+                migration.backfill.format(table=loading, where=BACKFILL_WHERE),
+                parameters={"partition_id": partition_id, "before": before},
+                settings={"max_threads": max_threads},
+            )
+            rows = getattr(summary, "written_rows", 0)
+            self.client.command(f"RENAME TABLE {loading} TO {ready}")
+
+        for staged in self._partitions(ready.strip("`")):
+            self.client.command(f"ALTER TABLE {ready} MOVE PARTITION ID '{staged}' TO TABLE {migration.target}")
+        seconds = round(time.perf_counter() - started, 2)
+        self.client.insert(
+            "schema_backfills",
+            [[migration.version, partition_id, rows, seconds]],
+            column_names=["version", "partition_id", "rows", "seconds"],
+        )
+        logger.info(
+            "ClickHouse backfill partition done",
+            version=migration.version,
+            partition=partition_id,
+            rows=rows,
+            seconds=seconds,
+        )
+        self.client.command(f"DROP TABLE {ready}")
+        return rows
+
+    def _partitions(self, table: str) -> list[str]:
+        rows = self.client.query(
+            """
+            SELECT DISTINCT partition_id FROM system.parts
+            WHERE database = currentDatabase() AND table = {table:String} AND active
+            ORDER BY partition_id
+            """,
+            parameters={"table": table},
+        ).result_rows
+        return [row[0] for row in rows]
+
+    def _backfilled_partitions(self, version: int) -> set[str]:
+        rows = self.client.query(
+            "SELECT partition_id FROM schema_backfills FINAL WHERE version = {version:UInt32}",
+            parameters={"version": version},
+        ).result_rows
+        return {row[0] for row in rows}
+
+    def _table_exists(self, name: str) -> bool:
+        return self.client.query(
+            "SELECT count() FROM system.tables WHERE database = currentDatabase() AND name = {name:String}",
+            parameters={"name": name},
+        ).result_rows[0][0] > 0
+
+    def _view_cutoffs(self, views: list[str]) -> dict[str, int | None]:
+        """Cutoff of each of `views` that exists; None for views created without one"""
+        if not views:
+            return {}
+        rows = self.client.query(
+            """
+            SELECT name, create_table_query FROM system.tables
+            WHERE database = currentDatabase() AND name IN {views:Array(String)}
+            """,
+            parameters={"views": views},
+        ).result_rows
+        cutoffs = {}
+        for name, query in rows:
+            match = VIEW_CUTOFF_PATTERN.search(query)
+            cutoffs[name] = int(match.group(1)) if match else None
+        return cutoffs
+
+    def _record(self, migration: Migration, backfill_before: datetime | None):
+        self.client.insert(
+            "schema_migrations",
+            [[migration.version, migration.name, migration.checksum, backfill_before]],
+            column_names=["version", "name", "checksum", "backfill_before"],
+        )
+
+    def _now_ms(self) -> int:
+        return int(self.client.query("SELECT toUnixTimestamp64Milli(now64(3))").result_rows[0][0])
+
+    def _warn_modified(self):
+        applied = self.applied()
+        for migration in self.migrations:
+            record = applied.get(migration.version)
+            if record and record["checksum"] != migration.checksum:
+                logger.warning(
+                    "Applied ClickHouse migration was modified",
+                    version=migration.version,
+                    name=migration.name,
+                )
+
+
+def _from_epoch_ms(epoch_ms: int) -> datetime:
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+
+
+def check_schema(client, hot_dimensions: set[str]) -> bool:
+    """
+    Whether the schema is migrated to the latest version, without changing it.
+
+    Called by workers at startup instead of running DDL; logs what is missing.
+    """
+    try:
+        version = client.query("SELECT max(version) FROM schema_migrations").result_rows[0][0]
+        columns = {
+            row[0]
+            for row in client.query(
+                """
+                SELECT name FROM system.columns
+                WHERE database = currentDatabase() AND table = 'metrics'
+                """
+            ).result_rows
+        }
+    except Exception as e:
+        logger.error("ClickHouse schema is not migrated; run scripts.clickhouse_migrate upgrade", exc_info=e)
+        return False
+
+    missing = sorted(key for key in hot_dimensions if hot_dimension_column(key) not in columns)
+    if version < LATEST_VERSION or missing:
+        logger.warning(
+            "ClickHouse schema is behind; run scripts.clickhouse_migrate upgrade",
+            version=version,
+            latest=LATEST_VERSION,
+            missing_hot_dimensions=missing,
+        )
+        return False
+    return True
@@ -42,7 +42,7 @@ class RedisClient:
         """Get value by key"""
         return await self.client.get(key)
 
-    async def set(self, key: str, value: str, ex: int | None = None):
+    async def set(self, key: str, value: str | bytes, ex: int | None = None):
         """Set value with optional expiration"""
         return await self.client.set(key, value, ex=ex)
 
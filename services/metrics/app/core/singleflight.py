@@ -0,0 +1,21 @@
+"""Coalescing of identical concurrent queries"""
+
+from ayvlo_common.singleflight import RedisSingleFlight, SingleFlight
+from app.core.config import settings
+from app.core.redis import redis_client
+
+
+def create_singleflight() -> SingleFlight:
+    """Singleflight for the configured SINGLEFLIGHT_MODE"""
+    if settings.SINGLEFLIGHT_MODE == "redis":
+        return RedisSingleFlight(
+            lambda: redis_client.client,
+            lock_ttl=settings.SINGLEFLIGHT_LOCK_TTL_SECONDS,
+            result_ttl=settings.SINGLEFLIGHT_RESULT_TTL_SECONDS,
+            prefix="singleflight:metrics",
+        )
+    return SingleFlight()
+
+
+# Global instance
+query_flights = create_singleflight()
@@ -0,0 +1,294 @@
+"""Segmented write-ahead log for buffered ingestion"""
+
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Record layout: <payload length: u32><crc32 of payload: u32><payload>
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".wal"
+
+
+class WriteAheadLog:
+    """
+    Append-only log of length-prefixed records, rotated into numbered segments.
+
+    Writers call write() and then await sync(); a background task fsyncs at most
+    once per fsync_interval_ms and wakes every writer that was waiting (group commit).
+    Segments are deleted with truncate_through() once their rows are safely stored.
+
+    After a failed write or fsync, what reached the disk is unknown (a retried
+    fsync can succeed without the lost pages), so the log refuses further
+    writes until the process restarts and replays it.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, fsync_interval_ms: int):
+        self.root = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval_ms / 1000
+
+        self.directory: Path | None = None
+        self.segment_seq = 0
+        self._fd: int | None = None
+        self._size = 0
+        self._lock_fd: int | None = None
+        self._sealed_fds: list[int] = []
+        self._written = 0
+        self._synced = 0
+        self._waiters: list[tuple[int, asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.failed: Exception | None = None
+
+    def open(self) -> list[int]:
+        """
+        Claim a WAL slot and start a fresh segment.
+
+        Each process locks its own slot directory, so several workers can share
+        one WAL root. Returns the sequence numbers of segments left over from a
+        previous run, which must be replayed before they are truncated.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        slot = 0
+        while True:
+            directory = self.root / f"slot-{slot}"
+            directory.mkdir(exist_ok=True)
+            lock_fd = _try_lock(directory)
+            if lock_fd is not None:
+                break
+            slot += 1
+
+        self.directory = directory
+        self._lock_fd = lock_fd
+
+        pending = self.segments()
+        self.segment_seq = pending[-1] if pending else 0
+        self._open_segment()
+
+        logger.info(
+            "WAL opened",
+            directory=str(self.directory),
+            pending_segments=len(pending),
+        )
+        return pending
+
+    def orphans(self) -> list["WriteAheadLog"]:
+        """
+        Lock every other slot that has segments and no running process holds.
+
+        Slots are left behind when the service restarts with fewer workers;
+        their segments hold acknowledged rows. Each returned log is only for
+        replay() and truncate_through(), then release().
+        """
+        found = []
+        for directory in sorted(self.root.glob("slot-*")):
+            if directory == self.directory:
+                continue
+            lock_fd = _try_lock(directory)
+            if lock_fd is None:
+                continue
+
+            orphan = WriteAheadLog(str(self.root), self.segment_bytes, int(self.fsync_interval * 1000))
+            orphan.directory = directory
+            orphan._lock_fd = lock_fd
+            if orphan.segments():
+                found.append(orphan)
+            else:
+                orphan.release()
+        return found
+
+    def release(self):
+        """Release the slot lock of a log opened by orphans()"""
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def start(self):
+        """Start the group-commit task"""
+        self._task = asyncio.create_task(self._group_commit_loop())
+
+    async def close(self):
+        """Fsync outstanding writes and release the slot"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._fsync_pending()
+
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def segments(self) -> list[int]:
+        """Sequence numbers of all segments on disk, oldest first"""
+        return sorted(
+            int(path.stem) for path in self.directory.glob(f"*{SEGMENT_SUFFIX}")
+        )
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{seq:016d}{SEGMENT_SUFFIX}"
+
+    def _open_segment(self):
+        self.segment_seq += 1
+        self._fd = os.open(
+            self._segment_path(self.segment_seq),
+            os.O_CREAT | os.O_WRONLY | os.O_APPEND,
+            0o644,
+        )
+        self._size = 0
+
+    def rotate(self) -> int:
+        """
+        Seal the current segment and start a new one.
+
+        Returns the sealed segment's sequence number: every record written
+        before this call lives in a segment numbered <= that value.
+        """
+        sealed = self.segment_seq
+        self._sealed_fds.append(self._fd)
+        self._open_segment()
+        return sealed
+
+    def write(self, payload: bytes) -> int:
+        """Append one record (not yet durable) and return its segment number"""
+        self._check_usable()
+        if self._size >= self.segment_bytes:
+            self.rotate()
+
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        view = memoryview(record)
+        try:
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+        except OSError as e:
+            # A torn record would hide every later record of the segment from replay
+            self._fail(e)
+            raise
+
+        self._size += len(record)
+        self._written += 1
+        return self.segment_seq
+
+    async def sync(self):
+        """Wait until every record written so far has been fsynced"""
+        self._check_usable()
+        target = self._written
+        if self._synced >= target:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((target, waiter))
+        self._wakeup.set()
+        await waiter
+
+    async def _group_commit_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.sleep(self.fsync_interval)  # let concurrent writers join
+            await self._fsync_pending()
+
+    async def _fsync_pending(self):
+        target = self._written
+        if self._synced >= target and not self._sealed_fds:
+            return
+
+        sealed, self._sealed_fds = self._sealed_fds, []
+        fds = sealed + ([self._fd] if self._fd is not None else [])
+        error: Exception | None = None
+
+        try:
+            if self.failed is not None:
+                raise self.failed
+            for fd in fds:
+                await asyncio.to_thread(os.fsync, fd)
+            self._synced = target
+        except Exception as e:
+            if self.failed is None:
+                self._fail(e)
+            error = e
+        finally:
+            for fd in sealed:
+                os.close(fd)
+
+        # Wake writers covered by this fsync; later writers wait for the next round
+        remaining = []
+        for waiter_target, waiter in self._waiters:
+            if waiter.done():
+                continue
+            if error is not None and waiter_target <= target:
+                waiter.set_exception(error)
+            elif waiter_target <= self._synced:
+                waiter.set_result(None)
+            else:
+                remaining.append((waiter_target, waiter))
+        self._waiters = remaining
+
+    def _fail(self, error: Exception):
+        self.failed = error
+        logger.error("WAL failed; refusing writes until restart", exc_info=error)
+
+    def _check_usable(self):
+        if self.failed is not None:
+            raise RuntimeError("WAL is unusable after a failed write or fsync") from self.failed
+
+    async def check(self) -> bool:
+        """Health probe: False once the log has failed"""
+        return self.failed is None
+
+    def replay(self, seqs: list[int]) -> Iterator[bytes]:
+        """
+        Yield record payloads from the given segments via mmap.
+
+        Reading stops at the first torn or corrupt record of a segment, which
+        can only be the tail of a write interrupted by a crash.
+        """
+        for seq in seqs:
+            path = self._segment_path(seq)
+            if path.stat().st_size == 0:
+                continue
+
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = 0
+                while offset + RECORD_HEADER.size <= len(mm):
+                    length, crc = RECORD_HEADER.unpack_from(mm, offset)
+                    start = offset + RECORD_HEADER.size
+                    payload = mm[start:start + length]
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        logger.warning("Truncated WAL record skipped", segment=seq, offset=offset)
+                        break
+                    yield payload
+                    offset = start + length
+
+    def truncate_through(self, seq: int):
+        """Delete every sealed segment numbered <= seq"""
+        for existing in self.segments():
+            if existing > seq or existing == self.segment_seq:
+                break
+            self._segment_path(existing).unlink(missing_ok=True)
+
+
+def _try_lock(directory: Path) -> int | None:
+    """Exclusive lock on a slot directory, or None if another process holds it"""
+    lock_fd = os.open(directory / "LOCK", os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(lock_fd)
+        return None
+    return lock_fd
@@ -3,17 +3,34 @@ Ayvlo Metrics Service - FastAPI Application
 Handles metric ingestion, storage, and querying with ClickHouse
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from prometheus_client import make_asgi_app
 import structlog
+from ayvlo_common.logging import setup_logging
+from ayvlo_common.observability import setup_observability
+from ayvlo_common.profiling import ProfilingMiddleware, token_authorizer
 from app.api import metrics, health
+from app.consumer import ClickHouseSink
 from app.core.config import settings
+from app.core.profiling import create_profile_store
 from app.core.clickhouse import clickhouse_client
+from app.core.health import health_monitor
+from app.core.ingest_buffer import ingest_buffer
+from app.core.ingest_log import ingest_log
+from app.core.migrations import check_schema
 from app.core.redis import redis_client
 
+setup_logging(
+    settings.SERVICE_NAME,
+    settings.LOG_LEVEL,
+    sample_rates=settings.LOG_SAMPLE_RATES,
+    max_events_per_second=settings.LOG_MAX_EVENTS_PER_SECOND,
+)
+
 logger = structlog.get_logger()
 
 
@@ -26,15 +43,48 @@ async def lifespan(app: FastAPI):
     # Initialize ClickHouse connection
     await clickhouse_client.connect()
     logger.info("ClickHouse connected", host=settings.CLICKHOUSE_HOST)
+    if clickhouse_client.client is not None:
+        # Schema changes are applied by scripts.clickhouse_migrate, never here
+        check_schema(clickhouse_client.client, clickhouse_client.hot_dimensions)
 
     # Initialize Redis connection
     await redis_client.connect()
     logger.info("Redis connected", host=settings.REDIS_HOST)
 
+    # Initialize ingest log producer
+    sink_task = None
+    if settings.INGEST_MODE == "log":
+        await ingest_log.connect()
+        logger.info("Ingest log connected", broker=settings.REDPANDA_BROKER)
+        # Only this process can read the in-memory log, so it runs the sink too
+        if settings.INGEST_LOG_BACKEND == "memory":
+            sink = ClickHouseSink(ingest_log.consumer(), clickhouse_client)
+            sink_task = asyncio.create_task(sink.run())
+
+    # Replay the WAL and start the buffered flusher
+    if settings.INGEST_MODE == "buffered":
+        await ingest_buffer.start()
+        logger.info("Ingest buffer started", wal_dir=settings.WAL_DIR)
+
+    # Readiness is served from these probes
+    health_monitor.add("clickhouse", lambda: asyncio.to_thread(clickhouse_client.ping))
+    health_monitor.add("redis", lambda: redis_client.client.ping())
+    if settings.INGEST_MODE == "buffered":
+        health_monitor.add("wal", ingest_buffer.wal.check)
+    await health_monitor.start()
+
     yield
 
     # Shutdown
     logger.info("Shutting down Ayvlo Metrics Service")
+    await health_monitor.stop()
+    if sink_task is not None:
+        sink.stop()
+        await sink_task
+    if settings.INGEST_MODE == "log":
+        await ingest_log.disconnect()
+    if settings.INGEST_MODE == "buffered":
+        await ingest_buffer.stop()
     await clickhouse_client.disconnect()
     await redis_client.disconnect()
 
@@ -55,6 +105,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tracing; instruments this app, outgoing httpx calls and Redis
+if settings.OTEL_ENABLED:
+    setup_observability(
+        service_name=settings.SERVICE_NAME,
+        service_namespace="ayvlo",
+        deployment_environment=settings.ENVIRONMENT,
+        otlp_endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT,
+        sentry_dsn=settings.SENTRY_DSN or None,
+        sample_rate=settings.OTEL_TRACES_SAMPLE_RATE,
+        app=app,
+        route_sample_rates=settings.OTEL_ROUTE_SAMPLE_RATES,
+        tail_sampling=settings.OTEL_TAIL_SAMPLING,
+        tail_slow_threshold_ms=settings.OTEL_TAIL_SLOW_THRESHOLD_MS,
+        sentry_sample_rate=settings.SENTRY_TRACES_SAMPLE_RATE,
+    )
+
+# Per-request profiling; not installed at all unless enabled
+if settings.PROFILING_TOKEN or settings.PROFILING_SAMPLE_EVERY:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=create_profile_store(),
+        authorize=token_authorizer(settings.PROFILING_TOKEN),
+        sample_every=settings.PROFILING_SAMPLE_EVERY,
+    )
+
 
 # Exception handler
 @app.exception_handler(Exception)
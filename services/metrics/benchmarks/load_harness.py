@@ -0,0 +1,422 @@
+"""
+Load harness for the metrics service.
+
+Drives /api/v1/metrics/ingest, /ingest/batch and /query against the app
+in-process (httpx ASGITransport), with a configurable number of tenants,
+metrics per tenant, dimension fan-out and concurrent clients. It reports
+rows/sec, request latency percentiles and event-loop lag per scenario.
+
+Storage is either the in-memory ClickHouse stand-in (`--backend memory`), a
+ClickHouse server from the usual CLICKHOUSE_* settings (`--backend clickhouse`),
+or a throwaway server started from a local binary (`--clickhouse-binary`).
+Rate limiting still goes through Redis (REDIS_* settings); the limits are
+raised so they never throttle the run.
+
+Client and service share one event loop, so the loop lag reported includes
+anything the service blocks the loop with (e.g. inline inserts in direct mode).
+
+Usage (from services/metrics):
+    python -m benchmarks.load_harness
+    python -m benchmarks.load_harness --tenants 50 --metrics 20 --dimensions 3 \\
+        --dimension-values 10 --concurrency 64 --duration 30 --output run.json
+    python -m benchmarks.load_harness --backend clickhouse --ingest-mode buffered
+    python -m benchmarks.load_harness --clickhouse-binary ~/bin/clickhouse
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from ayvlo_common.series import SERIES_MEDIA_TYPE, decode_series
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = ["ingest", "batch", "query"]
+QUERY_KINDS = ["raw", "series", "aggregate"]
+
+
+class Workload:
+    """Seeded generator of tenants, series and request payloads"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.rng = random.Random(args.seed)
+        self.tenants = [str(uuid.UUID(int=self.rng.getrandbits(128), version=4)) for _ in range(args.tenants)]
+        self.metrics = [f"metric_{i}" for i in range(args.metrics)]
+        self.dimensions = {
+            f"dim{i}": [f"v{j}" for j in range(args.dimension_values)] for i in range(args.dimensions)
+        }
+        self.window = timedelta(seconds=args.window)
+        self.batch_size = args.batch_size
+        self.query_kinds = args.query_kinds
+        self.query_filter_rate = args.query_filter_rate
+
+    @property
+    def series_count(self) -> int:
+        """Distinct (tenant, metric, dimension values) series the workload writes"""
+        fan_out = int(np.prod([len(values) for values in self.dimensions.values()])) if self.dimensions else 1
+        return len(self.tenants) * len(self.metrics) * fan_out
+
+    def tenant(self) -> str:
+        return self.rng.choice(self.tenants)
+
+    def point(self, now: datetime) -> dict:
+        return {
+            "metric_name": self.rng.choice(self.metrics),
+            "value": round(self.rng.gauss(100.0, 15.0), 3),
+            "timestamp": (now - self.rng.random() * self.window).isoformat(),
+            "dimensions": {key: self.rng.choice(values) for key, values in self.dimensions.items()},
+        }
+
+    def row(self, tenant_id: str, now: datetime) -> dict:
+        """A point as stored, for prefilling the backend directly"""
+        return {"tenant_id": tenant_id, **self.point(now), "metadata": {}}
+
+    def query(self, now: datetime) -> tuple[str, dict]:
+        kind = self.rng.choice(self.query_kinds)
+        body = {
+            "metric_name": self.rng.choice(self.metrics),
+            "start_time": (now - self.window).isoformat(),
+            "end_time": now.isoformat(),
+            "aggregate": kind == "aggregate",
+        }
+        if self.dimensions and kind != "aggregate" and self.rng.random() < self.query_filter_rate:
+            key = self.rng.choice(list(self.dimensions))
+            body["dimensions"] = {key: self.rng.choice(self.dimensions[key])}
+        return kind, body
+
+
+class Recorder:
+    """Per-scenario request outcomes"""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.statuses: dict[int, int] = {}
+        self.rows = 0
+
+    def record(self, latency: float, status: int, rows: int):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status < 300:
+            self.rows += rows
+
+
+async def measure_loop_lag(samples: list[float], stop: asyncio.Event, interval: float = 0.01):
+    """Sample how late a timer fires: time the loop was busy with something else"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+def percentiles_ms(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99]) * 1000
+    return {
+        "p50": round(p50, 3),
+        "p90": round(p90, 3),
+        "p99": round(p99, 3),
+        "max": round(max(samples) * 1000, 3),
+    }
+
+
+async def send(client, scenario: str, workload: Workload, recorder: Recorder):
+    """Issue one request of the scenario and record it"""
+    now = datetime.now(timezone.utc)
+    headers = {"X-Tenant-ID": workload.tenant()}
+
+    if scenario == "ingest":
+        path, body, rows = "/api/v1/metrics/ingest", workload.point(now), 1
+    elif scenario == "batch":
+        points = [workload.point(now) for _ in range(workload.batch_size)]
+        path, body, rows = "/api/v1/metrics/ingest/batch", {"metrics": points}, len(points)
+    else:
+        kind, body = workload.query(now)
+        path, rows = "/api/v1/metrics/query", 0
+        if kind == "series":
+            headers["Accept"] = SERIES_MEDIA_TYPE
+
+    started = time.perf_counter()
+    response = await client.post(path, json=body, headers=headers)
+    latency = time.perf_counter() - started
+
+    if scenario == "query" and response.status_code < 300:
+        if response.headers.get("content-type", "").startswith(SERIES_MEDIA_TYPE):
+            rows = len(decode_series(response.content)[0])
+        else:
+            rows = len(response.json())
+    recorder.record(latency, response.status_code, rows)
+
+
+async def run_scenario(client, scenario: str, workload: Workload, args: argparse.Namespace) -> dict:
+    recorder = Recorder()
+    lag: list[float] = []
+    stop = asyncio.Event()
+    deadline = time.perf_counter() + args.duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            try:
+                await send(client, scenario, workload, recorder)
+            except Exception as e:
+                recorder.record(0.0, 599, 0)
+                if args.verbose:
+                    print(f"  {scenario} request failed: {e!r}", file=sys.stderr)
+
+    monitor = asyncio.create_task(measure_loop_lag(lag, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    requests = len(recorder.latencies)
+    ok = sum(count for status, count in recorder.statuses.items() if status < 300)
+    return {
+        "scenario": scenario,
+        "duration_s": round(elapsed, 3),
+        "requests": requests,
+        "errors": requests - ok,
+        "statuses": {str(status): count for status, count in sorted(recorder.statuses.items())},
+        "requests_per_s": round(requests / elapsed, 1),
+        "rows": recorder.rows,
+        "rows_per_s": round(recorder.rows / elapsed, 1),
+        "latency_ms": percentiles_ms(recorder.latencies),
+        "loop_lag_ms": percentiles_ms(lag),
+    }
+
+
+async def prefill(workload: Workload, rows_per_tenant: int):
+    """Write rows straight into the backend so queries have data to scan"""
+    from app.core.clickhouse import clickhouse_client
+
+    now = datetime.now(timezone.utc)
+    for tenant_id in workload.tenants:
+        for offset in range(0, rows_per_tenant, 10_000):
+            rows = [workload.row(tenant_id, now) for _ in range(min(10_000, rows_per_tenant - offset))]
+            await asyncio.to_thread(clickhouse_client.insert_metrics, rows)
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    import httpx
+    from app.main import app
+
+    workload = Workload(args)
+    print(
+        f"{len(workload.tenants)} tenants, {workload.series_count} series, "
+        f"concurrency {args.concurrency}, {args.duration}s per scenario",
+        file=sys.stderr,
+    )
+
+    if args.backend == "clickhouse":
+        from app.core.clickhouse import clickhouse_client
+        from app.core.migrations import MigrationRunner
+        from scripts.clickhouse_migrate import get_client
+
+        client = get_client()
+        MigrationRunner(client, hot_dimensions=clickhouse_client.hot_dimensions).upgrade()
+        client.close()
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://metrics", timeout=60) as client:
+            for scenario in args.scenarios:
+                if scenario == "query" and args.prefill_rows:
+                    print(f"prefilling {args.prefill_rows} rows per tenant", file=sys.stderr)
+                    await prefill(workload, args.prefill_rows)
+
+                print(f"running {scenario}", file=sys.stderr)
+                result = await run_scenario(client, scenario, workload, args)
+                print(
+                    f"  {result['requests_per_s']} req/s  {result['rows_per_s']} rows/s  "
+                    f"p50 {result['latency_ms'].get('p50')} ms  p99 {result['latency_ms'].get('p99')} ms  "
+                    f"loop lag p99 {result['loop_lag_ms'].get('p99')} ms  errors {result['errors']}",
+                    file=sys.stderr,
+                )
+                results.append(result)
+    return results
+
+
+@contextmanager
+def local_clickhouse(binary: str, http_port: int):
+    """Run a throwaway ClickHouse server from a local binary in a temp directory"""
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="ayvlo-clickhouse-")
+    process = subprocess.Popen(
+        [
+            binary,
+            "server",
+            "--",
+            f"--path={workdir}/",
+            f"--tmp_path={workdir}/tmp/",
+            f"--user_files_path={workdir}/user_files/",
+            f"--format_schema_path={workdir}/format_schemas/",
+            f"--logger.log={workdir}/server.log",
+            f"--logger.errorlog={workdir}/server.err.log",
+            "--listen_host=127.0.0.1",
+            f"--http_port={http_port}",
+            f"--tcp_port={http_port + 1}",
+            f"--interserver_http_port={http_port + 2}",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{http_port}/ping").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"ClickHouse did not start; see {workdir}/server.err.log")
+            time.sleep(0.2)
+
+        database = os.environ.get("CLICKHOUSE_DATABASE", "ayvlo")
+        httpx.post(f"http://127.0.0.1:{http_port}/", content=f"CREATE DATABASE IF NOT EXISTS {database}")
+        yield http_port
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def _no_server():
+    yield None
+
+
+def configure_service(args: argparse.Namespace, wal_dir: str):
+    """Settings are read at import, so they are set before the app is imported"""
+    os.environ["CLICKHOUSE_BACKEND"] = args.backend
+    os.environ["INGEST_MODE"] = args.ingest_mode
+    os.environ["RATE_LIMIT_INGESTION"] = str(10**9)
+    os.environ["RATE_LIMIT_QUERY"] = str(10**9)
+    os.environ["BATCH_SIZE"] = str(max(args.batch_size, int(os.environ.get("BATCH_SIZE", 1000))))
+    os.environ.setdefault("INGEST_LOG_BACKEND", "memory")
+    if os.environ["INGEST_LOG_BACKEND"] == "memory":
+        # Only allowed in tests; the API process runs the sink for it
+        os.environ.setdefault("ENVIRONMENT", "test")
+    os.environ.setdefault("WAL_DIR", wal_dir)
+
+    if not args.service_logs:
+        os.environ["LOG_LEVEL"] = "WARNING"
+
+
+def environment(args: argparse.Namespace) -> dict:
+    """Commit, host and service settings, for comparing runs"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=SERVICE_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "backend": "clickhouse-binary" if args.clickhouse_binary else args.backend,
+        "ingest_mode": args.ingest_mode,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["memory", "clickhouse"], default="memory")
+    parser.add_argument("--clickhouse-binary", help="Start a throwaway ClickHouse server from this binary")
+    parser.add_argument("--clickhouse-port", type=int, default=18123, help="HTTP port for --clickhouse-binary")
+    parser.add_argument("--ingest-mode", choices=["direct", "log", "buffered"], default="direct")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--metrics", type=int, default=10, help="Metric names per tenant")
+    parser.add_argument("--dimensions", type=int, default=2, help="Dimension keys per point")
+    parser.add_argument("--dimension-values", type=int, default=5, help="Distinct values per dimension key")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--batch-size", type=int, default=500, help="Points per /ingest/batch request")
+    parser.add_argument("--window", type=int, default=86_400, help="Seconds of history written and queried")
+    parser.add_argument("--query-kinds", nargs="+", choices=QUERY_KINDS, default=QUERY_KINDS)
+    parser.add_argument("--query-filter-rate", type=float, default=0.5, help="Share of queries with a dimension filter")
+    parser.add_argument("--prefill-rows", type=int, default=50_000, help="Rows per tenant written before queries")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--service-logs", action="store_true", help="Keep the service's info logs")
+    parser.add_argument("--verbose", action="store_true", help="Print failed requests")
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    args = parser.parse_args()
+
+    if args.clickhouse_binary:
+        args.backend = "clickhouse"
+
+    with tempfile.TemporaryDirectory(prefix="ayvlo-wal-") as wal_dir:
+        with (
+            local_clickhouse(args.clickhouse_binary, args.clickhouse_port)
+            if args.clickhouse_binary
+            else _no_server()
+        ) as port:
+            if port:
+                os.environ["CLICKHOUSE_HOST"] = "127.0.0.1"
+                os.environ["CLICKHOUSE_PORT"] = str(port)
+                os.environ["CLICKHOUSE_USER"] = "default"
+                os.environ["CLICKHOUSE_PASSWORD"] = ""
+
+            configure_service(args, wal_dir)
+            results = asyncio.run(run(args))
+
+    report = json.dumps(
+        {
+            "environment": environment(args),
+            "workload": {
+                key: getattr(args, key)
+                for key in (
+                    "tenants",
+                    "metrics",
+                    "dimensions",
+                    "dimension_values",
+                    "concurrency",
+                    "duration",
+                    "batch_size",
+                    "window",
+                    "query_kinds",
+                    "query_filter_rate",
+                    "prefill_rows",
+                    "seed",
+                )
+            },
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Apply versioned ClickHouse schema migrations (see app/core/migrations.py).
+
+Usage (from services/metrics):
+    python -m scripts.clickhouse_migrate upgrade [--to VERSION] [--backfill]
+    python -m scripts.clickhouse_migrate backfill [--version VERSION ...] [--max-threads 2]
+    python -m scripts.clickhouse_migrate stamp VERSION
+    python -m scripts.clickhouse_migrate status
+
+`upgrade` applies pending DDL and syncs HOT_DIMENSIONS; it is quick and meant
+for a release job. Migrations that add materialized views only cover rows
+created after their cutoff; `backfill` fills in older rows one partition at a
+time and can run in the background afterwards, resuming where it stopped.
+
+`upgrade` stamps migrations whose views the service itself created (before
+this runner existed); `stamp` does so explicitly.
+"""
+
+import argparse
+import json
+
+import clickhouse_connect
+import structlog
+
+from app.core.config import settings
+from app.core.migrations import MigrationRunner
+
+logger = structlog.get_logger()
+
+
+def get_client():
+    return clickhouse_connect.get_client(
+        host=settings.CLICKHOUSE_HOST,
+        port=settings.CLICKHOUSE_PORT,
+        username=settings.CLICKHOUSE_USER,
+        password=settings.CLICKHOUSE_PASSWORD,
+        database=settings.CLICKHOUSE_DATABASE,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    upgrade_cmd = sub.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_cmd.add_argument("--to", type=int, help="Stop at this version")
+    upgrade_cmd.add_argument("--backfill", action="store_true", help="Also run backfills now")
+
+    backfill_cmd = sub.add_parser("backfill", help="Run outstanding backfills")
+    backfill_cmd.add_argument("--version", type=int, nargs="+", help="Only these migrations")
+    backfill_cmd.add_argument("--max-threads", type=int, default=2, help="ClickHouse threads per INSERT")
+
+    stamp_cmd = sub.add_parser("stamp", help="Record migrations as applied without running them")
+    stamp_cmd.add_argument("version", type=int)
+
+    sub.add_parser("status", help="Print applied versions and backfill progress")
+
+    args = parser.parse_args()
+    client = get_client()
+    runner = MigrationRunner(client, hot_dimensions=set(settings.HOT_DIMENSIONS))
+
+    try:
+        if args.command == "upgrade":
+            applied = runner.upgrade(args.to)
+            logger.info("ClickHouse schema up to date", applied=[migration.version for migration in applied])
+            if args.backfill:
+                runner.backfill()
+        elif args.command == "backfill":
+            rows = runner.backfill(args.version, max_threads=args.max_threads)
+            logger.info("ClickHouse backfills complete", rows=rows)
+        elif args.command == "stamp":
+            runner.stamp(args.version)
+        else:
+            print(json.dumps(runner.status(), indent=2))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Online migration of the `metrics` table to the compression-tuned schema,
+plus a storage / scan-throughput report to compare before and after.
+
+Usage (from services/metrics):
+    python -m scripts.migrate_metrics_storage report [--table metrics] [--runs 5]
+    python -m scripts.migrate_metrics_storage migrate [--keep-legacy]
+
+Migration steps:
+1. Create `metrics_v2` with the new schema (LowCardinality metric_name,
+   DoubleDelta/Gorilla/ZSTD codecs, no per-row metric_id).
+2. Attach a dual-write materialized view metrics -> metrics_v2 for rows
+   created from a cutoff a few seconds ahead on.
+3. Once the cutoff has passed, copy every existing partition with
+   INSERT ... SELECT, limited to rows created before it.
+4. Drop the dual-write view, EXCHANGE the tables and check that
+   metrics_hourly_mv and metric_catalog_mv now read from the new `metrics`
+   (the migration stops, keeping both tables, if they do not).
+5. Copy over the rows written to the old table between dropping the view and
+   the exchange (an anti-join makes this safe to repeat) and keep the old
+   table as `metrics_legacy` (dropped unless --keep-legacy).
+
+Writers do not need to be paused.
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import clickhouse_connect
+import structlog
+
+from app.core.clickhouse import (
+    METRICS_TABLE_DDL,
+    VIEW_CUTOFF_WHERE,
+    dimension_index_ddl,
+)
+from app.core.config import settings
+from app.core.migrations import CUTOFF_DELAY_MS
+
+logger = structlog.get_logger()
+
+COPY_COLUMNS = "tenant_id, metric_name, timestamp, value, dimensions, metadata, created_at"
+
+# How far back from the cutover the catch-up looks for rows missing from the
+# new table, to cover inserts still in flight when the dual-write view is dropped
+CATCHUP_MARGIN_MS = 60_000
+
+# Views that must read from `metrics` after the exchange
+ROLLUP_VIEWS = ("metrics_hourly_mv", "metric_catalog_mv")
+
+SCAN_QUERY = """
+SELECT metric_name, count(), sum(value), min(timestamp), max(timestamp)
+FROM {table}
+GROUP BY metric_name
+SETTINGS use_query_cache = 0
+"""
+
+
+def get_client():
+    return clickhouse_connect.get_client(
+        host=settings.CLICKHOUSE_HOST,
+        port=settings.CLICKHOUSE_PORT,
+        username=settings.CLICKHOUSE_USER,
+        password=settings.CLICKHOUSE_PASSWORD,
+        database=settings.CLICKHOUSE_DATABASE,
+    )
+
+
+def storage_report(client, table: str, runs: int) -> dict:
+    """Bytes on disk per column and full-scan throughput for `table`"""
+    totals = client.query(
+        """
+        SELECT sum(rows), sum(bytes_on_disk), sum(data_uncompressed_bytes), count()
+        FROM system.parts
+        WHERE database = currentDatabase() AND table = {table:String} AND active
+        """,
+        parameters={"table": table},
+    ).result_rows[0]
+
+    columns = client.query(
+        """
+        SELECT
+            column,
+            sum(column_data_compressed_bytes) AS compressed,
+            sum(column_data_uncompressed_bytes) AS uncompressed
+        FROM system.parts_columns
+        WHERE database = currentDatabase() AND table = {table:String} AND active
+        GROUP BY column
+        ORDER BY compressed DESC
+        """,
+        parameters={"table": table},
+    ).result_rows
+
+    timings = []
+    read_rows = read_bytes = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = client.query(SCAN_QUERY.format(table=table))
+        timings.append(time.perf_counter() - started)
+        read_rows = int(result.summary.get("read_rows", 0))
+        read_bytes = int(result.summary.get("read_bytes", 0))
+
+    median = statistics.median(timings)
+    return {
+        "table": table,
+        "rows": int(totals[0] or 0),
+        "parts": int(totals[3] or 0),
+        "bytes_on_disk": int(totals[1] or 0),
+        "bytes_uncompressed": int(totals[2] or 0),
+        "compression_ratio": round((totals[2] or 0) / totals[1], 2) if totals[1] else None,
+        "columns": [
+            {
+                "column": name,
+                "compressed": int(compressed),
+                "uncompressed": int(uncompressed),
+                "ratio": round(uncompressed / compressed, 2) if compressed else None,
+            }
+            for name, compressed, uncompressed in columns
+        ],
+        "scan": {
+            "runs": runs,
+            "median_seconds": round(median, 4),
+            "read_rows": read_rows,
+            "read_bytes": read_bytes,
+            "rows_per_second": int(read_rows / median) if median else None,
+            "bytes_per_second": int(read_bytes / median) if median else None,
+        },
+    }
+
+
+def migrate(client, keep_legacy: bool):
+    hot_dimensions = set(settings.HOT_DIMENSIONS)
+
+    logger.info("Creating metrics_v2")
+    client.command(METRICS_TABLE_DDL.format(table="metrics_v2"))
+    for statement in dimension_index_ddl("metrics_v2", hot_dimensions):
+        client.command(statement)
+
+    # The view takes rows created from the cutoff on and the copy the rows
+    # before it; the cutoff is ahead so the view exists by then
+    since = _now_ms(client) + CUTOFF_DELAY_MS
+    client.command(f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS metrics_v2_dual_write_mv
+        TO metrics_v2
+        AS SELECT {COPY_COLUMNS} FROM metrics
+        WHERE {VIEW_CUTOFF_WHERE.format(cutoff=since)}
+    """)
+    logger.info("Dual-write view attached", since=since)
+    time.sleep(max(since - _now_ms(client), 0) / 1000)
+
+    partitions = [
+        row[0]
+        for row in client.query(
+            """
+            SELECT DISTINCT partition_id FROM system.parts
+            WHERE database = currentDatabase() AND table = 'metrics' AND active
+            ORDER BY partition_id
+            """
+        ).result_rows
+    ]
+
+    for partition_id in partitions:
+        started = time.perf_counter()
+        client.command(
+            f"""
+            INSERT INTO metrics_v2 ({COPY_COLUMNS})
+            SELECT {COPY_COLUMNS} FROM metrics
+            WHERE _partition_id = {{partition_id:String}}
+              AND created_at < fromUnixTimestamp64Milli(toInt64({{since:Int64}}))
+            """,
+            parameters={"partition_id": partition_id, "since": since},
+        )
+        logger.info(
+            "Partition copied",
+            partition=partition_id,
+            seconds=round(time.perf_counter() - started, 2),
+        )
+
+    # Cutover. The dual-write view is dropped first: left attached, it would
+    # copy rows inserted into the new table back into itself. Rows written to
+    # the old table in between are caught up below.
+    cutover_ms = _now_ms(client) - CATCHUP_MARGIN_MS
+    client.command("DROP VIEW IF EXISTS metrics_v2_dual_write_mv")
+    client.command("EXCHANGE TABLES metrics AND metrics_v2")
+    client.command("RENAME TABLE metrics_v2 TO metrics_legacy")
+    check_rollup_views(client)
+
+    missing = catch_up(client, cutover_ms)
+    if missing:
+        logger.warning("Rows copied after the cutover", rows=missing)
+
+    if not keep_legacy:
+        client.command("DROP TABLE metrics_legacy")
+
+    logger.info("Migration complete", partitions=len(partitions), kept_legacy=keep_legacy)
+
+
+def check_rollup_views(client):
+    """Fail unless the rollup views read from `metrics` rather than metrics_legacy"""
+    dependents = {
+        name: set(views)
+        for name, views in client.query(
+            """
+            SELECT name, dependencies_table FROM system.tables
+            WHERE database = currentDatabase() AND name IN ('metrics', 'metrics_legacy')
+            """
+        ).result_rows
+    }
+    stale = [view for view in ROLLUP_VIEWS if view in dependents.get("metrics_legacy", set())]
+    missing = [view for view in ROLLUP_VIEWS if view not in dependents.get("metrics", set())]
+    if stale or missing:
+        raise RuntimeError(
+            f"Rollup views do not read from metrics after the exchange (still on metrics_legacy: {stale}, "
+            f"missing: {missing}); recreate them on metrics and backfill before dropping metrics_legacy"
+        )
+
+
+def catch_up(client, since_ms: int) -> int:
+    """
+    Copy rows created since `since_ms` that are in metrics_legacy but not in metrics.
+
+    An anti-join on the whole row makes it safe to repeat. The rows already
+    went through the views when first written, so they are moved in by
+    partition, which does not fire the views again.
+    """
+    row_hash = f"cityHash64({COPY_COLUMNS})"
+    since = f"fromUnixTimestamp64Milli(toInt64({since_ms}))"
+
+    client.command("DROP TABLE IF EXISTS metrics_catchup")
+    client.command("CREATE TABLE metrics_catchup AS metrics")
+    client.command(f"""
+        INSERT INTO metrics_catchup ({COPY_COLUMNS})
+        SELECT {COPY_COLUMNS} FROM metrics_legacy
+        WHERE created_at >= {since}
+          AND {row_hash} NOT IN (SELECT {row_hash} FROM metrics WHERE created_at >= {since})
+    """)
+
+    rows = client.query("SELECT count() FROM metrics_catchup").result_rows[0][0]
+    staged = client.query(
+        """
+        SELECT DISTINCT partition_id FROM system.parts
+        WHERE database = currentDatabase() AND table = 'metrics_catchup' AND active
+        """
+    ).result_rows
+    for (partition_id,) in staged:
+        client.command(f"ALTER TABLE metrics_catchup MOVE PARTITION ID '{partition_id}' TO TABLE metrics")
+    client.command("DROP TABLE metrics_catchup")
+    return rows
+
+
+def _now_ms(client) -> int:
+    return int(client.query("SELECT toUnixTimestamp64Milli(now64(3))").result_rows[0][0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    report_cmd = sub.add_parser("report", help="Print bytes on disk and scan throughput")
+    report_cmd.add_argument("--table", default="metrics")
+    report_cmd.add_argument("--runs", type=int, default=5)
+
+    migrate_cmd = sub.add_parser("migrate", help="Migrate metrics to the new schema online")
+    migrate_cmd.add_argument("--keep-legacy", action="store_true")
+
+    args = parser.parse_args()
+    client = get_client()
+
+    try:
+        if args.command == "report":
+            print(json.dumps(storage_report(client, args.table, args.runs), indent=2))
+        else:
+            before = storage_report(client, "metrics", runs=3)
+            migrate(client, keep_legacy=args.keep_legacy)
+            after = storage_report(client, "metrics", runs=3)
+            print(json.dumps({"before": before, "after": after}, indent=2))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
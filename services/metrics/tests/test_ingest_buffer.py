@@ -0,0 +1,86 @@
+"""Tests for the WAL-backed ingest buffer"""
+
+import pytest
+from app.core.config import settings
+from app.core.ingest_buffer import BufferFullError, IngestBuffer
+from app.core.wal import WriteAheadLog
+
+pytestmark = pytest.mark.unit
+
+
+class RecordingClickHouse:
+    """Collects inserted rows; fails the inserts numbered in `fail_on`"""
+
+    def __init__(self, fail_on: set[int] | None = None):
+        self.inserted: list[dict] = []
+        self.calls = 0
+        self.fail_on = fail_on or set()
+
+    def insert_metrics(self, rows: list[dict]):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise ConnectionError("ClickHouse unavailable")
+        self.inserted.extend(rows)
+
+
+def rows(count: int, start: int = 0) -> list[dict]:
+    return [{"metric_name": "cpu", "value": float(i)} for i in range(start, start + count)]
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), segment_bytes=1024 * 1024, fsync_interval_ms=0)
+    wal.open()
+    return IngestBuffer(RecordingClickHouse(), wal)
+
+
+async def failing_sync():
+    raise OSError("EIO")
+
+
+async def test_failed_sync_discards_rows(buffer, monkeypatch):
+    monkeypatch.setattr(buffer.wal, "sync", failing_sync)
+
+    with pytest.raises(OSError):
+        await buffer.add(rows(3))
+    assert buffer.rows == []
+
+
+async def test_failed_sync_after_flush_keeps_rows(buffer, monkeypatch):
+    async def sync_racing_flush():
+        # A flush takes the rows before the fsync result comes back
+        await buffer.flush()
+        raise OSError("EIO")
+
+    monkeypatch.setattr(buffer.wal, "sync", sync_racing_flush)
+
+    # Stored rows must not be reported as failed, or the retry duplicates them
+    await buffer.add(rows(3))
+    assert buffer.clickhouse.inserted == rows(3)
+    assert buffer.rows == []
+
+
+async def test_flush_retries_only_uninserted_chunks(buffer, monkeypatch):
+    monkeypatch.setattr(settings, "BUFFER_FLUSH_ROWS", 2)
+    buffer.clickhouse.fail_on = {2}
+    buffer.wal.write(b"[]")
+    buffer.rows = rows(5)
+
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+    assert buffer.rows == rows(3, start=2)
+    # Segments stay until every row they hold is stored
+    assert len(buffer.wal.segments()) == 2
+
+    await buffer.flush()
+    assert buffer.clickhouse.inserted == rows(5)
+    assert buffer.wal.segments() == [buffer.wal.segment_seq]
+
+
+async def test_add_rejects_rows_past_the_limit(buffer, monkeypatch):
+    monkeypatch.setattr(settings, "BUFFER_MAX_ROWS", 4)
+    buffer.rows = rows(3)
+
+    with pytest.raises(BufferFullError):
+        await buffer.add(rows(2))
+    assert len(buffer.rows) == 3
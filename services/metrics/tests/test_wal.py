@@ -0,0 +1,133 @@
+"""Tests for the segmented write-ahead log"""
+
+import os
+
+import pytest
+from app.core import wal as wal_module
+from app.core.wal import RECORD_HEADER, WriteAheadLog
+
+pytestmark = pytest.mark.unit
+
+
+def make_wal(root, segment_bytes=1024 * 1024) -> WriteAheadLog:
+    return WriteAheadLog(str(root), segment_bytes=segment_bytes, fsync_interval_ms=0)
+
+
+async def write_and_close(root, payloads: list[bytes]):
+    log = make_wal(root)
+    log.open()
+    await log.start()
+    for payload in payloads:
+        log.write(payload)
+    await log.sync()
+    await log.close()
+    return log
+
+
+async def test_replay_returns_records_in_order(tmp_path):
+    payloads = [b"first", b"", b"x" * 5000]
+    await write_and_close(tmp_path, payloads)
+
+    log = make_wal(tmp_path)
+    pending = log.open()
+    assert list(log.replay(pending)) == payloads
+    await log.close()
+
+
+async def test_replay_stops_at_corrupt_record(tmp_path):
+    written = await write_and_close(tmp_path, [b"good", b"flipped", b"after"])
+    path = written._segment_path(written.segment_seq)
+
+    data = bytearray(path.read_bytes())
+    # Corrupt the payload of the second record
+    data[RECORD_HEADER.size + len(b"good") + RECORD_HEADER.size] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    log = make_wal(tmp_path)
+    assert list(log.replay(log.open())) == [b"good"]
+    await log.close()
+
+
+async def test_replay_skips_torn_tail(tmp_path):
+    written = await write_and_close(tmp_path, [b"complete", b"interrupted"])
+    path = written._segment_path(written.segment_seq)
+    os.truncate(path, path.stat().st_size - 3)
+
+    log = make_wal(tmp_path)
+    assert list(log.replay(log.open())) == [b"complete"]
+    await log.close()
+
+
+async def test_rotate_and_truncate_through(tmp_path):
+    log = make_wal(tmp_path)
+    log.open()
+    await log.start()
+
+    log.write(b"sealed")
+    sealed = log.rotate()
+    log.write(b"current")
+    await log.sync()
+
+    assert log.segments() == [sealed, log.segment_seq]
+    log.truncate_through(sealed)
+    assert log.segments() == [log.segment_seq]
+
+    # The segment being written is never deleted
+    log.truncate_through(log.segment_seq)
+    assert log.segments() == [log.segment_seq]
+    assert list(log.replay(log.segments())) == [b"current"]
+    await log.close()
+
+
+async def test_write_rotates_full_segments(tmp_path):
+    log = make_wal(tmp_path, segment_bytes=16)
+    log.open()
+    first = log.write(b"a" * 16)
+    second = log.write(b"b")
+    assert second == first + 1
+    assert list(log.replay(log.segments())) == [b"a" * 16, b"b"]
+    await log.close()
+
+
+async def test_failed_fsync_latches(tmp_path, monkeypatch):
+    log = make_wal(tmp_path)
+    log.open()
+    await log.start()
+
+    def failing_fsync(fd):
+        raise OSError("EIO")
+
+    monkeypatch.setattr(wal_module.os, "fsync", failing_fsync)
+    log.write(b"lost")
+    with pytest.raises(OSError):
+        await log.sync()
+    assert not await log.check()
+
+    # A later fsync succeeding proves nothing about the lost pages
+    monkeypatch.undo()
+    with pytest.raises(RuntimeError):
+        log.write(b"more")
+    with pytest.raises(RuntimeError):
+        await log.sync()
+    await log.close()
+
+
+async def test_orphaned_slots_are_claimed(tmp_path):
+    await write_and_close(tmp_path, [b"orphaned"])
+
+    running = make_wal(tmp_path)
+    running.open()
+    other = make_wal(tmp_path)
+    assert other.open() == []
+    assert other.directory != running.directory
+
+    # Both slots are held; the first one's segments are not orphans
+    assert other.orphans() == []
+    await running.close()
+
+    [orphan] = other.orphans()
+    assert list(orphan.replay(orphan.segments())) == [b"orphaned"]
+    orphan.truncate_through(orphan.segments()[-1])
+    assert orphan.segments() == []
+    orphan.release()
+    await other.close()
@@ -0,0 +1,59 @@
+"""Tests for LTTB and M4 downsampling"""
+
+import numpy as np
+import pytest
+from ayvlo_common.downsampling import downsample, lttb, m4
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.sin(x / 300) + rng.normal(0, 0.05, len(x))
+    y[4321] = 25.0
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_spikes(series):
+    x, y = series
+    selected = lttb(x, y, 200)
+
+    assert len(selected) == 200
+    assert selected[0] == 0 and selected[-1] == len(x) - 1
+    assert np.all(np.diff(selected) > 0)
+    assert 4321 in selected
+
+
+def test_lttb_returns_everything_below_threshold():
+    x = np.arange(5, dtype=np.float64)
+    assert lttb(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(x, x, 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_m4_keeps_extremes_of_every_bucket(series):
+    x, y = series
+    buckets = 50
+    selected = m4(x, y, buckets)
+
+    assert len(selected) <= 4 * buckets
+    assert np.all(np.diff(selected) > 0)
+    for bucket in np.array_split(np.arange(len(x)), buckets):
+        assert bucket[0] in selected and bucket[-1] in selected
+        assert bucket[np.argmin(y[bucket])] in selected
+        assert bucket[np.argmax(y[bucket])] in selected
+
+
+def test_m4_degenerate_inputs():
+    x = np.zeros(100)
+    assert m4(x, np.arange(100.0), 10).tolist() == [0, 99]
+    assert m4(np.arange(8.0), np.arange(8.0), 2).tolist() == list(range(8))
+
+
+def test_downsample_dispatch(series):
+    x, y = series
+    assert len(downsample(x, y, 100)) == 100
+    assert len(downsample(x, y, 100, method="m4")) <= 100
+    with pytest.raises(ValueError):
+        downsample(x, y, 100, method="mean")
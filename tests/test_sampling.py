@@ -0,0 +1,140 @@
+"""Tests for head and tail trace sampling"""
+
+import pytest
+from ayvlo_common.sampling import (
+    TRACESTATE_HEAD,
+    TRACESTATE_KEY,
+    RouteRatioSampler,
+    TailSamplingSpanProcessor,
+)
+from opentelemetry import trace
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+from opentelemetry.trace import Status, StatusCode
+
+pytestmark = pytest.mark.unit
+
+MS = 1_000_000
+
+
+class CollectingProcessor(SpanProcessor):
+    """Keeps every span it is handed"""
+
+    def __init__(self):
+        self.spans = []
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+    @property
+    def names(self) -> list[str]:
+        return [span.name for span in self.spans]
+
+
+def make_tracer(ratio: float, **tail_options):
+    collected = CollectingProcessor()
+    tail = TailSamplingSpanProcessor(collected, **tail_options)
+    provider = TracerProvider(sampler=RouteRatioSampler(ratio, record_all=True))
+    provider.add_span_processor(tail)
+    return provider.get_tracer(__name__), tail, collected
+
+
+def run_trace(tracer, name: str, duration_ms: float, error: bool = False):
+    """Root span with one child, ending at the given duration"""
+    root = tracer.start_span(name, start_time=0)
+    child = tracer.start_span(f"{name}.child", context=trace.set_span_in_context(root), start_time=0)
+    if error:
+        child.set_status(Status(StatusCode.ERROR))
+    child.end(end_time=1)
+    root.end(end_time=int(duration_ms * MS))
+    return root
+
+
+def test_head_decision_travels_in_tracestate():
+    sampler = RouteRatioSampler(1.0, record_all=True)
+    result = sampler.should_sample(None, trace_id=12345, name="GET /items")
+    assert result.trace_state.get(TRACESTATE_KEY) == TRACESTATE_HEAD
+
+    # Dropped by the ratio, but still recorded for tail sampling
+    sampler = RouteRatioSampler(0.0, record_all=True)
+    result = sampler.should_sample(None, trace_id=12345, name="GET /items")
+    assert result.decision.is_sampled()
+    assert result.trace_state is None
+
+
+def test_route_ratio_overrides():
+    sampler = RouteRatioSampler(1.0, {"/health": 0.0}, record_all=True)
+    result = sampler.should_sample(None, 1, "GET", attributes={"http.route": "/health/live"})
+    assert not result.decision.is_recording()
+
+
+def test_head_sampled_traces_are_kept():
+    tracer, _, collected = make_tracer(1.0)
+    root = run_trace(tracer, "fast", duration_ms=1)
+
+    assert root.get_span_context().trace_state.get(TRACESTATE_KEY) == TRACESTATE_HEAD
+    assert collected.names == ["fast.child", "fast"]
+
+
+def test_fast_unsampled_traces_are_dropped():
+    tracer, _, collected = make_tracer(0.0)
+    run_trace(tracer, "fast", duration_ms=1)
+    assert collected.spans == []
+
+
+def test_error_traces_are_kept():
+    tracer, _, collected = make_tracer(0.0)
+    run_trace(tracer, "failing", duration_ms=1, error=True)
+    assert collected.names == ["failing.child", "failing"]
+
+
+def test_slow_traces_are_kept_above_p99():
+    tracer, _, collected = make_tracer(0.0, window=100)
+    for _ in range(100):
+        run_trace(tracer, "request", duration_ms=10)
+    assert collected.spans == []
+
+    run_trace(tracer, "request", duration_ms=500)
+    assert collected.names == ["request.child", "request"]
+
+
+def test_slow_threshold_keeps_traces_without_history():
+    tracer, _, collected = make_tracer(0.0, slow_threshold_ms=100)
+    run_trace(tracer, "request", duration_ms=50)
+    run_trace(tracer, "request", duration_ms=150)
+    assert len(collected.spans) == 2
+
+
+def test_spans_ending_after_root_follow_decision():
+    tracer, _, collected = make_tracer(0.0)
+
+    for error in (True, False):
+        root = tracer.start_span("root", start_time=0)
+        late = tracer.start_span("late", context=trace.set_span_in_context(root), start_time=0)
+        if error:
+            root.set_status(Status(StatusCode.ERROR))
+        root.end(end_time=MS)
+        late.end(end_time=2 * MS)
+
+    # Only the failed trace is kept, including its late span
+    assert collected.names == ["root", "late"]
+
+
+def test_buffered_traces_are_bounded():
+    tracer, tail, collected = make_tracer(0.0, max_traces=2)
+
+    roots = []
+    for i in range(3):
+        root = tracer.start_span(f"root-{i}", start_time=0)
+        child = tracer.start_span(f"child-{i}", context=trace.set_span_in_context(root), start_time=0)
+        child.end(end_time=1)
+        roots.append(root)
+    assert len(tail._buffers) == 2
+
+    roots[2].set_status(Status(StatusCode.ERROR))
+    roots[2].end(end_time=MS)
+    assert collected.names == ["child-2", "root-2"]
+
+    # The oldest trace lost its buffered child to eviction
+    roots[0].set_status(Status(StatusCode.ERROR))
+    roots[0].end(end_time=MS)
+    assert collected.names == ["child-2", "root-2", "root-0"]
@@ -0,0 +1,52 @@
+"""Tests for the packed series encoding"""
+
+import numpy as np
+import pytest
+from ayvlo_common.series import SeriesFormatError, decode_series, encode_series
+
+pytestmark = pytest.mark.unit
+
+
+def test_round_trip():
+    timestamps = np.array([1_700_000_000_000, 1_700_000_060_000, 1_700_000_120_000])
+    values = np.array([1.5, np.nan, -3.0])
+
+    decoded_ts, decoded_values = decode_series(encode_series(timestamps, values))
+
+    assert decoded_ts.dtype == np.dtype("datetime64[ms]")
+    assert decoded_ts.astype(np.int64).tolist() == timestamps.tolist()
+    np.testing.assert_array_equal(decoded_values, values)
+
+
+def test_empty_series():
+    timestamps, values = decode_series(encode_series(np.array([]), np.array([])))
+    assert len(timestamps) == 0 and len(values) == 0
+
+
+def test_decoded_columns_are_read_only_views():
+    payload = encode_series(np.arange(4), np.ones(4))
+    _, values = decode_series(payload)
+    with pytest.raises(ValueError):
+        values[0] = 2.0
+
+
+def test_mismatched_lengths_are_rejected():
+    with pytest.raises(ValueError):
+        encode_series(np.arange(3), np.ones(2))
+
+
+@pytest.mark.parametrize(
+    "mangle",
+    [
+        lambda payload: payload[:10],
+        lambda payload: b"XXXX" + payload[4:],
+        lambda payload: payload[:4] + b"\x02\x00" + payload[6:],
+        lambda payload: payload[:-1],
+        lambda payload: payload + b"\x00" * 16,
+    ],
+    ids=["short-header", "magic", "version", "truncated", "trailing"],
+)
+def test_malformed_payloads_are_rejected(mangle):
+    payload = encode_series(np.arange(3), np.ones(3))
+    with pytest.raises(SeriesFormatError):
+        decode_series(mangle(payload))